@@ -0,0 +1,252 @@
+"""Compiled program artifacts: ``.cco`` files that run without the front end.
+
+An artifact is a 32-byte header followed by a section table and the
+sections, all little-endian:
+
+* header: magic ``CCO\\0``, format version, flags, compiler version
+  (16 bytes, NUL padded), section count and a CRC-32 of the whole file,
+  taken with this checksum field zeroed
+* section table: (tag, offset, length) for every section
+* ``CONS``: the constant pool, one tagged int, float or complex each
+* ``SYMS``: the variable names in slot order, NUL separated
+* ``CODE``: the instruction stream as int64 (opcode, argument) pairs,
+  8-byte aligned
+* ``TAC `` and ``ASM `` (optional): the TAC and assembly views as text
+
+The loader maps the file and runs the instruction stream in place through a
+memoryview, so only the constant pool and names are decoded. Artifacts from
+another compiler version are refused, since opcode numbers may have changed.
+"""
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bytecode import Program
+from version import COMPILER_VERSION
+
+MAGIC = b"CCO\0"
+FORMAT_VERSION = 1
+EXTENSION = ".cco"
+OPTIMIZED = 1  # Header flag: the program went through the IR passes, so its statements do not map to lines
+
+_HEADER = struct.Struct("<4sHH16sII")
+_CHECKSUM_OFFSET = _HEADER.size - 4  # The checksum is the header's last field
+_SECTION = struct.Struct("<4sQQ")
+_INT64 = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+_COMPLEX = struct.Struct("<dd")
+_LENGTH = struct.Struct("<I")
+
+CONSTANTS, SYMBOLS, CODE, TAC, ASSEMBLY = b"CONS", b"SYMS", b"CODE", b"TAC ", b"ASM "
+_REQUIRED = (CONSTANTS, SYMBOLS, CODE)
+
+
+class ArtifactError(Exception):
+    """Raised for a file that is not a valid artifact of this compiler version."""
+
+
+def _checksum(data):
+    """CRC-32 of an artifact's bytes with the header's checksum field taken as zero."""
+    with memoryview(data) as view:  # Released here, so a mapped file can still be closed
+        checksum = zlib.crc32(b"\0\0\0\0", zlib.crc32(view[:_CHECKSUM_OFFSET]))
+        return zlib.crc32(view[_HEADER.size:], checksum)
+
+
+def _encode_constants(constants):
+    parts = [_LENGTH.pack(len(constants))]
+    for value in constants:
+        kind = type(value)
+        if kind is int and -(1 << 63) <= value < (1 << 63):
+            parts.append(b"i" + _INT64.pack(value))
+        elif kind is int:
+            data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+            parts.append(b"I" + _LENGTH.pack(len(data)) + data)
+        elif kind is float:
+            parts.append(b"f" + _FLOAT.pack(value))
+        elif kind is complex:
+            parts.append(b"c" + _COMPLEX.pack(value.real, value.imag))
+        else:
+            raise ArtifactError(f"Cannot store a constant of type {kind.__name__}")
+    return b"".join(parts)
+
+
+def _decode_constants(data):
+    count, = _LENGTH.unpack_from(data, 0)
+    offset = _LENGTH.size
+    constants = []
+    for _ in range(count):
+        kind = data[offset:offset + 1]
+        offset += 1
+        if kind == b"i":
+            constants.append(_INT64.unpack_from(data, offset)[0])
+            offset += _INT64.size
+        elif kind == b"I":
+            length, = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            constants.append(int.from_bytes(data[offset:offset + length], "little", signed=True))
+            offset += length
+        elif kind == b"f":
+            constants.append(_FLOAT.unpack_from(data, offset)[0])
+            offset += _FLOAT.size
+        elif kind == b"c":
+            constants.append(complex(*_COMPLEX.unpack_from(data, offset)))
+            offset += _COMPLEX.size
+        else:
+            raise ArtifactError(f"Unknown constant tag {kind!r}")
+    if offset != len(data):
+        raise ArtifactError("Constant pool has trailing bytes")
+    return constants
+
+
+def write_artifact(path, program, tac=None, assembly=None, optimized=False):
+    """Writes ``program`` and, when given, its TAC and assembly text to a .cco file."""
+    code = array("q", program.code)
+    if sys.byteorder != "little":
+        code.byteswap()
+    sections = [(CONSTANTS, _encode_constants(program.constants)),
+                (SYMBOLS, "\0".join(program.names).encode("utf-8")),
+                (CODE, code.tobytes())]
+    if tac is not None:
+        sections.append((TAC, tac.encode("utf-8")))
+    if assembly is not None:
+        sections.append((ASSEMBLY, assembly.encode("utf-8")))
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    table = []
+    body = []
+    for tag, data in sections:
+        padding = -offset % 8  # Keeps CODE aligned for the int64 view
+        body.append(b"\0" * padding)
+        offset += padding
+        table.append(_SECTION.pack(tag, offset, len(data)))
+        body.append(data)
+        offset += len(data)
+    data = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, OPTIMIZED if optimized else 0,
+                                  COMPILER_VERSION.encode("ascii"), len(sections), 0))
+    data += b"".join(table + body)
+    struct.pack_into("<I", data, _CHECKSUM_OFFSET, _checksum(data))
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as artifact_file:
+        artifact_file.write(data)
+    os.replace(temp_path, path)  # Atomic, so a reader never maps half a file
+
+
+class Artifact:
+    """A loaded .cco file; ``program`` runs on the mapped instruction stream until close()."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as artifact_file:
+            try:
+                self.map = mmap.mmap(artifact_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # An empty file cannot be mapped
+                raise ArtifactError(f"{path}: not a compiled artifact") from None
+        try:
+            self.sections = self._validate()
+            self.program = self._load_program()
+        except Exception:
+            self.map.close()
+            raise
+
+    def _validate(self):
+        data = self.map
+        if len(data) < _HEADER.size or data[:4] != MAGIC:
+            raise ArtifactError(f"{self.path}: not a compiled artifact")
+        _, format_version, self.flags, compiler_version, count, checksum = _HEADER.unpack_from(data, 0)
+        if format_version != FORMAT_VERSION:
+            raise ArtifactError(f"{self.path}: artifact format {format_version} is not supported "
+                                f"(expected {FORMAT_VERSION})")
+        compiler_version = compiler_version.rstrip(b"\0").decode("ascii", "replace")
+        if compiler_version != COMPILER_VERSION:
+            raise ArtifactError(f"{self.path}: built by compiler {compiler_version}, "
+                                f"this is {COMPILER_VERSION}; rebuild it")
+        if _checksum(data) != checksum:
+            raise ArtifactError(f"{self.path}: checksum mismatch, the file is corrupt")
+        sections = {}
+        for index in range(count):
+            start = _HEADER.size + index * _SECTION.size
+            if start + _SECTION.size > len(data):
+                raise ArtifactError(f"{self.path}: truncated section table")
+            tag, offset, length = _SECTION.unpack_from(data, start)
+            if offset + length > len(data):
+                raise ArtifactError(f"{self.path}: section {tag.decode('ascii', 'replace')} is out of bounds")
+            sections[tag] = (offset, length)
+        for tag in _REQUIRED:
+            if tag not in sections:
+                raise ArtifactError(f"{self.path}: missing section {tag.decode('ascii')}")
+        return sections
+
+    def _section(self, tag):
+        offset, length = self.sections[tag]
+        return self.map[offset:offset + length]
+
+    def _load_program(self):
+        offset, length = self.sections[CODE]
+        if offset % 8 or length % 16:
+            raise ArtifactError(f"{self.path}: misaligned instruction stream")
+        code = memoryview(self.map)[offset:offset + length].cast("q")
+        if sys.byteorder != "little":
+            code = array("q", code)
+            code.byteswap()
+        names = self._section(SYMBOLS).decode("utf-8")
+        return Program(code, _decode_constants(self._section(CONSTANTS)), names.split("\0") if names else [])
+
+    @property
+    def optimized(self):
+        return bool(self.flags & OPTIMIZED)
+
+    def tac(self):
+        return self._section(TAC).decode("utf-8") if TAC in self.sections else None
+
+    def assembly(self):
+        return self._section(ASSEMBLY).decode("utf-8") if ASSEMBLY in self.sections else None
+
+    def close(self):
+        if isinstance(self.program.code, memoryview):
+            self.program.code.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_artifact(path):
+    return Artifact(path)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from benchmark import generate_program
+    from lexer import Lexer
+    from parser import Parser
+    from semantic_analyzer import SemanticAnalyzer
+    from bytecode import compile_program, VirtualMachine
+
+    # Load-and-run against compile-and-run on generated programs
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            code = generate_program(size)
+            path = os.path.join(directory, f"program_{size}{EXTENSION}")
+            start = time.perf_counter()
+            ast = Parser(Lexer(code).tokenize()).parse()
+            SemanticAnalyzer(ast).analyze()
+            program = compile_program(ast)
+            output = VirtualMachine(program).run()
+            compiled = time.perf_counter() - start
+
+            write_artifact(path, program, program.tac(), program.assembly())
+            start = time.perf_counter()
+            with load_artifact(path) as artifact:
+                loaded_output = VirtualMachine(artifact.program).run()
+            loaded = time.perf_counter() - start
+            assert loaded_output == output
+            print(f"{size:>8} statements, {os.path.getsize(path) / 1e3:8.1f} kB: "
+                  f"compile+run {compiled * 1000:8.2f}ms, load+run {loaded * 1000:8.2f}ms ({compiled / loaded:.1f}x)")
@@ -0,0 +1,214 @@
+"""Assembly backend: instruction selection from the IR, peephole optimization
+and linear-scan register allocation onto a fixed set of registers.
+
+Program variables live in memory and are addressed by name; compiler temps
+are virtual registers until the allocator maps them to R0..Rn or, when it
+runs out, to stack slots ``[SP+k]``.
+"""
+from ast_nodes import ASSIGN, PRINT, OP_NAMES
+from ir import Const, is_temp
+
+DEFAULT_REGISTERS = 8
+
+
+class AsmInstr:
+    __slots__ = ("opcode", "dest", "srcs")
+
+    def __init__(self, opcode, dest, srcs):
+        self.opcode = opcode
+        self.dest = dest
+        self.srcs = srcs
+
+    def operands(self):
+        return ([self.dest] if self.dest is not None else []) + self.srcs
+
+
+def select_instructions(instructions):
+    """Translates IR one-to-one, printing through a fresh temp like the original backend."""
+    asm = []
+    print_counter = 0
+    for instr in instructions:
+        if instr.op == PRINT:
+            print_counter += 1
+            temp = f"%p{print_counter}"
+            asm.append(AsmInstr("MOV", temp, [instr.args[0]]))
+            asm.append(AsmInstr("OUT", None, [temp]))
+        elif instr.op == ASSIGN:
+            asm.append(AsmInstr("MOV", instr.dest, [instr.args[0]]))
+        else:
+            asm.append(AsmInstr(OP_NAMES[instr.op], instr.dest, list(instr.args)))
+    return asm
+
+
+def _is_int_constant(operand, value):
+    return isinstance(operand, Const) and type(operand.value) is int and operand.value == value
+
+
+class Peephole:
+    """Local rewrites on adjacent instructions, repeated until nothing changes."""
+
+    def __init__(self):
+        self.stats = {"forwarded_movs": 0, "sunk_stores": 0, "self_movs": 0, "merged_adds": 0,
+                      "strength_reduced": 0}
+
+    def run(self, asm):
+        changed = True
+        while changed:
+            asm, changed = self.run_once(asm)
+        return asm
+
+    def run_once(self, asm):
+        uses = {}
+        for instr in asm:
+            for src in instr.srcs:
+                if is_temp(src):
+                    uses[src] = uses.get(src, 0) + 1
+        result = []
+        changed = False
+        i = 0
+        while i < len(asm):
+            instr = asm[i]
+            following = asm[i + 1] if i + 1 < len(asm) else None
+
+            if instr.opcode == "MOV" and instr.dest == instr.srcs[0]:
+                self.stats["self_movs"] += 1
+                changed = True
+                i += 1
+                continue
+
+            if self.strength_reduce(instr):
+                changed = True
+
+            single_use = is_temp(instr.dest) and uses.get(instr.dest) == 1
+            if following is not None and single_use and instr.dest in following.srcs:
+                if instr.opcode == "MOV":
+                    # MOV t, v ; OP d, t  ->  OP d, v
+                    following.srcs = [instr.srcs[0] if src == instr.dest else src for src in following.srcs]
+                    self.stats["forwarded_movs"] += 1
+                    changed = True
+                    i += 1
+                    continue
+                if following.opcode == "MOV":
+                    # OP t, a, b ; MOV x, t  ->  OP x, a, b
+                    instr.dest = following.dest
+                    result.append(instr)
+                    self.stats["sunk_stores"] += 1
+                    changed = True
+                    i += 2
+                    continue
+                if instr.opcode == "ADD" and following.opcode == "ADD":
+                    # ADD t, a, b ; ADD d, t, c  ->  ADD d, a, b, c
+                    position = following.srcs.index(instr.dest)
+                    following.srcs[position:position + 1] = instr.srcs
+                    self.combine_constants(following)
+                    self.stats["merged_adds"] += 1
+                    changed = True
+                    i += 1
+                    continue
+
+            result.append(instr)
+            i += 1
+        return result, changed
+
+    def strength_reduce(self, instr):
+        """MUL x 2 -> ADD x x, POW x 2 -> MUL x x, MUL x 1 / ADD x 0 -> MOV x."""
+        if len(instr.srcs) != 2:
+            return False
+        left, right = instr.srcs
+        if instr.opcode == "MUL" and (_is_int_constant(left, 2) or _is_int_constant(right, 2)):
+            value = right if _is_int_constant(left, 2) else left
+            instr.opcode, instr.srcs = "ADD", [value, value]
+        elif instr.opcode == "POW" and _is_int_constant(right, 2):
+            instr.opcode, instr.srcs = "MUL", [left, left]
+        elif (instr.opcode == "MUL" and _is_int_constant(right, 1)) or (instr.opcode == "ADD" and _is_int_constant(right, 0)):
+            instr.opcode, instr.srcs = "MOV", [left]
+        else:
+            return False
+        self.stats["strength_reduced"] += 1
+        return True
+
+    def combine_constants(self, instr):
+        """Sums the integer immediates of an n-ary ADD into one operand."""
+        constants = [src for src in instr.srcs if isinstance(src, Const) and type(src.value) is int]
+        if len(constants) > 1:
+            others = [src for src in instr.srcs if not (isinstance(src, Const) and type(src.value) is int)]
+            instr.srcs = others + [Const(sum(src.value for src in constants))]
+
+
+class LinearScanAllocator:
+    """Poletto-Sarkar linear scan over the live intervals of the temps."""
+
+    def __init__(self, registers=DEFAULT_REGISTERS):
+        if registers < 1:
+            raise ValueError("At least one register is required")
+        self.registers = registers
+        self.locations = {}
+        self.spilled = 0
+        self.registers_used = 0
+
+    def allocate(self, asm):
+        intervals = {}
+        for index, instr in enumerate(asm):
+            for operand in instr.operands():
+                if is_temp(operand):
+                    start, _ = intervals.get(operand, (index, index))
+                    intervals[operand] = (start, index)
+
+        free = [f"R{n}" for n in range(self.registers - 1, -1, -1)]
+        active = []  # (end, temp) sorted by end
+        used = set()
+        for temp, (start, end) in sorted(intervals.items(), key=lambda item: item[1][0]):
+            while active and active[0][0] <= start:
+                free.append(self.locations[active.pop(0)[1]])
+            if free:
+                self.locations[temp] = free.pop()
+                used.add(self.locations[temp])
+                active.append((end, temp))
+            else:
+                # Spill whichever interval ends last
+                last_end, last_temp = active[-1]
+                if last_end > end:
+                    self.locations[temp] = self.locations[last_temp]
+                    self.locations[last_temp] = self.spill_slot()
+                    active[-1] = (end, temp)
+                else:
+                    self.locations[temp] = self.spill_slot()
+            active.sort()
+        self.registers_used = len(used)
+        return self.locations
+
+    def spill_slot(self):
+        self.spilled += 1
+        return f"[SP+{(self.spilled - 1) * 8}]"
+
+
+def render(asm, locations):
+    lines = []
+    for instr in asm:
+        operands = ", ".join(str(locations.get(operand, operand)) for operand in instr.operands())
+        lines.append(f"{instr.opcode} {operands}")
+    return "\n".join(lines)
+
+
+def generate_assembly(instructions, registers=DEFAULT_REGISTERS):
+    """Returns (assembly text, statistics) for a list of IR instructions."""
+    asm = select_instructions(instructions)
+    before = len(asm)
+    peephole = Peephole()
+    asm = peephole.run(asm)
+    allocator = LinearScanAllocator(registers)
+    locations = allocator.allocate(asm)
+    stats = {
+        "instructions_before": before,
+        "instructions_after": len(asm),
+        "registers": registers,
+        "registers_used": allocator.registers_used,
+        "spilled": allocator.spilled,
+    }
+    stats.update(peephole.stats)
+    return render(asm, locations), stats
+
+
+def format_stats(stats):
+    return (f"; {stats['instructions_before']} -> {stats['instructions_after']} instructions, "
+            f"{stats['registers_used']}/{stats['registers']} registers, {stats['spilled']} spilled")
@@ -0,0 +1,162 @@
+"""Compact AST nodes built by the Parser.
+
+Every node carries a small-integer opcode in ``op`` so later stages dispatch
+on ints instead of comparing string tags.
+"""
+
+# Opcode tags
+(NUMBER, ID, DECLARE, ASSIGN, PRINT,
+ ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN) = range(15)
+
+OP_NAMES = ("NUMBER", "ID", "DECLARE", "ASSIGN", "PRINT",
+            "ADD", "SUB", "MUL", "DIV", "MOD", "POW", "LOG", "SIN", "COS", "TAN")
+OP_CODES = {name: code for code, name in enumerate(OP_NAMES)}
+
+# Groups of operations sharing the same evaluation rules
+BINARY_OPS = frozenset({ADD, SUB, MUL, DIV, MOD, POW})
+TRIG_OPS = frozenset({SIN, COS, TAN})
+OPERATION_OPS = BINARY_OPS | TRIG_OPS | {LOG}
+
+
+def constant_key(value):
+    """Key for sharing equal constants; 0.0 and -0.0 compare equal but print differently, so zeros key on text."""
+    return (type(value), value) if value else (type(value), str(value))
+
+
+class Node:
+    """Base of the AST nodes; each subclass's ``to_tuple()`` gives the nested-tuple form used by
+    the original parser, which repr, equality and hashing go through."""
+    __slots__ = ("op",)
+
+    def __repr__(self):
+        return repr(self.to_tuple())
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+
+class Number(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.op = NUMBER
+        self.value = value
+
+    def to_tuple(self):
+        return ("NUMBER", self.value)
+
+
+class Name(Node):
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.op = ID
+        self.name = name
+
+    def to_tuple(self):
+        return ("ID", self.name)
+
+
+class Operation(Node):
+    __slots__ = ("operands",)
+
+    def __init__(self, op, operands):
+        self.op = op
+        self.operands = tuple(operands)
+
+    def to_tuple(self):
+        return (OP_NAMES[self.op], [operand.to_tuple() for operand in self.operands])
+
+
+class Statement(Node):
+    """DECLARE, ASSIGN or PRINT; ``name`` is None for PRINT."""
+    __slots__ = ("name", "expr", "line")
+
+    def __init__(self, op, name, expr, line=None):
+        self.op = op
+        self.name = name
+        self.expr = expr
+        self.line = line
+
+    def to_tuple(self):
+        if self.op == PRINT:
+            return ("PRINT", self.expr.to_tuple())
+        return (OP_NAMES[self.op], self.name, self.expr.to_tuple())
+
+
+def walk(node):
+    """Yields every expression node below (and including) ``node``."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.op == DECLARE or node.op == ASSIGN or node.op == PRINT:
+            stack.append(node.expr)
+        elif node.op >= ADD:
+            stack.extend(node.operands)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import tracemalloc
+
+    # Memory and traversal comparison against the original tuple AST
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    def build_nodes():
+        # Leaves are shared the same way Parser shares them
+        names = [Name(f"v{i}") for i in range(1000)]
+        angles = [Number(i) for i in range(360)]
+        program = []
+        for i in range(count):
+            name = names[i % 1000]
+            program.append(Statement(ASSIGN if i >= 1000 else DECLARE, name.name,
+                                     Operation(ADD, (name, Number(i), Operation(SIN, (angles[i % 360],))))))
+        return program
+
+    def build_tuples():
+        program = []
+        for i in range(count):
+            name = f"v{i % 1000}"
+            program.append(("ASSIGN" if i >= 1000 else "DECLARE", name,
+                            ("ADD", [("ID", name), ("NUMBER", i), ("SIN", [("NUMBER", i % 360)])])))
+        return program
+
+    def traverse_nodes(program):
+        visited = 0
+        for statement in program:
+            stack = [statement.expr]
+            while stack:
+                node = stack.pop()
+                if node.op <= ID:
+                    visited += 1
+                else:
+                    stack.extend(node.operands)
+        return visited
+
+    def traverse_tuples(program):
+        visited = 0
+        for statement in program:
+            stack = [statement[-1]]
+            while stack:
+                node = stack.pop()
+                if node[0] == "NUMBER" or node[0] == "ID":
+                    visited += 1
+                else:
+                    stack.extend(node[1])
+        return visited
+
+    for label, build, traverse in (("tuple", build_tuples, traverse_tuples), ("slots", build_nodes, traverse_nodes)):
+        tracemalloc.start()
+        program = build()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        traverse(program)
+        elapsed = time.perf_counter() - start
+        print(f"{label:6} {count} statements: {memory / 1e6:8.1f} MB, traversal {elapsed:.3f}s")
+        del program
@@ -0,0 +1,132 @@
+"""Vectorized batch execution: runs one program over NumPy columns of inputs.
+
+Variables named in ``inputs`` are bound to columns; their VAR declarations in
+the program only supply a default and are skipped. Every IR instruction is
+then evaluated as one array operation per chunk of rows. Columns must all
+have the same length. Rows that divide by zero, take the LOG of a
+non-positive value or a trigonometric function of an infinity, or raise a
+negative number to a fractional power (a complex number in the VM, which
+columns of reals cannot hold) are reported per row instead of aborting the
+batch or turning into NaN. Integer columns follow NumPy int64 arithmetic.
+"""
+from ast_nodes import DECLARE, PRINT, ASSIGN, ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN
+import ir
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class BatchResult:
+    def __init__(self, outputs, valid, errors):
+        self.outputs = outputs  # One array per PRINT, in program order
+        self.valid = valid  # False for rows that raised an error
+        self.errors = errors  # (row, message) for every failed row
+
+    def __len__(self):
+        return len(self.valid)
+
+
+class BatchExecutor:
+    def __init__(self, ast, inputs, optimize=True, chunk_size=DEFAULT_CHUNK_SIZE):
+        import numpy  # Only needed for batch runs
+        self.np = numpy
+        self.input_names = list(inputs)
+        self.chunk_size = chunk_size
+        bound = set(self.input_names)
+        statements = [statement for statement in ast if not (statement.op == DECLARE and statement.name in bound)]
+        self.instructions = ir.build_ir(statements)
+        if optimize:
+            self.instructions, _ = ir.optimize(self.instructions)
+
+    def iter_chunks(self, columns):
+        """Yields a BatchResult for each chunk of rows, so memory stays bounded by chunk_size."""
+        np = self.np
+        columns = {name: np.asarray(columns[name]) for name in self.input_names}
+        for name, column in columns.items():
+            if column.ndim != 1:
+                raise ValueError(f"Input '{name}' must be a one-dimensional column")
+        lengths = {name: len(column) for name, column in columns.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError("Input columns differ in length: "
+                             + ", ".join(f"{name} has {length}" for name, length in lengths.items()))
+        rows = next(iter(lengths.values())) if columns else 1
+        for start in range(0, rows, self.chunk_size):
+            stop = min(start + self.chunk_size, rows)
+            chunk = {name: column[start:stop] for name, column in columns.items()}
+            yield self.run_chunk(chunk, start, stop - start)
+
+    def run(self, columns):
+        """Runs every row and returns one BatchResult with concatenated outputs."""
+        np = self.np
+        chunks = list(self.iter_chunks(columns))
+        outputs = [np.concatenate([chunk.outputs[i] for chunk in chunks]) for i in range(len(chunks[0].outputs))] \
+            if chunks else []
+        valid = np.concatenate([chunk.valid for chunk in chunks]) if chunks else np.ones(0, dtype=bool)
+        errors = [error for chunk in chunks for error in chunk.errors]
+        return BatchResult(outputs, valid, errors)
+
+    def run_chunk(self, env, offset, rows):
+        np = self.np
+        env = dict(env)
+        valid = np.ones(rows, dtype=bool)
+        messages = {}
+        outputs = []
+
+        def value_of(operand):
+            if isinstance(operand, ir.Const):
+                return operand.value
+            if operand not in env:
+                raise NameError(f"Variable '{operand}' is not defined")
+            return env[operand]
+
+        def fail(mask, message):
+            # Only the first error of a row is reported
+            new = np.asarray(mask & valid)
+            for row in np.flatnonzero(np.broadcast_to(new, (rows,))):
+                messages[offset + int(row)] = message
+            valid[np.broadcast_to(new, (rows,))] = False
+
+        with np.errstate(all="ignore"):
+            for instr in self.instructions:
+                args = [value_of(arg) for arg in instr.args]
+                op = instr.op
+                if op == PRINT:
+                    outputs.append(np.broadcast_to(np.asarray(args[0]), (rows,)).copy())
+                    continue
+                if op == ASSIGN:
+                    result = args[0]
+                elif op == ADD:
+                    result = np.add(args[0], args[1])
+                elif op == SUB:
+                    result = np.subtract(args[0], args[1])
+                elif op == MUL:
+                    result = np.multiply(args[0], args[1])
+                elif op == DIV:
+                    fail(np.asarray(args[1]) == 0, "division by zero")
+                    result = np.true_divide(args[0], args[1])
+                elif op == MOD:
+                    fail(np.asarray(args[1]) == 0, "modulo by zero")
+                    result = np.mod(args[0], args[1])
+                elif op == POW:
+                    base, exponent = np.asarray(args[0]), np.asarray(args[1])
+                    if base.dtype.kind in "iu" and exponent.dtype.kind in "iu" and (exponent < 0).any():
+                        base = base.astype(np.float64)  # Python turns negative integer powers into floats
+                    fail((base == 0) & (exponent < 0), "0.0 cannot be raised to a negative power")
+                    fail((base < 0) & (exponent != np.trunc(exponent)),
+                         "A negative number raised to a fractional power is complex")
+                    result = np.power(base, exponent)
+                elif op == LOG:
+                    fail(np.asarray(args[0]) <= 0, "Logarithm operand must be positive")
+                    result = np.log10(args[0])
+                elif op in (SIN, COS, TAN):
+                    fail(np.isinf(args[0]), "math domain error")  # What the math module raises for an infinity
+                    radians = np.radians(args[0])
+                    result = np.sin(radians) if op == SIN else np.cos(radians) if op == COS else np.tan(radians)
+                env[instr.dest] = result
+
+        errors = sorted(messages.items())
+        return BatchResult(outputs, valid, errors)
+
+
+def run_batch(ast, columns, chunk_size=DEFAULT_CHUNK_SIZE, optimize=True):
+    """Convenience wrapper: binds every column in ``columns`` as an input variable."""
+    return BatchExecutor(ast, list(columns), optimize, chunk_size).run(columns)
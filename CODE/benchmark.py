@@ -0,0 +1,227 @@
+"""Scaling benchmarks for the compiler phases, with JSON baselines.
+
+``generate_program`` builds synthetic programs from a few knobs: statement
+count, operands per operation, number of input variables and the share of
+trigonometric and LOG operations. Every generated statement starts with VAR
+or PRINT, because an operation's operand list would otherwise run into a
+following ``name = ...`` line. Operands are drawn from the input variables
+and small positive constants, so values stay bounded and LOG operands stay
+positive however long the program is.
+
+``run`` times Lexer.tokenize, Parser.parse, SemanticAnalyzer.analyze and
+CodeGenerator.execute separately at each size, then repeats every phase under
+tracemalloc for its memory peak. ``compare`` fails when a phase got slower
+than a baseline by more than a threshold.
+
+    python benchmark.py run --out baseline.json
+    python benchmark.py run --sizes 100 1000 10000 --baseline baseline.json --threshold 0.25
+    python benchmark.py compare baseline.json current.json
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator
+from version import COMPILER_VERSION
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.2  # Allowed slowdown, as a fraction of the baseline time
+MIN_COMPARED_SECONDS = 0.005  # Phases faster than this in the baseline are too noisy to gate on
+PHASES = ("lex", "parse", "semantic", "execute")
+
+ARITHMETIC = ("ADD", "SUB", "MUL", "DIV", "MOD")
+TRIG = ("SIN", "COS", "TAN")
+
+
+def generate_program(statements, operands=3, variables=16, trig_density=0.1, log_density=0.05,
+                     print_ratio=0.1, seed=0):
+    """Returns the source of a synthetic program with ``statements`` statements in total."""
+    rng = random.Random(seed)
+    variables = max(1, min(variables, statements))
+    inputs = [f"x{index}" for index in range(variables)]
+    lines = [f"VAR {name} = {rng.uniform(1, 10):.3f}" for name in inputs]
+
+    def operand():
+        return rng.choice(inputs) if rng.random() < 0.7 else str(rng.randint(1, 9))
+
+    for index in range(statements - variables):
+        roll = rng.random()
+        if roll < trig_density:
+            expr = f"{rng.choice(TRIG)} {operand()}"
+        elif roll < trig_density + log_density:
+            expr = f"LOG {operand()} {operand()}"
+        elif roll < trig_density + log_density + 0.05:
+            expr = f"POW {operand()} {rng.randint(0, 3)}"
+        else:
+            expr = f"{rng.choice(ARITHMETIC)} " + " ".join(operand() for _ in range(max(2, operands)))
+        if rng.random() < print_ratio:
+            lines.append(f"PRINT {expr}")
+        else:
+            lines.append(f"VAR t{index} = {expr}")
+    return "\n".join(lines)
+
+
+def _phases(code):
+    """Yields (phase, callable) pairs; each callable runs its phase on the previous phase's result."""
+    state = {}
+
+    def lex():
+        state["tokens"] = Lexer(code).tokenize()
+
+    def parse():
+        state["ast"] = Parser(state["tokens"]).parse()
+
+    def semantic():
+        SemanticAnalyzer(state["ast"]).analyze()
+
+    def execute():
+        CodeGenerator().execute(state["ast"])
+
+    return list(zip(PHASES, (lex, parse, semantic, execute))), state
+
+
+def measure(code, repeat=1, memory=True):
+    """Returns {phase: {"seconds": best wall time, "peak_bytes": tracemalloc peak}} for one program."""
+    results = {phase: {"seconds": math.inf} for phase in PHASES}
+    for _ in range(repeat):
+        phases, _ = _phases(code)
+        for phase, run in phases:
+            start = time.perf_counter()
+            run()
+            results[phase]["seconds"] = min(results[phase]["seconds"], time.perf_counter() - start)
+    if memory:
+        phases, _ = _phases(code)
+        tracemalloc.start()
+        try:
+            for phase, run in phases:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                run()
+                results[phase]["peak_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, operands=3, variables=16, trig_density=0.1, log_density=0.05, memory=True, seed=0,
+        log=print):
+    """Benchmarks every size and returns the JSON-ready report."""
+    report = {
+        "compiler_version": COMPILER_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": {"operands": operands, "variables": variables, "trig_density": trig_density,
+                       "log_density": log_density, "seed": seed},
+        "results": {},
+    }
+    for size in sizes:
+        code = generate_program(size, operands, variables, trig_density, log_density, seed=seed)
+        tokens = len(Lexer(code).tokenize())
+        repeat = 5 if size <= 10_000 else 1  # Best of several runs where runs are short
+        results = measure(code, repeat, memory)
+        for phase, record in results.items():
+            record["statements_per_second"] = size / record["seconds"]
+        results["lex"]["tokens_per_second"] = tokens / results["lex"]["seconds"]
+        report["results"][str(size)] = {"tokens": tokens, "phases": results}
+        log(format_size(size, report["results"][str(size)]))
+    return report
+
+
+def format_size(size, entry):
+    parts = []
+    for phase in PHASES:
+        record = entry["phases"][phase]
+        text = f"{phase}={record['seconds'] * 1000:.1f}ms ({record['statements_per_second'] / 1000:.0f}k stmt/s"
+        if "peak_bytes" in record:
+            text += f", {record['peak_bytes'] / size:.0f} B/stmt"
+        parts.append(text + ")")
+    return f"{size:>9} statements: " + "  ".join(parts)
+
+
+def scaling(report):
+    """Yields (phase, size, exponent) where time grows as size ** exponent between consecutive sizes."""
+    sizes = sorted(int(size) for size in report["results"])
+    for phase in PHASES:
+        for smaller, larger in zip(sizes, sizes[1:]):
+            before = report["results"][str(smaller)]["phases"][phase]["seconds"]
+            after = report["results"][str(larger)]["phases"][phase]["seconds"]
+            if before > 0 and after > 0:
+                yield phase, larger, math.log(after / before) / math.log(larger / smaller)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_COMPARED_SECONDS):
+    """Returns a list of regression messages for phases slower than the baseline by over ``threshold``."""
+    regressions = []
+    for size, entry in current["results"].items():
+        base_entry = baseline["results"].get(size)
+        if base_entry is None:
+            continue
+        for phase in PHASES:
+            before = base_entry["phases"][phase]["seconds"]
+            after = entry["phases"][phase]["seconds"]
+            if before < min_seconds:
+                continue
+            change = after / before - 1
+            if change > threshold:
+                regressions.append(f"{phase} at {size} statements: {before * 1000:.1f}ms -> {after * 1000:.1f}ms "
+                                   f"(+{change:.0%}, allowed +{threshold:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Benchmark the compiler phases at increasing program sizes.")
+    commands = arguments.add_subparsers(dest="command", required=True)
+
+    run_command = commands.add_parser("run", help="run the benchmarks")
+    run_command.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    run_command.add_argument("--operands", type=int, default=3, help="operands per arithmetic operation")
+    run_command.add_argument("--variables", type=int, default=16, help="number of input variables")
+    run_command.add_argument("--trig-density", type=float, default=0.1)
+    run_command.add_argument("--log-density", type=float, default=0.05)
+    run_command.add_argument("--seed", type=int, default=0)
+    run_command.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    run_command.add_argument("--out", help="write the results to this JSON file")
+    run_command.add_argument("--baseline", help="fail if slower than this JSON baseline")
+    run_command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_command = commands.add_parser("compare", help="compare two result files")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current")
+    compare_command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = arguments.parse_args(argv)
+    if args.command == "run":
+        report = run(args.sizes, args.operands, args.variables, args.trig_density, args.log_density,
+                     not args.no_memory, args.seed)
+        for phase, size, exponent in scaling(report):
+            print(f"{phase:<9} up to {size:>9}: time ~ n^{exponent:.2f}")
+        if args.out:
+            with open(args.out, "w") as out_file:
+                json.dump(report, out_file, indent=2)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        current = report
+    else:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(args.current) as current_file:
+            current = json.load(current_file)
+
+    regressions = compare(baseline, current, args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print(f"{len(regressions)} regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
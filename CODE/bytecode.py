@@ -0,0 +1,292 @@
+"""Bytecode backend: compiles the AST once and runs it in a stack VM.
+
+Instructions are stored as (opcode, argument) pairs in a flat ``array``.
+LOAD_CONST indexes the constant pool and LOAD_VAR/STORE_VAR index variable
+slots, so the VM never looks names up in a dict.
+"""
+import math
+import time
+from array import array
+from ast_nodes import (NUMBER, ID, PRINT, ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN,
+                       BINARY_OPS, constant_key)
+
+# Instruction opcodes; arithmetic opcodes reuse the AST opcode values
+LOAD_CONST, LOAD_VAR, STORE_VAR, PRINT_TOP = 0, 1, 2, 3
+OPCODE_NAMES = {LOAD_CONST: "LOAD_CONST", LOAD_VAR: "LOAD_VAR", STORE_VAR: "STORE_VAR", PRINT_TOP: "PRINT",
+                ADD: "ADD", SUB: "SUB", MUL: "MUL", DIV: "DIV", MOD: "MOD", POW: "POW",
+                LOG: "LOG", SIN: "SIN", COS: "COS", TAN: "TAN"}
+
+TAC_SYMBOLS = {ADD: "+", SUB: "-", MUL: "*", DIV: "/", MOD: "%", POW: "^"}
+
+_UNSET = object()  # Marks a variable slot that was never stored
+
+
+class Program:
+    """A compiled program: instruction stream, constant pool and variable names."""
+
+    def __init__(self, code, constants, names):
+        self.code = code
+        self.constants = constants
+        self.names = names
+
+    def instructions(self):
+        code = self.code
+        for pc in range(0, len(code), 2):
+            yield code[pc], code[pc + 1]
+
+    def disassemble(self):
+        lines = []
+        for pc, (opcode, arg) in enumerate(self.instructions()):
+            if opcode == LOAD_CONST:
+                lines.append(f"{pc:4} LOAD_CONST {arg} ({self.constants[arg]})")
+            elif opcode == LOAD_VAR or opcode == STORE_VAR:
+                lines.append(f"{pc:4} {OPCODE_NAMES[opcode]} {arg} ({self.names[arg]})")
+            else:
+                lines.append(f"{pc:4} {OPCODE_NAMES[opcode]}")
+        return "\n".join(lines)
+
+    def _views(self, temp_counter=0):
+        """Builds the TAC and assembly views by running the stack symbolically.
+
+        Temps are numbered from ``temp_counter + 1``, so parts of one program can be viewed in turn.
+        """
+        tac = []
+        assembly = []
+        stack = []
+        for opcode, arg in self.instructions():
+            if opcode == LOAD_CONST:
+                stack.append(str(self.constants[arg]))
+            elif opcode == LOAD_VAR:
+                stack.append(self.names[arg])
+            elif opcode == STORE_VAR:
+                value = stack.pop()
+                tac.append(f"{self.names[arg]} = {value}")
+                assembly.append(f"MOV {self.names[arg]}, {value}")
+            elif opcode == PRINT_TOP:
+                value = stack.pop()
+                tac.append(f"PRINT {value}")
+                assembly.append(f"OUT {value}")
+            else:
+                temp_counter += 1
+                temp_var = f"T{temp_counter}"
+                if opcode in BINARY_OPS:
+                    right = stack.pop()
+                    left = stack.pop()
+                    tac.append(f"{temp_var} = {left} {TAC_SYMBOLS[opcode]} {right}")
+                    assembly.append(f"{OPCODE_NAMES[opcode]} {temp_var}, {left}, {right}")
+                else:
+                    operand = stack.pop()
+                    tac.append(f"{temp_var} = {OPCODE_NAMES[opcode]}({operand})")
+                    assembly.append(f"{OPCODE_NAMES[opcode]} {temp_var}, {operand}")
+                stack.append(temp_var)
+        return tac, assembly
+
+    def tac(self):
+        return "\n".join(self._views()[0])
+
+    def tac_lines(self, temp_counter=0):
+        return self._views(temp_counter)[0]
+
+    def temp_count(self):
+        """Number of temps the views use, one per operation."""
+        code = self.code
+        return sum(1 for pc in range(0, len(code), 2)
+                   if code[pc] not in (LOAD_CONST, LOAD_VAR, STORE_VAR, PRINT_TOP))
+
+    def assembly(self):
+        return "\n".join(self._views()[1])
+
+
+class BytecodeCompiler:
+    def __init__(self):
+        self.code = array("q")
+        self.constants = []
+        self.constant_index = {}
+        self.names = []
+        self.slots = {}
+
+    def compile(self, ast):
+        emit = self.code.extend
+        for statement in ast:
+            self.compile_expression(statement.expr)
+            if statement.op == PRINT:
+                emit((PRINT_TOP, 0))
+            else:
+                emit((STORE_VAR, self.slot(statement.name)))
+        return self.program()
+
+    def program(self):
+        return Program(self.code, self.constants, self.names)
+
+    def compile_expression(self, expr):
+        op = expr.op
+        if op == NUMBER:
+            self.code.extend((LOAD_CONST, self.constant(expr.value)))
+        elif op == ID:
+            self.code.extend((LOAD_VAR, self.slot(expr.name)))
+        elif op in BINARY_OPS:
+            operands = expr.operands
+            self.compile_expression(operands[0])
+            for operand in operands[1:]:
+                self.compile_expression(operand)
+                self.code.extend((op, 0))
+        else:
+            # LOG and the trigonometric functions only use their first operand
+            self.compile_expression(expr.operands[0])
+            self.code.extend((op, 0))
+
+    def constant(self, value):
+        key = constant_key(value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def slot(self, name):
+        index = self.slots.get(name)
+        if index is None:
+            index = self.slots[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+def compile_program(ast):
+    return BytecodeCompiler().compile(ast)
+
+
+class VirtualMachine:
+    def __init__(self, program, variables=None):
+        self.program = program
+        self.slots = [_UNSET] * len(program.names)
+        if variables:
+            # Resume from variables computed by an earlier run
+            for index, name in enumerate(program.names):
+                self.slots[index] = variables.get(name, _UNSET)
+
+    def run(self, profile=None):
+        """Executes the program and returns the PRINT outputs as strings.
+
+        With a ``profile`` (anything with ``opcode_counts`` and ``opcode_times`` dicts), the slower
+        run_profiled loop is used instead.
+        """
+        if profile is not None:
+            return self.run_profiled(profile)
+        code = self.program.code
+        constants = self.program.constants
+        slots = self.slots
+        output = []
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        radians = math.radians
+        pc = 0
+        end = len(code)
+        while pc < end:
+            opcode = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if opcode == LOAD_VAR:
+                value = slots[arg]
+                if value is _UNSET:
+                    raise NameError(f"Variable '{self.program.names[arg]}' is not defined")
+                push(value)
+            elif opcode == LOAD_CONST:
+                push(constants[arg])
+            elif opcode == STORE_VAR:
+                slots[arg] = pop()
+            elif opcode == ADD:
+                right = pop()
+                stack[-1] += right
+            elif opcode == SUB:
+                right = pop()
+                stack[-1] -= right
+            elif opcode == MUL:
+                right = pop()
+                stack[-1] *= right
+            elif opcode == DIV:
+                right = pop()
+                stack[-1] /= right
+            elif opcode == MOD:
+                right = pop()
+                stack[-1] %= right
+            elif opcode == POW:
+                right = pop()
+                stack[-1] **= right
+            elif opcode == PRINT_TOP:
+                output.append(str(pop()))
+            elif opcode == SIN:
+                stack[-1] = math.sin(radians(stack[-1]))
+            elif opcode == COS:
+                stack[-1] = math.cos(radians(stack[-1]))
+            elif opcode == TAN:
+                stack[-1] = math.tan(radians(stack[-1]))
+            elif opcode == LOG:
+                if stack[-1] <= 0:
+                    raise ValueError("Logarithm operand must be positive")
+                stack[-1] = math.log10(stack[-1])
+            else:
+                raise RuntimeError(f"Unknown opcode {opcode} at {pc - 2}")
+        return output
+
+    def run_profiled(self, profile):
+        """Same semantics as run(), timing every instruction and accumulating per-opcode totals."""
+        code = self.program.code
+        counts = profile.opcode_counts
+        times = profile.opcode_times
+        clock = time.perf_counter
+        stack = []
+        output = []
+        for pc in range(0, len(code), 2):
+            name = OPCODE_NAMES.get(code[pc], "UNKNOWN")
+            start = clock()
+            try:
+                self.step(code[pc], code[pc + 1], pc, stack, output)
+            finally:
+                times[name] = times.get(name, 0.0) + (clock() - start)
+                counts[name] = counts.get(name, 0) + 1
+        return output
+
+    def step(self, opcode, arg, pc, stack, output):
+        """Executes one instruction; mirrors the dispatch in run()."""
+        if opcode == LOAD_VAR:
+            value = self.slots[arg]
+            if value is _UNSET:
+                raise NameError(f"Variable '{self.program.names[arg]}' is not defined")
+            stack.append(value)
+        elif opcode == LOAD_CONST:
+            stack.append(self.program.constants[arg])
+        elif opcode == STORE_VAR:
+            self.slots[arg] = stack.pop()
+        elif opcode == PRINT_TOP:
+            output.append(str(stack.pop()))
+        elif opcode in BINARY_OPS:
+            right = stack.pop()
+            left = stack[-1]
+            if opcode == ADD:
+                stack[-1] = left + right
+            elif opcode == SUB:
+                stack[-1] = left - right
+            elif opcode == MUL:
+                stack[-1] = left * right
+            elif opcode == DIV:
+                stack[-1] = left / right
+            elif opcode == MOD:
+                stack[-1] = left % right
+            else:
+                stack[-1] = left ** right
+        elif opcode == SIN:
+            stack[-1] = math.sin(math.radians(stack[-1]))
+        elif opcode == COS:
+            stack[-1] = math.cos(math.radians(stack[-1]))
+        elif opcode == TAN:
+            stack[-1] = math.tan(math.radians(stack[-1]))
+        elif opcode == LOG:
+            if stack[-1] <= 0:
+                raise ValueError("Logarithm operand must be positive")
+            stack[-1] = math.log10(stack[-1])
+        else:
+            raise RuntimeError(f"Unknown opcode {opcode} at {pc}")
+
+    def variables(self):
+        return {name: value for name, value in zip(self.program.names, self.slots) if value is not _UNSET}
@@ -1,117 +1,85 @@
-import math
+from bytecode import compile_program, VirtualMachine
+from assembler import generate_assembly, DEFAULT_REGISTERS
+from scheduler import ParallelScheduler
+import ir
+import jit
 
-class CodeGenerator:
-    def __init__(self):
-        self.variables = {}
-        self.tac = []  # List to store Three-Address Code
-        self.assembly = []  # List to store Assembly Code
-        self.temp_counter = 0  # For generating temporary variables
-
-    def execute(self, ast):
-        output = []  # Store results for PRINT statements
-        for statement in ast:
-            if statement[0] == "DECLARE":
-                _, var_name, expr = statement
-                value = self.evaluate(expr)
-                self.variables[var_name] = value
-                self.add_tac(f"{var_name} = {value}")
-                self.add_assembly(f"MOV {var_name}, {value}")
-            elif statement[0] == "ASSIGN":
-                _, var_name, expr = statement
-                value = self.evaluate(expr)
-                self.variables[var_name] = value
-                self.add_tac(f"{var_name} = {value}")
-                self.add_assembly(f"MOV {var_name}, {value}")
-            elif statement[0] == "PRINT":
-                _, expr = statement
-                result = self.evaluate(expr)
-                output.append(str(result))  # Store output
-                temp_var = self.new_temp()
-                self.add_tac(f"{temp_var} = {result}")
-                self.add_assembly(f"MOV {temp_var}, {result}")
-                self.add_assembly(f"OUT {temp_var}")
-        return "\n".join(output)
-
-    def evaluate(self, expr):
-        if isinstance(expr, tuple) and len(expr) == 2 and expr[0] == "GROUP":
-            return self.evaluate(expr[1])
-        if expr[0] == "NUMBER":
-            return expr[1]
-        elif expr[0] == "ID":
-            var_name = expr[1]
-            if var_name not in self.variables:
-                raise NameError(f"Variable '{var_name}' is not defined")
-            return self.variables[var_name]
-        elif expr[0] in {"ADD", "SUB", "MUL", "DIV", "MOD", "POW"}:
-            op, operands = expr
-            operand_values = [self.evaluate(operand) for operand in operands]
-            temp_var = self.new_temp()
+BACKENDS = ("vm", "jit", "parallel")
 
-            # Initialize the result with the first operand
-            result = operand_values[0]
 
-            # Perform the operation sequentially
-            for i in range(1, len(operand_values)):
-                if op == "ADD":
-                    result += operand_values[i]
-                    self.add_tac(f"{temp_var} = {temp_var} + {operand_values[i]}")
-                    self.add_assembly(f"ADD {temp_var}, {temp_var}, {operand_values[i]}")
-                elif op == "SUB":
-                    result -= operand_values[i]
-                    self.add_tac(f"{temp_var} = {temp_var} - {operand_values[i]}")
-                    self.add_assembly(f"SUB {temp_var}, {temp_var}, {operand_values[i]}")
-                elif op == "MUL":
-                    result *= operand_values[i]
-                    self.add_tac(f"{temp_var} = {temp_var} * {operand_values[i]}")
-                    self.add_assembly(f"MUL {temp_var}, {temp_var}, {operand_values[i]}")
-                elif op == "DIV":
-                    result /= operand_values[i]
-                    self.add_tac(f"{temp_var} = {temp_var} / {operand_values[i]}")
-                    self.add_assembly(f"DIV {temp_var}, {temp_var}, {operand_values[i]}")
-                elif op == "POW":
-                    result **= operand_values[i]
-                    self.add_tac(f"{temp_var} = {temp_var} ^ {operand_values[i]}")
-                    self.add_assembly(f"POW {temp_var}, {temp_var}, {operand_values[i]}")
-            return result
-        elif expr[0] == "LOG":
-            operand = self.evaluate(expr[1][0])  # Logarithm is unary
-            if operand <= 0:
-                raise ValueError("Logarithm operand must be positive")
-            result = math.log10(operand)
-            temp_var = self.new_temp()
-            self.add_tac(f"{temp_var} = LOG({operand})")
-            self.add_assembly(f"LOG {temp_var}, {operand}")
-            return result
-        elif expr[0] in {"COS", "SIN", "TAN"}:
-            op, operand = expr
-            operand_value = self.evaluate(operand[0])  # Trigonometric functions are unary
-            temp_var = self.new_temp()
-            if op == "COS":
-                result = math.cos(math.radians(operand_value))
-                self.add_tac(f"{temp_var} = COS({operand_value})")
-                self.add_assembly(f"COS {temp_var}, {operand_value}")
-            elif op == "SIN":
-                result = math.sin(math.radians(operand_value))
-                self.add_tac(f"{temp_var} = SIN({operand_value})")
-                self.add_assembly(f"SIN {temp_var}, {operand_value}")
-            elif op == "TAN":
-                result = math.tan(math.radians(operand_value))
-                self.add_tac(f"{temp_var} = TAN({operand_value})")
-                self.add_assembly(f"TAN {temp_var}, {operand_value}")
-            return result
+class CodeGenerator:
+    def __init__(self, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", policy=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'")
+        if policy is not None and backend != "vm":
+            raise ValueError("Execution policies are only enforced by the vm backend")
+        self.optimize = optimize
+        self.backend = backend
+        self.policy = policy  # An ExecutionPolicy bounding every run, or None for the plain VM
+        self.runtime_errors = []  # (line, message) of statements skipped under a keep_going policy
+        self.registers = registers
+        self.variables = {}
+        self.ast = None
+        self.program = None  # Compiled bytecode, TAC and assembly are views over it
+        self.ir = None  # Optimized three-address code when optimize is set
+        self.optimization_report = ""
+        self.assembly_stats = {}
+        self.schedule_report = None  # ScheduleReport of the last parallel run
 
-    def add_tac(self, code):
-        self.tac.append(code)
+    def compile(self, ast):
+        self.ast = ast
+        if self.optimize:
+            self.ir, manager = ir.optimize(ir.build_ir(ast))
+            self.optimization_report = manager.format_report()
+            self.program = ir.lower(self.ir)
+        else:
+            self.program = compile_program(ast)
+        return self.program
 
-    def add_assembly(self, code):
-        self.assembly.append(code)
+    def execute(self, ast, symbol_table=None):
+        """Runs ``ast``; the JIT uses the analyzer's ``symbol_table`` for constants and typed fast paths."""
+        if self.backend == "jit":
+            self.ast = ast
+            output, self.variables = jit.compile_function(ast, symbol_table)()
+            return "\n".join(output)
+        if self.backend == "parallel":
+            # Independent statements run on worker processes; the output is the same as the VM's
+            self.ast = ast
+            scheduler = ParallelScheduler()
+            try:
+                return scheduler.execute(ast)
+            finally:
+                self.variables = scheduler.variables
+                self.schedule_report = scheduler.report
+        self.compile(ast)
+        vm = VirtualMachine(self.program) if self.policy is None else self.policy.machine(self.program)
+        try:
+            output = vm.run()  # Store results for PRINT statements
+        finally:
+            self.variables = {name: value for name, value in vm.variables().items() if not ir.is_temp(name)}
+            if self.policy is not None:
+                # Optimized programs may drop or merge statements, so only unoptimized ones map to lines
+                self.runtime_errors = [(None if self.optimize else ast[statement].line, message)
+                                       for statement, message in vm.errors]
+        return "\n".join(output)
 
-    def new_temp(self):
-        self.temp_counter += 1
-        return f"T{self.temp_counter}"
+    def ensure_compiled(self):
+        if self.program is None and self.ast is not None:
+            self.compile(self.ast)  # The JIT and parallel backends skip bytecode, build it for the views
 
     def get_tac(self):
-        return "\n".join(self.tac)
+        self.ensure_compiled()
+        if self.ir is not None:
+            return ir.format_tac(self.ir)
+        return self.program.tac() if self.program else ""
 
     def get_assembly(self):
-        return "\n".join(self.assembly)
+        if self.ast is None:
+            return ""
+        self.ensure_compiled()
+        instructions = self.ir if self.ir is not None else ir.build_ir(self.ast)
+        assembly, self.assembly_stats = generate_assembly(instructions, self.registers)
+        return assembly
+
+    def get_bytecode(self):
+        return self.program.disassemble() if self.program else ""
@@ -0,0 +1,252 @@
+"""Content-addressed cache for the artifacts of every compiler stage.
+
+Stage keys are chained so an edit only invalidates what it affects:
+
+* ``lex`` is keyed by the source text,
+* ``parse`` by the token kinds, values and lines (so re-spacing a line
+  reuses the AST),
+* ``semantic`` and ``codegen`` by the AST content and codegen options (so
+  adding blank lines reuses analysis and generated code).
+
+A ``manifest`` maps the source key to the token and AST keys, letting an
+unchanged program go straight to its cached code generation result.
+Artifacts are kept in an in-memory LRU and, when a directory is given, in a
+size-capped on-disk store evicted least-recently-used first.
+"""
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator
+from assembler import DEFAULT_REGISTERS
+from version import COMPILER_VERSION
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 512
+STAGES = ("manifest", "lex", "parse", "semantic", "codegen")
+
+
+class CompilationCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hits = dict.fromkeys(STAGES, 0)
+        self.misses = dict.fromkeys(STAGES, 0)
+        self.disk_bytes = 0
+        if directory:
+            # The directory itself is only created by the first write
+            self.disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def key(self, *parts):
+        digest = hashlib.sha256(COMPILER_VERSION.encode())
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, stage, key):
+        entry = (stage, key)
+        if entry in self.memory:
+            self.memory.move_to_end(entry)
+            self.hits[stage] += 1
+            return self.memory[entry]
+        value = self._load(stage, key)
+        if value is None:
+            self.misses[stage] += 1
+            return None
+        self.hits[stage] += 1
+        self._remember(entry, value)
+        return value
+
+    def put(self, stage, key, value):
+        self._remember((stage, key), value)
+        if self.directory:
+            self._store(stage, key, value)
+
+    def _remember(self, entry, value):
+        self.memory[entry] = value
+        self.memory.move_to_end(entry)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, stage, key):
+        return os.path.join(self.directory, stage, key[:2], key + ".pkl")
+
+    def _load(self, stage, key):
+        if not self.directory:
+            return None
+        path = self._path(stage, key)
+        try:
+            with open(path, "rb") as artifact:
+                value = pickle.load(artifact)
+            os.utime(path)  # Mark as recently used for LRU eviction
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store(self, stage, key, value):
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            replaced = os.path.getsize(path)  # An existing entry for the key is overwritten
+        except OSError:
+            replaced = 0
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as artifact:
+            artifact.write(data)
+        os.replace(temp_path, path)  # Atomic, so concurrent workers never see half a file
+        self.disk_bytes += len(data) - replaced
+        if self.disk_bytes > self.max_bytes:
+            self.evict()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        status = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, status.st_mtime, status.st_size
+
+    def evict(self):
+        """Deletes least-recently-used artifacts until the store is under 90% of its cap."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        self.disk_bytes = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if self.disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+
+    def stats(self):
+        return {"hits": dict(self.hits), "misses": dict(self.misses),
+                "memory_entries": len(self.memory), "disk_bytes": self.disk_bytes}
+
+
+class CachedCompilation:
+    """Runs the pipeline through a CompilationCache, loading tokens and AST only when needed."""
+
+    def __init__(self, code, cache, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", policy=None):
+        self.code = code
+        self.cache = cache
+        self.options = (optimize, registers, backend)
+        self.policy = policy
+        self.timings = {}
+        self.source_key = cache.key("source", code)
+        self._tokens = self._ast = None
+        self.token_key = self.ast_key = None
+        self.symbol_table = None
+        self.generated = None
+
+    def cached(self):
+        """Loads the final results of an unchanged program; True when nothing has to run."""
+        manifest = self.cache.get("manifest", self.source_key)
+        if manifest is None:
+            return False
+        self.token_key, self.ast_key = manifest
+        start = time.perf_counter()
+        self.generated = self.cache.get("codegen", self.codegen_key())
+        self.symbol_table = self.cache.get("semantic", self.ast_key)
+        self.timings["cache"] = time.perf_counter() - start
+        return self.generated is not None and self.symbol_table is not None
+
+    def run(self):
+        if self.cached():
+            return self
+        self.tokens()
+        ast = self.ast()
+        start = time.perf_counter()
+        if self.symbol_table is None:
+            self.symbol_table = self.cache.get("semantic", self.ast_key)
+        if self.symbol_table is None:
+            analyzer = SemanticAnalyzer(ast)
+            analyzer.analyze()
+            self.symbol_table = analyzer.symbol_table
+            self.cache.put("semantic", self.ast_key, self.symbol_table)
+        self.timings["semantic"] = time.perf_counter() - start
+        start = time.perf_counter()
+        if self.generated is None:
+            self.generated = self.cache.get("codegen", self.codegen_key())
+        if self.generated is None:
+            optimize, registers, backend = self.options
+            generator = CodeGenerator(optimize=optimize, registers=registers, backend=backend, policy=self.policy)
+            output = generator.execute(ast, self.symbol_table)
+            assembly = generator.get_assembly()
+            self.generated = {
+                "output": output,
+                "tac": generator.get_tac(),
+                "assembly": assembly,
+                "assembly_stats": generator.assembly_stats,
+                "optimization_report": generator.optimization_report,
+                "runtime_errors": generator.runtime_errors,
+            }
+            self.cache.put("codegen", self.codegen_key(), self.generated)
+        self.timings["codegen"] = time.perf_counter() - start
+        self.cache.put("manifest", self.source_key, (self.token_key, self.ast_key))
+        return self
+
+    def store(self, tokens, ast, symbol_table, generated):
+        """Records results produced outside the cache, e.g. by the incremental compiler."""
+        self._tokens = tokens
+        self.token_key = self.cache.key("tokens", [(token[0], token[1], token[2]) for token in tokens])
+        self.cache.put("lex", self.source_key, (tokens, self.token_key))
+        self._ast = ast
+        self.ast_key = self.cache.key("ast", repr(ast))
+        self.cache.put("parse", self.token_key, (ast, self.ast_key))
+        self.symbol_table = symbol_table
+        self.cache.put("semantic", self.ast_key, symbol_table)
+        self.generated = generated
+        self.cache.put("codegen", self.codegen_key(), generated)
+        self.cache.put("manifest", self.source_key, (self.token_key, self.ast_key))
+
+    def codegen_key(self):
+        if self.policy is None:
+            return self.cache.key("codegen", self.ast_key, *self.options)
+        policy_key = self.policy.output_key()
+        if self.policy.keep_going:
+            # Skipped statements are reported by line, which the AST key leaves out
+            policy_key += (self.source_key,)
+        return self.cache.key("codegen", self.ast_key, *self.options, *policy_key)
+
+    def tokens(self):
+        if self._tokens is None:
+            start = time.perf_counter()
+            lexed = self.cache.get("lex", self.source_key)
+            if lexed is None:
+                tokens = Lexer(self.code).tokenize()
+                # Columns are left out so re-spacing a line keeps the parse stage cached
+                token_key = self.cache.key("tokens", [(token[0], token[1], token[2]) for token in tokens])
+                lexed = (tokens, token_key)
+                self.cache.put("lex", self.source_key, lexed)
+            self._tokens, self.token_key = lexed
+            self.timings["lex"] = time.perf_counter() - start
+        return self._tokens
+
+    def ast(self):
+        if self._ast is None:
+            tokens = self.tokens()
+            start = time.perf_counter()
+            parsed = self.cache.get("parse", self.token_key)
+            if parsed is None:
+                ast = Parser(tokens).parse()
+                # Line numbers are left out so blank-line edits keep later stages cached
+                parsed = (ast, self.cache.key("ast", repr(ast)))
+                self.cache.put("parse", self.token_key, parsed)
+            self._ast, self.ast_key = parsed
+            self.timings["parse"] = time.perf_counter() - start
+        return self._ast
@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator, BACKENDS
+from assembler import DEFAULT_REGISTERS, format_stats
+from compile_cache import CompilationCache, CachedCompilation
+from diagnostics import CompileError, collecting
+from policy import ExecutionPolicy, NUMERIC_BACKENDS, DEFAULT_PRECISION
+from streaming import StreamingCompiler
+from artifact import EXTENSION as ARTIFACT_EXTENSION, ArtifactError, load_artifact, write_artifact
+from bytecode import VirtualMachine
+
+SOURCE_EXTENSIONS = (".txt", ".src")
+
+_caches = {}  # One CompilationCache per cache directory in each process
+
+
+def get_cache(directory):
+    if directory not in _caches:
+        _caches[directory] = CompilationCache(directory)
+    return _caches[directory]
+
+
+def compile_source(code, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", cache=None, policy=None):
+    """Runs the full pipeline on a source string and returns its results.
+
+    Lexical, syntax and semantic errors are raised together as one CompileError.
+    """
+    with collecting(code):
+        return _run_pipeline(code, optimize, registers, backend, cache, policy)
+
+
+def _run_pipeline(code, optimize, registers, backend, cache, policy):
+    if cache is not None:
+        compilation = CachedCompilation(code, cache, optimize, registers, backend, policy).run()
+        return dict(compilation.generated, timings=compilation.timings)
+
+    timings = {}
+
+    start = time.perf_counter()
+    tokens = Lexer(code).tokenize()
+    timings["lex"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ast = Parser(tokens).parse()
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    symbol_table = SemanticAnalyzer(ast).analyze()
+    timings["semantic"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generator = CodeGenerator(optimize=optimize, registers=registers, backend=backend, policy=policy)
+    output = generator.execute(ast, symbol_table)
+    timings["codegen"] = time.perf_counter() - start
+
+    assembly = generator.get_assembly()
+    return {
+        "program": generator.program,  # Only without a cache, which stores the rendered views
+        "output": output,
+        "tac": generator.get_tac(),
+        "assembly": assembly,
+        "assembly_stats": generator.assembly_stats,
+        "optimization_report": generator.optimization_report,
+        "runtime_errors": generator.runtime_errors,
+        "timings": timings,
+    }
+
+
+def compile_file(source_path, out_dir, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", cache_dir=None,
+                 profile=False, policy=None, stream=False, artifact=False, name=None):
+    """Compiles one file and writes its .out, .tac and .asm (and .opt) files to out_dir.
+
+    ``name`` is the output path below out_dir without an extension; it defaults to the
+    source's base name.
+
+    With ``profile`` the pipeline runs under the profiler (bypassing the cache) and the
+    result carries its report; the profiler's VM has no limits, so ``profile`` cannot be
+    combined with ``policy``. With ``stream`` the file goes through the StreamingCompiler,
+    which writes the files as it goes. With ``artifact`` the compiled program is also saved
+    as a .cco file, bypassing the cache.
+    """
+    if profile and policy is not None:
+        raise ValueError("Profiled runs cannot apply an execution policy")
+    start = time.perf_counter()
+    if name is None:
+        name = os.path.splitext(os.path.basename(source_path))[0]
+    base = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    if stream:
+        return _compile_streaming(source_path, base, registers, policy, start)
+    report = None
+    try:
+        with open(source_path, "r") as source_file:
+            code = source_file.read()
+        if profile:
+            from profiler import profile_source
+            with collecting(code):
+                result, profiler = profile_source(code, optimize, registers, backend)
+            report = profiler.report()
+        else:
+            cache = get_cache(cache_dir) if cache_dir and not artifact else None
+            result = compile_source(code, optimize, registers, backend, cache, policy)
+    except CompileError as e:
+        return {"file": source_path, "ok": False, "error": str(e.diagnostics[0]),
+                "diagnostics": [diagnostic.to_dict() for diagnostic in e.diagnostics],
+                "total": time.perf_counter() - start}
+    except Exception as e:
+        return {"file": source_path, "ok": False, "error": str(e), "total": time.perf_counter() - start}
+
+    with open(base + ".out", "w") as out_file:
+        out_file.write(result["output"] + "\n")
+    with open(base + ".tac", "w") as tac_file:
+        tac_file.write(result["tac"] + "\n")
+    assembly = result["assembly"] + "\n" + format_stats(result["assembly_stats"]) + "\n"
+    with open(base + ".asm", "w") as asm_file:
+        asm_file.write(assembly)
+    if artifact:
+        write_artifact(base + ARTIFACT_EXTENSION, result["program"], result["tac"], assembly, optimize)
+    if result["optimization_report"]:
+        with open(base + ".opt", "w") as opt_file:
+            opt_file.write(result["optimization_report"] + "\n")
+    outcome = {"file": source_path, "ok": True, "timings": result["timings"], "total": time.perf_counter() - start}
+    if report is not None:
+        outcome["profile"] = report
+    if result.get("runtime_errors"):
+        outcome["runtime_errors"] = result["runtime_errors"]
+    return outcome
+
+
+def _compile_streaming(source_path, base, registers, policy, start):
+    compiler = StreamingCompiler(registers=registers, policy=policy)
+    try:
+        timings = compiler.compile_file(source_path, base)
+    except Exception as e:
+        # The files keep what was written before the failing statement
+        return {"file": source_path, "ok": False, "error": str(e), "total": time.perf_counter() - start}
+    outcome = {"file": source_path, "ok": True, "timings": timings, "total": time.perf_counter() - start}
+    if compiler.runtime_errors:
+        outcome["runtime_errors"] = compiler.runtime_errors
+    return outcome
+
+
+def run_artifact(path, policy=None):
+    """Runs a .cco file without compiling; returns (output lines, (statement, message) runtime errors).
+
+    Statements are numbered from 1, and are None for optimized programs, like lines in a build.
+    """
+    with load_artifact(path) as artifact:
+        vm = VirtualMachine(artifact.program) if policy is None else policy.machine(artifact.program)
+        output = vm.run()
+        optimized = artifact.optimized
+    errors = getattr(vm, "errors", ())
+    return output, [(None if optimized else statement + 1, message) for statement, message in errors]
+
+
+def collect_sources(paths):
+    """Expands files and directories into sorted (source file, output name) pairs.
+
+    Files found in a directory keep their path below it in the output name, so ``a/x.src`` and
+    ``a/sub/x.src`` do not overwrite each other. Two sources that would still share an output
+    name, e.g. the same file name given from two directories, raise a ValueError.
+    """
+    sources = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in files:
+                    if file_name.endswith(SOURCE_EXTENSIONS):
+                        source = os.path.join(root, file_name)
+                        sources[source] = os.path.splitext(os.path.relpath(source, path))[0]
+        else:
+            sources[path] = os.path.splitext(os.path.basename(path))[0]
+    owners = {}
+    for source, name in sorted(sources.items()):
+        other = owners.setdefault(os.path.normcase(name), source)
+        if other != source:
+            raise ValueError(f"{other} and {source} would both write {name}.out; build them separately")
+    return sorted(sources.items())
+
+
+def build(paths, out_dir, jobs, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", cache_dir=None,
+          profile=False, policy=None, stream=False, artifact=False):
+    """Compiles every source file, fanning out over a process pool when jobs > 1."""
+    os.makedirs(out_dir, exist_ok=True)
+    sources = collect_sources(paths)
+    if jobs <= 1 or len(sources) <= 1:
+        return [compile_file(path, out_dir, optimize, registers, backend, cache_dir, profile, policy, stream,
+                             artifact, name) for path, name in sources]
+    names = [name for _, name in sources]
+    sources = [path for path, _ in sources]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(compile_file, sources, [out_dir] * len(sources), [optimize] * len(sources),
+                             [registers] * len(sources), [backend] * len(sources),
+                             [cache_dir] * len(sources), [profile] * len(sources), [policy] * len(sources),
+                             [stream] * len(sources), [artifact] * len(sources), names,
+                             chunksize=max(1, len(sources) // (jobs * 4))))
+
+
+def print_report(results):
+    failures = 0
+    for result in results:
+        if result["ok"]:
+            phases = " ".join(f"{name}={seconds * 1000:.2f}ms" for name, seconds in result["timings"].items())
+            print(f"OK   {result['file']} ({result['total'] * 1000:.2f}ms) {phases}")
+            for line, message in result.get("runtime_errors", ()):
+                print(f"  {result['file']}:{line if line is not None else '?'}: runtime error, statement skipped: "
+                      f"{message}")
+        else:
+            failures += 1
+            diagnostics = result.get("diagnostics")
+            if diagnostics:
+                print(f"FAIL {result['file']} ({result['total'] * 1000:.2f}ms) {len(diagnostics)} errors")
+                for diagnostic in diagnostics:
+                    print(f"  {result['file']}:{diagnostic['line']}:{diagnostic['column']}: "
+                          f"{diagnostic['stage']} error: {diagnostic['message']}")
+            else:
+                print(f"FAIL {result['file']} ({result['total'] * 1000:.2f}ms) Error: {result['error']}")
+    print(f"{len(results) - failures} succeeded, {failures} failed")
+    return failures
+
+
+def add_policy_arguments(command):
+    command.add_argument("--max-steps", type=int, help="Stop a program after this many VM instructions")
+    command.add_argument("--max-seconds", type=float, help="Stop a program after this much wall time")
+    command.add_argument("--max-int-bits", type=int, help="Refuse integer results bigger than this many bits")
+    command.add_argument("--numbers", choices=sorted(NUMERIC_BACKENDS), default="python",
+                         help="Numeric backend: python ints and floats, float64, exact fractions or decimal")
+    command.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                         help="Significant digits for --numbers decimal")
+    command.add_argument("--keep-going", action="store_true",
+                         help="Skip statements that fail at run time instead of stopping")
+
+
+def policy_from_args(args):
+    """An ExecutionPolicy when any limit or numeric option is set, else None for the plain VM."""
+    if (args.max_steps is None and args.max_seconds is None and args.max_int_bits is None
+            and args.numbers == "python" and not args.keep_going):
+        return None
+    return ExecutionPolicy(args.max_steps, args.max_seconds, args.max_int_bits, args.numbers, args.precision,
+                           args.keep_going)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="compiler", description="Headless compiler for the custom language.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    build_command = commands.add_parser("build", help="Compile source files or directories")
+    build_command.add_argument("paths", nargs="+", help="Source files or directories to compile")
+    build_command.add_argument("-o", "--out-dir", default="build", help="Directory for .out, .tac and .asm files")
+    build_command.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    build_command.add_argument("-O", "--optimize", action="store_true", help="Run the IR optimization passes")
+    build_command.add_argument("-r", "--registers", type=int, default=DEFAULT_REGISTERS,
+                               help="Number of physical registers for the assembly backend")
+    build_command.add_argument("-b", "--backend", choices=BACKENDS, default="vm",
+                               help="Execute with the bytecode VM, compiled Python functions, or the VM with "
+                                    "independent statements run in parallel on worker processes")
+    build_command.add_argument("--cache-dir", help="Reuse stage artifacts from this compilation cache directory")
+    build_command.add_argument("--profile", metavar="FILE",
+                               help="Profile every file (phases, memory, opcodes) and write the reports as JSON")
+    add_policy_arguments(build_command)
+    build_command.add_argument("--stream", action="store_true",
+                               help="Compile each file in batches of statements with bounded memory, "
+                                    "writing the output files as it goes")
+    build_command.add_argument("--artifact", action="store_true",
+                               help=f"Also save each compiled program as a {ARTIFACT_EXTENSION} file for 'run'")
+
+    run_command = commands.add_parser("run", help=f"Run a compiled {ARTIFACT_EXTENSION} file without compiling")
+    run_command.add_argument("path", help=f"The {ARTIFACT_EXTENSION} file written by 'build --artifact'")
+    add_policy_arguments(run_command)
+
+    args = arg_parser.parse_args(argv)
+    policy = policy_from_args(args)
+    if args.command == "run":
+        try:
+            output, errors = run_artifact(args.path, policy)
+        except ArtifactError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        except Exception as e:
+            print(f"{args.path}: Error: {e}", file=sys.stderr)
+            return 1
+        for line in output:
+            print(line)
+        for statement, message in errors:
+            print(f"{args.path}: statement {statement if statement is not None else '?'}: runtime error, "
+                  f"statement skipped: {message}", file=sys.stderr)
+        return 0
+    if args.command == "build":
+        if policy is not None and args.backend != "vm":
+            arg_parser.error("execution limits and numeric backends need --backend vm")
+        if args.stream and (args.optimize or args.backend != "vm" or args.cache_dir or args.profile
+                            or args.artifact):
+            arg_parser.error("--stream cannot be combined with --optimize, --backend jit or parallel, --cache-dir, "
+                             "--profile or --artifact")
+        if args.artifact and args.profile:
+            arg_parser.error("--artifact cannot be combined with --profile")
+        if policy is not None and args.profile:
+            arg_parser.error("execution limits and numeric backends cannot be combined with --profile")
+        try:
+            results = build(args.paths, args.out_dir, args.jobs, args.optimize, args.registers, args.backend,
+                            args.cache_dir, profile=bool(args.profile), policy=policy, stream=args.stream,
+                            artifact=args.artifact)
+        except ValueError as e:
+            arg_parser.error(str(e))
+        if args.profile:
+            reports = {result["file"]: result.get("profile", {"error": result.get("error")}) for result in results}
+            with open(args.profile, "w") as profile_file:
+                json.dump(reports, profile_file, indent=2)
+        return 1 if print_report(results) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Every lexical, syntax and semantic error of a program in one pass.
+
+The normal pipeline stops at the first error. ``check`` runs the front end
+again with recovery switched on: the lexer skips bad characters, the parser
+resyncs at the next VAR, PRINT or ``name =`` after a bad statement, and the
+analyzer reports each undeclared or redeclared name and keeps going. It only
+runs once a compile has already failed, so error-free compiles pay nothing
+for it.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+
+LEXICAL = "lexical"
+SYNTAX = "syntax"
+SEMANTIC = "semantic"
+
+
+class Diagnostic(namedtuple("Diagnostic", ["stage", "line", "column", "message"])):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.line}:{self.column}: {self.stage} error: {self.message}"
+
+    def to_dict(self):
+        return dict(self._asdict())
+
+
+class CompileError(Exception):
+    """Raised with every diagnostic of a program that failed to compile."""
+
+    def __init__(self, diagnostics):
+        super().__init__("\n".join(str(diagnostic) for diagnostic in diagnostics))
+        self.diagnostics = diagnostics
+
+
+def check(code):
+    """Returns the diagnostics of ``code`` sorted by position; empty when the front end accepts it."""
+    lex_errors = []
+    tokens = Lexer(code, errors=lex_errors).tokenize()
+    diagnostics = [Diagnostic(LEXICAL, line, column, message) for line, column, message in lex_errors]
+
+    syntax_errors = []
+    parser = Parser(tokens, errors=syntax_errors)
+    ast = parser.parse()
+    diagnostics.extend(Diagnostic(SYNTAX, line, column, message) for line, column, message in syntax_errors)
+
+    semantic_errors = []
+    SemanticAnalyzer(ast, errors=semantic_errors).analyze()
+    starts = parser.statement_starts
+    for index, name, target, message in semantic_errors:
+        line, column = _position(tokens, starts[index], name, target)
+        diagnostics.append(Diagnostic(SEMANTIC, line, column, message))
+
+    diagnostics.sort(key=lambda diagnostic: (diagnostic.line, diagnostic.column))
+    return diagnostics
+
+
+def _position(tokens, start, name, target):
+    """Line and column of ``name`` in the statement starting at tokens[start].
+
+    The assigned name is the first ID of its statement; a use is the first one after the '='.
+    """
+    index = start
+    if not target and tokens[start][0] != "PRINT":
+        while tokens[index][0] != "ASSIGN":
+            index += 1
+    while index < len(tokens):
+        token = tokens[index]
+        if token[0] == "ID" and token[1] == name:
+            return token[2], token[3]
+        index += 1
+    return tokens[start][2], tokens[start][3]
+
+
+@contextmanager
+def collecting(code):
+    """Re-raises a front-end error from the block as a CompileError with every diagnostic of ``code``.
+
+    Errors that recovery does not find again, e.g. from execution, pass through unchanged.
+    """
+    try:
+        yield
+    except (SyntaxError, RuntimeError) as error:
+        diagnostics = check(code)
+        if not diagnostics:
+            raise
+        raise CompileError(diagnostics) from error
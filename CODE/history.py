@@ -0,0 +1,293 @@
+"""Code history backed by SQLite.
+
+Every run is a row in ``runs`` with its timestamp, duration and error, and
+points at its program in ``sources``, which holds each distinct program once,
+keyed by content hash. Retention keeps the newest ``max_runs`` runs and drops
+programs no run refers to any more. Substring search uses an FTS5 trigram
+index when the SQLite build has one and falls back to ``instr`` otherwise.
+Old ``code_history.txt`` files can be imported.
+"""
+import calendar
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+DEFAULT_HISTORY_PATH = "code_history.db"
+DEFAULT_MAX_RUNS = 10_000
+TEXT_HISTORY_MARKER = re.compile(r"^--- (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ---$", re.MULTILINE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    code TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    timestamp REAL NOT NULL,
+    duration REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs(timestamp);
+CREATE INDEX IF NOT EXISTS runs_source ON runs(source_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def source_hash(code):
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class HistoryEntry:
+    __slots__ = ("run_id", "timestamp", "duration", "error", "hash", "code")
+
+    def __init__(self, run_id, timestamp, duration, error, hash, code):
+        self.run_id = run_id
+        self.timestamp = timestamp
+        self.duration = duration
+        self.error = error
+        self.hash = hash
+        self.code = code
+
+    def summary(self):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.timestamp))
+        status = "error" if self.error else "ok"
+        duration = f"{self.duration * 1000:.0f} ms" if self.duration is not None else "-"
+        first_line = self.code.split("\n", 1)[0]
+        return f"{when}  {status:<5}  {duration:>8}  {first_line}"
+
+
+class HistoryStore:
+    def __init__(self, path=DEFAULT_HISTORY_PATH, max_runs=DEFAULT_MAX_RUNS):
+        self.path = path
+        self.max_runs = max_runs
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.full_text = self._create_text_index()
+
+    def _create_text_index(self):
+        exists = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sources_text'").fetchone()
+        if exists:
+            return True
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "CREATE VIRTUAL TABLE sources_text USING fts5("
+                    "code, content='sources', content_rowid='id', tokenize='trigram')")
+                # Index programs stored before the index existed
+                self.connection.execute("INSERT INTO sources_text (sources_text) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError:  # No FTS5 or no trigram tokenizer in this SQLite build
+            return False
+
+    def close(self):
+        self.connection.close()
+
+    def _source_id(self, code):
+        digest = source_hash(code)
+        row = self.connection.execute("SELECT id FROM sources WHERE hash = ?", (digest,)).fetchone()
+        if row:
+            return row[0]
+        source_id = self.connection.execute("INSERT INTO sources (hash, code) VALUES (?, ?)",
+                                            (digest, code)).lastrowid
+        if self.full_text:
+            self.connection.execute("INSERT INTO sources_text (rowid, code) VALUES (?, ?)", (source_id, code))
+        return source_id
+
+    def record(self, code, duration=None, error=None, timestamp=None):
+        """Records one run of ``code``; returns the run id."""
+        with self.connection:
+            source_id = self._source_id(code)
+            run_id = self.connection.execute(
+                "INSERT INTO runs (source_id, timestamp, duration, error) VALUES (?, ?, ?, ?)",
+                (source_id, time.time() if timestamp is None else timestamp, duration,
+                 None if error is None else str(error))).lastrowid
+            self._prune()
+        return run_id
+
+    def _prune(self):
+        cutoff = self.connection.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?",
+                                         (self.max_runs,)).fetchone()
+        if cutoff is None:
+            return
+        self.connection.execute("DELETE FROM runs WHERE id <= ?", cutoff)
+        orphans = self.connection.execute(
+            "SELECT id, code FROM sources WHERE NOT EXISTS "
+            "(SELECT 1 FROM runs WHERE runs.source_id = sources.id)").fetchall()
+        if self.full_text:
+            self.connection.executemany(
+                "INSERT INTO sources_text (sources_text, rowid, code) VALUES ('delete', ?, ?)", orphans)
+        self.connection.executemany("DELETE FROM sources WHERE id = ?", [(source_id,) for source_id, _ in orphans])
+
+    def query(self, start=None, end=None, text=None, limit=200):
+        """Newest-first runs with ``start <= timestamp < end`` whose program contains ``text``."""
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append("runs.timestamp >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("runs.timestamp < ?")
+            parameters.append(end)
+        if text:
+            if self.full_text and len(text) >= 3:  # Trigrams need at least three characters
+                conditions.append("runs.source_id IN (SELECT rowid FROM sources_text WHERE sources_text MATCH ?)")
+                parameters.append('"' + text.replace('"', '""') + '"')
+            else:
+                conditions.append("instr(lower(sources.code), lower(?)) > 0")
+                parameters.append(text)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            "SELECT runs.id, runs.timestamp, runs.duration, runs.error, sources.hash, sources.code "
+            f"FROM runs JOIN sources ON sources.id = runs.source_id {where} "
+            "ORDER BY runs.timestamp DESC, runs.id DESC LIMIT ?", (*parameters, limit)).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def stats(self):
+        runs, sources = self.connection.execute(
+            "SELECT (SELECT count(*) FROM runs), (SELECT count(*) FROM sources)").fetchone()
+        return {"runs": runs, "sources": sources, "full_text": self.full_text}
+
+    def import_text_history(self, path):
+        """Imports a ``code_history.txt`` file once; returns the number of runs added."""
+        status = os.stat(path)
+        key = f"imported:{os.path.abspath(path)}"
+        stamp = f"{status.st_size}:{status.st_mtime_ns}"
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row and row[0] == stamp:
+            return 0
+        with open(path, "r") as history_file:
+            text = history_file.read()
+        markers = list(TEXT_HISTORY_MARKER.finditer(text))
+        added = 0
+        with self.connection:
+            for marker, following in zip(markers, markers[1:] + [None]):
+                code = text[marker.end() + 1:following.start() if following else len(text)].rstrip("\n")
+                # The old file stored UTC timestamps
+                timestamp = calendar.timegm(time.strptime(marker.group(1), "%Y-%m-%d %H:%M:%S"))
+                source_id = self._source_id(code)
+                exists = self.connection.execute("SELECT 1 FROM runs WHERE source_id = ? AND timestamp = ?",
+                                                 (source_id, timestamp)).fetchone()
+                if not exists:
+                    self.connection.execute("INSERT INTO runs (source_id, timestamp) VALUES (?, ?)",
+                                            (source_id, timestamp))
+                    added += 1
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, stamp))
+            self._prune()
+        return added
+
+
+class HistoryBrowser:
+    """A reusable window for searching the history and loading a program back into the editor."""
+
+    def __init__(self, master, store, load_callback):
+        self.master = master
+        self.store = store
+        self.load_callback = load_callback
+        self.window = None
+        self.entries = []
+
+    def show(self):
+        import tkinter as tk
+        if self.window is not None and self.window.winfo_exists():
+            self.window.deiconify()
+            self.window.lift()
+            self.refresh()
+            return
+        self.window = tk.Toplevel(self.master)
+        self.window.title("Code History")
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)
+
+        filters = tk.Frame(self.window)
+        filters.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(filters, text="Contains:").pack(side=tk.LEFT)
+        self.text_entry = tk.Entry(filters, width=24)
+        self.text_entry.pack(side=tk.LEFT, padx=(0, 10))
+        tk.Label(filters, text="From (YYYY-MM-DD):").pack(side=tk.LEFT)
+        self.start_entry = tk.Entry(filters, width=11)
+        self.start_entry.pack(side=tk.LEFT, padx=(0, 10))
+        tk.Label(filters, text="To:").pack(side=tk.LEFT)
+        self.end_entry = tk.Entry(filters, width=11)
+        self.end_entry.pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(filters, text="Search", command=self.refresh).pack(side=tk.LEFT)
+        for entry in (self.text_entry, self.start_entry, self.end_entry):
+            entry.bind("<Return>", lambda event: self.refresh())
+
+        self.listbox = tk.Listbox(self.window, font=("Consolas", 10), width=100, height=15)
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.listbox.bind("<<ListboxSelect>>", lambda event: self.preview_selected())
+        self.listbox.bind("<Double-Button-1>", lambda event: self.load_selected())
+        self.preview = tk.Text(self.window, font=("Consolas", 10), height=12, state=tk.DISABLED)
+        self.preview.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        buttons = tk.Frame(self.window)
+        buttons.pack(fill=tk.X, padx=5, pady=(0, 5))
+        tk.Button(buttons, text="Load into Editor", command=self.load_selected).pack(side=tk.LEFT)
+        self.status = tk.Label(buttons)
+        self.status.pack(side=tk.RIGHT)
+        self.refresh()
+
+    def _day(self, entry, offset=0):
+        value = entry.get().strip()
+        if not value:
+            return None
+        try:
+            return time.mktime(time.strptime(value, "%Y-%m-%d")) + offset
+        except ValueError:
+            return None
+
+    def refresh(self):
+        import tkinter as tk
+        self.entries = self.store.query(start=self._day(self.start_entry), end=self._day(self.end_entry, 86400),
+                                        text=self.text_entry.get().strip() or None)
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *[entry.summary() for entry in self.entries])
+        stats = self.store.stats()
+        self.status.configure(text=f"{len(self.entries)} shown, {stats['runs']} runs of {stats['sources']} programs")
+
+    def selected(self):
+        selection = self.listbox.curselection()
+        return self.entries[selection[0]] if selection else None
+
+    def preview_selected(self):
+        import tkinter as tk
+        entry = self.selected()
+        if entry is None:
+            return
+        self.preview.configure(state=tk.NORMAL)
+        self.preview.delete("1.0", tk.END)
+        self.preview.insert(tk.END, entry.code + (f"\n\nError: {entry.error}" if entry.error else ""))
+        self.preview.configure(state=tk.DISABLED)
+
+    def load_selected(self):
+        entry = self.selected()
+        if entry is not None:
+            self.load_callback(entry.code)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arguments = argparse.ArgumentParser(description="Inspect or import the code history")
+    arguments.add_argument("--db", default=DEFAULT_HISTORY_PATH)
+    commands = arguments.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import code_history.txt files")
+    importer.add_argument("files", nargs="+")
+    search = commands.add_parser("search", help="list runs, newest first")
+    search.add_argument("text", nargs="?")
+    search.add_argument("--limit", type=int, default=50)
+    options = arguments.parse_args()
+
+    store = HistoryStore(options.db)
+    if options.command == "import":
+        for path in options.files:
+            print(f"{path}: {store.import_text_history(path)} runs imported")
+    else:
+        for entry in store.query(text=options.text, limit=options.limit):
+            print(entry.summary())
+    store.close()
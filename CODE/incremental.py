@@ -0,0 +1,187 @@
+"""Incremental recompilation for the IDE.
+
+The previous run's lines, statements, per-statement tokens and periodic
+execution checkpoints are kept. On the next run only the region between the
+unchanged prefix and the unchanged suffix of lines is re-lexed and re-parsed;
+parsing stops as soon as it reaches a statement that starts in the unchanged
+suffix, and the old statements from there on are reused with their line
+numbers shifted. Semantic analysis and execution resume from the last
+checkpoint before the first affected statement.
+"""
+from bisect import bisect_right
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator
+from bytecode import compile_program, VirtualMachine
+from ast_nodes import Statement
+
+CHECKPOINT_INTERVAL = 1024  # Statements between execution checkpoints
+
+
+class _RecordingIterator:
+    """Token iterator that remembers every token handed to the parser."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.seen = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = next(self.tokens)
+        self.seen.append(token)
+        return token
+
+
+class Checkpoint:
+    __slots__ = ("symbol_table", "variables", "output_length")
+
+    def __init__(self, symbol_table, variables, output_length):
+        self.symbol_table = symbol_table
+        self.variables = variables
+        self.output_length = output_length
+
+
+class IncrementalResult:
+    def __init__(self, statements, statement_tokens, output, symbol_table, stats):
+        self.ast = statements
+        self.statement_tokens = statement_tokens
+        self.output = output
+        self.symbol_table = symbol_table
+        self.stats = stats
+        self._generator = None
+
+    @property
+    def tokens(self):
+        return [token for tokens in self.statement_tokens for token in tokens]
+
+    def generator(self):
+        """A CodeGenerator over the whole program, used only for the TAC and assembly views."""
+        if self._generator is None:
+            self._generator = CodeGenerator()
+            self._generator.ast = self.ast
+        return self._generator
+
+    def get_tac(self):
+        return self.generator().get_tac()
+
+    def get_assembly(self):
+        return self.generator().get_assembly()
+
+
+class IncrementalCompiler:
+    def __init__(self, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+        self.lines = None
+        self.statements = []
+        self.statement_tokens = []
+        self.checkpoints = []  # checkpoints[m] is the state before statement m * checkpoint_interval
+        self.output = []
+        self.symbol_table = {}
+        self.result = None
+
+    def compile(self, code):
+        """Compiles ``code`` reusing the previous run; raises like the batch pipeline on errors."""
+        lines = code.split("\n")
+        if lines == self.lines and self.result is not None:
+            return self.result
+        first, statements, statement_tokens, stats = self.reparse(lines)
+        output, symbol_table, checkpoints = self.execute(statements, first)
+
+        # Only commit the new state once every stage succeeded
+        self.lines = lines
+        self.statements = statements
+        self.statement_tokens = statement_tokens
+        self.output = output
+        self.symbol_table = symbol_table
+        self.checkpoints = checkpoints
+        stats["resumed_from"] = first
+        self.result = IncrementalResult(statements, statement_tokens, "\n".join(output), symbol_table, stats)
+        return self.result
+
+    def reparse(self, lines):
+        old_lines = self.lines or []
+        limit = min(len(old_lines), len(lines))
+        prefix = 0
+        while prefix < limit and old_lines[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_lines[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+        delta = len(lines) - len(old_lines)
+        suffix_start = len(lines) - suffix  # Lines after this (1-based) are unchanged
+
+        # The last statement starting before the edit may run into it, so it is reparsed too,
+        # along with any statement sharing its line
+        old = self.statements
+        first = max(bisect_right([statement.line for statement in old], prefix) - 1, 0)
+        while 0 < first < len(old) and old[first - 1].line == old[first].line:
+            first -= 1
+        start_line = old[first].line if first < len(old) else 1
+
+        old_starts = {}
+        for index in range(first, len(old)):
+            token = self.statement_tokens[index][0]
+            old_starts[(token.line, token.column)] = index
+
+        tokens = _RecordingIterator(Lexer("\n".join(lines[start_line - 1:]), line=start_line).iter_tokens())
+        parser = Parser(tokens)
+        new_statements = []
+        new_tokens = []
+        resync = None
+        while parser.current_token:
+            token = parser.current_token
+            if token.line > suffix_start:
+                resync = old_starts.get((token.line - delta, token.column))
+                if resync is not None:
+                    break
+            begin = len(tokens.seen) - 1
+            new_statements.append(parser.statement())
+            end = len(tokens.seen) - 1 if parser.current_token else len(tokens.seen)
+            new_tokens.append(tokens.seen[begin:end])
+
+        statements = old[:first] + new_statements
+        statement_tokens = self.statement_tokens[:first] + new_tokens
+        reused_suffix = 0
+        if resync is not None:
+            reused_suffix = len(old) - resync
+            for index in range(resync, len(old)):
+                statement = old[index]
+                if delta:
+                    # Shifted copies, the previous state stays intact if this run fails
+                    statement = Statement(statement.op, statement.name, statement.expr, statement.line + delta)
+                    statement_tokens.append([token._replace(line=token.line + delta)
+                                             for token in self.statement_tokens[index]])
+                else:
+                    statement_tokens.append(self.statement_tokens[index])
+                statements.append(statement)
+        stats = {"reused_prefix": first, "reparsed": len(new_statements), "reused_suffix": reused_suffix}
+        return first, statements, statement_tokens, stats
+
+    def execute(self, statements, first):
+        """Re-runs analysis and execution from the checkpoint at or before statement ``first``."""
+        interval = self.checkpoint_interval
+        segment = min(first // interval, len(self.checkpoints) - 1) if self.checkpoints else 0
+        checkpoints = self.checkpoints[:segment + 1] or [Checkpoint({}, {}, 0)]
+        state = checkpoints[segment]
+        symbol_table = dict(state.symbol_table)
+        variables = dict(state.variables)
+        output = self.output[:state.output_length]
+
+        # Analysis runs over the whole tail first, like the batch pipeline, so semantic
+        # errors win over run-time errors
+        boundaries = range(segment * interval, len(statements), interval)
+        symbol_tables = []
+        for start in boundaries:
+            symbol_tables.append(dict(symbol_table))
+            SemanticAnalyzer(statements[start:start + interval], symbol_table, start).analyze()
+
+        for start, table in zip(boundaries, symbol_tables):
+            if start > segment * interval:
+                checkpoints.append(Checkpoint(table, dict(variables), len(output)))
+            vm = VirtualMachine(compile_program(statements[start:start + interval]), variables)
+            output.extend(vm.run())
+            variables.update(vm.variables())
+        return output, symbol_table, checkpoints
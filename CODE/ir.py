@@ -0,0 +1,309 @@
+"""Three-address IR built from the AST, with an optimizing pass manager.
+
+Each instruction writes at most one destination: a program variable or a
+compiler temp named ``%tN`` (temps are assigned exactly once). Operands are
+either names or ``Const`` values. ASSIGN copies one operand, PRINT outputs one.
+"""
+import math
+from bytecode import BytecodeCompiler, LOAD_CONST, LOAD_VAR, STORE_VAR, PRINT_TOP, TAC_SYMBOLS
+from ast_nodes import (NUMBER, ID, ASSIGN, PRINT, ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN,
+                       BINARY_OPS, OP_NAMES, constant_key)
+
+BINARY_FUNCTIONS = {
+    ADD: lambda a, b: a + b,
+    SUB: lambda a, b: a - b,
+    MUL: lambda a, b: a * b,
+    DIV: lambda a, b: a / b,
+    MOD: lambda a, b: a % b,
+    POW: lambda a, b: a ** b,
+}
+
+
+def _log(value):
+    if value <= 0:
+        raise ValueError("Logarithm operand must be positive")
+    return math.log10(value)
+
+
+UNARY_FUNCTIONS = {
+    LOG: _log,
+    SIN: lambda a: math.sin(math.radians(a)),
+    COS: lambda a: math.cos(math.radians(a)),
+    TAN: lambda a: math.tan(math.radians(a)),
+}
+
+# Largest exponent and integer result size folded at compile time, bigger ones are left to run time
+MAX_FOLDED_EXPONENT = 64
+MAX_FOLDED_BITS = 4096
+FLOAT_INT_BITS = 1023  # Ints up to this size convert to a finite float
+
+
+def _int_bits(value):
+    return value.bit_length() if type(value) is int else 0
+
+
+def _result_bits(op, values):
+    """Upper bound on the bit size of an integer result; 0 when the operation cannot grow an int much."""
+    if op == MUL:
+        return _int_bits(values[0]) + _int_bits(values[1])
+    if op == POW and type(values[1]) is int and values[1] > 0:
+        return _int_bits(values[0]) * values[1]
+    return 0
+
+
+class Const:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Const) and constant_key(self.value) == constant_key(other.value)
+
+    def __hash__(self):
+        return hash(constant_key(self.value))
+
+    def __str__(self):
+        return str(self.value)
+
+    __repr__ = __str__
+
+
+class Instr:
+    __slots__ = ("op", "dest", "args")
+
+    def __init__(self, op, dest, args):
+        self.op = op
+        self.dest = dest
+        self.args = args
+
+    def __str__(self):
+        if self.op == PRINT:
+            return f"PRINT {self.args[0]}"
+        if self.op == ASSIGN:
+            return f"{self.dest} = {self.args[0]}"
+        if self.op in BINARY_OPS:
+            return f"{self.dest} = {self.args[0]} {TAC_SYMBOLS[self.op]} {self.args[1]}"
+        return f"{self.dest} = {OP_NAMES[self.op]}({self.args[0]})"
+
+    __repr__ = __str__
+
+
+def is_temp(operand):
+    return isinstance(operand, str) and operand.startswith("%")
+
+
+def may_fault(instr):
+    """True unless ``instr`` provably cannot raise; only those instructions may be dropped.
+
+    A variable can hold a complex power, an infinity or an int too big for a float, so
+    only copies and ADD, SUB or MUL of constant ints and floats are known to be safe.
+    """
+    op = instr.op
+    if op == ASSIGN:
+        return False
+    if op not in (ADD, SUB, MUL) or not all(isinstance(arg, Const) for arg in instr.args):
+        return True
+    kinds = {type(arg.value) for arg in instr.args}
+    if kinds == {int}:
+        return False
+    # Mixing in a float converts the ints, which raises OverflowError past the float range
+    return not (kinds <= {int, float}
+                and all(type(arg.value) is float or arg.value.bit_length() <= FLOAT_INT_BITS for arg in instr.args))
+
+
+class IRBuilder:
+    def __init__(self):
+        self.instructions = []
+        self.temp_counter = 0
+
+    def build(self, ast):
+        for statement in ast:
+            value = self.expression(statement.expr)
+            if statement.op == PRINT:
+                self.instructions.append(Instr(PRINT, None, (value,)))
+            else:
+                self.instructions.append(Instr(ASSIGN, statement.name, (value,)))
+        return self.instructions
+
+    def expression(self, expr):
+        op = expr.op
+        if op == NUMBER:
+            return Const(expr.value)
+        if op == ID:
+            return expr.name
+        if op in BINARY_OPS:
+            left = self.expression(expr.operands[0])
+            for operand in expr.operands[1:]:
+                right = self.expression(operand)
+                temp = self.new_temp()
+                self.instructions.append(Instr(op, temp, (left, right)))
+                left = temp
+            return left
+        # LOG and the trigonometric functions only use their first operand
+        operand = self.expression(expr.operands[0])
+        temp = self.new_temp()
+        self.instructions.append(Instr(op, temp, (operand,)))
+        return temp
+
+    def new_temp(self):
+        self.temp_counter += 1
+        return f"%t{self.temp_counter}"
+
+
+def build_ir(ast):
+    return IRBuilder().build(ast)
+
+
+class ConstantFolding:
+    """Propagates known constants into operands and folds constant operations."""
+    name = "constant-folding"
+
+    def run(self, instructions):
+        known = {}
+        propagated = folded = 0
+        for instr in instructions:
+            args = instr.args
+            if any(isinstance(arg, str) and arg in known for arg in args):
+                args = tuple(known.get(arg, arg) if isinstance(arg, str) else arg for arg in args)
+                propagated += sum(1 for old, new in zip(instr.args, args) if old is not new)
+                instr.args = args
+            if instr.op == PRINT:
+                continue
+            if instr.op != ASSIGN and all(isinstance(arg, Const) for arg in args):
+                value = self.fold(instr.op, [arg.value for arg in args])
+                if value is not None:
+                    instr.op = ASSIGN
+                    instr.args = args = (Const(value),)
+                    folded += 1
+            if instr.op == ASSIGN and isinstance(args[0], Const):
+                known[instr.dest] = args[0]
+            else:
+                known.pop(instr.dest, None)
+        return instructions, {"propagated": propagated, "folded": folded}
+
+    def fold(self, op, values):
+        """Returns the folded value, or None when the operation must run at run time."""
+        if op == POW and (not isinstance(values[1], (int, float)) or abs(values[1]) > MAX_FOLDED_EXPONENT):
+            return None
+        if _result_bits(op, values) > MAX_FOLDED_BITS:
+            return None  # Folding runs on every compile, before any ExecutionPolicy can bound it
+        try:
+            if op in BINARY_FUNCTIONS:
+                return BINARY_FUNCTIONS[op](values[0], values[1])
+            return UNARY_FUNCTIONS[op](values[0])
+        except (ArithmeticError, ValueError, TypeError):  # TypeError: LOG or trig of a complex power
+            return None  # Leave the error to be raised when the program runs
+
+
+class CommonSubexpressionElimination:
+    """Reuses the temp of an identical earlier operation while its inputs are unchanged."""
+    name = "cse"
+
+    def run(self, instructions):
+        available = {}  # (op, args) -> temp holding the result
+        users = {}  # variable -> keys in available that read it
+        alias = {}  # temp -> operand it is a copy of
+        alias_users = {}  # variable -> temps aliasing it
+        eliminated = 0
+        for instr in instructions:
+            if any(arg in alias for arg in instr.args if isinstance(arg, str)):
+                instr.args = tuple(alias.get(arg, arg) if isinstance(arg, str) else arg for arg in instr.args)
+            if instr.op == PRINT:
+                continue
+            dest = instr.dest
+            if instr.op == ASSIGN:
+                if is_temp(dest):
+                    source = instr.args[0]
+                    alias[dest] = source
+                    if isinstance(source, str) and not is_temp(source):
+                        alias_users.setdefault(source, []).append(dest)
+                else:
+                    # Reassigning a variable invalidates everything computed from it
+                    for key in users.pop(dest, ()):
+                        available.pop(key, None)
+                    for temp in alias_users.pop(dest, ()):
+                        alias.pop(temp, None)
+                continue
+            key = (instr.op, instr.args)
+            previous = available.get(key)
+            if previous is not None:
+                instr.op = ASSIGN
+                instr.args = (previous,)
+                alias[dest] = previous
+                eliminated += 1
+            else:
+                available[key] = dest
+                for arg in instr.args:
+                    if isinstance(arg, str) and not is_temp(arg):
+                        users.setdefault(arg, []).append(key)
+        return instructions, {"eliminated": eliminated}
+
+
+class DeadStoreElimination:
+    """Removes instructions whose result is never printed, directly or indirectly."""
+    name = "dead-store-elimination"
+
+    def run(self, instructions):
+        live = set()
+        kept = []
+        for instr in reversed(instructions):
+            if instr.op != PRINT and instr.dest not in live and not may_fault(instr):
+                continue
+            live.discard(instr.dest)
+            live.update(arg for arg in instr.args if isinstance(arg, str))
+            kept.append(instr)
+        kept.reverse()
+        return kept, {"removed": len(instructions) - len(kept)}
+
+
+class PassManager:
+    def __init__(self, passes=None):
+        if passes is None:
+            passes = [ConstantFolding(), CommonSubexpressionElimination(), DeadStoreElimination()]
+        self.passes = passes
+        self.report = []
+
+    def run(self, instructions):
+        self.report = []
+        for optimization in self.passes:
+            before = len(instructions)
+            instructions, stats = optimization.run(instructions)
+            self.report.append((optimization.name, before, len(instructions), stats))
+        return instructions
+
+    def format_report(self):
+        lines = []
+        for name, before, after, stats in self.report:
+            details = ", ".join(f"{key}={value}" for key, value in stats.items())
+            lines.append(f"{name}: {before} -> {after} instructions ({details})")
+        return "\n".join(lines)
+
+
+def optimize(instructions, passes=None):
+    manager = PassManager(passes)
+    return manager.run(instructions), manager
+
+
+def lower(instructions):
+    """Lowers IR to a bytecode Program the VirtualMachine can run."""
+    compiler = BytecodeCompiler()
+    emit = compiler.code.extend
+    for instr in instructions:
+        for arg in instr.args:
+            if isinstance(arg, Const):
+                emit((LOAD_CONST, compiler.constant(arg.value)))
+            else:
+                emit((LOAD_VAR, compiler.slot(arg)))
+        if instr.op == PRINT:
+            emit((PRINT_TOP, 0))
+        else:
+            if instr.op != ASSIGN:
+                emit((instr.op, 0))
+            emit((STORE_VAR, compiler.slot(instr.dest)))
+    return compiler.program()
+
+
+def format_tac(instructions):
+    return "\n".join(str(instr) for instr in instructions)
+
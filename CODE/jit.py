@@ -0,0 +1,254 @@
+"""Compiles programs to Python functions and caches them by source hash.
+
+Each program becomes one ``def`` whose variables are Python locals and whose
+operations are native operators, evaluated in the same order as the bytecode
+VM so that output and errors match ``CodeGenerator.execute`` exactly.
+
+Literals are written as Python literals where their repr reads back exactly;
+infinities, NaN and ints too long for the parser are bound as globals of the
+function instead. Given the SemanticAnalyzer's symbol table, constant
+variables are inlined as
+literals, and the trigonometric functions of operands typed int or float
+multiply by the radians factor inline instead of calling math.radians
+(complex values, typed unknown, keep the call and its TypeError).
+"""
+import hashlib
+import math
+from collections import OrderedDict
+from ast_nodes import (NUMBER, ID, PRINT, ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN, BINARY_OPS,
+                       constant_key)
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer, INT, FLOAT
+
+PYTHON_OPERATORS = {ADD: "+", SUB: "-", MUL: "*", DIV: "/", MOD: "%", POW: "**"}
+FUNCTIONS = {SIN: "_sin", COS: "_cos", TAN: "_tan", LOG: "_log"}
+
+DEFAULT_CACHE_SIZE = 256
+MAX_INLINED_BITS = 1024
+DEGREE = math.pi / 180  # math.radians multiplies by this same double, so typed operands inline it
+MAX_CHAIN = 256  # Operands per flat operator chain; CPython's compiler recurses once per operator
+
+
+def _log(value):
+    if value <= 0:
+        raise ValueError("Logarithm operand must be positive")
+    return math.log10(value)
+
+
+def _undefined(name):
+    raise NameError(f"Variable '{name}' is not defined")
+
+
+def _namespace():
+    return {"_sin": math.sin, "_cos": math.cos, "_tan": math.tan, "_radians": math.radians,
+            "_log": _log, "_undefined": _undefined}
+
+
+def _inlinable(value):
+    """True for constants whose repr is a plain Python literal."""
+    if type(value) is int:
+        return value.bit_length() <= MAX_INLINED_BITS
+    return type(value) is float and math.isfinite(value)
+
+
+class PythonTranslator:
+    def __init__(self, symbol_table=None):
+        self.defined = set()
+        self.pooled = {}  # Global name -> value of literals that cannot be written as Python source
+        self.pool_names = {}  # constant_key -> global name, so equal literals share one
+        # Variables the semantic analysis proved constant are replaced by their value
+        self.constants = {name: symbol.value for name, symbol in (symbol_table or {}).items()
+                          if getattr(symbol, "constant", False) and _inlinable(symbol.value)}
+        # Variables whose every value is an int or every value a float
+        self.real = {name for name, symbol in (symbol_table or {}).items()
+                     if getattr(symbol, "type", None) in (INT, FLOAT)}
+
+    def translate(self, ast):
+        """Returns Python source for ``def program()`` returning (output lines, variables)."""
+        lines = self.lines = ["def program():", "    output = []", "    emit = output.append"]
+        for statement in ast:
+            expr = self.expression(statement.expr)
+            if statement.op == PRINT:
+                lines.append(f"    emit(str({expr}))")
+            else:
+                lines.append(f"    {self.local(statement.name)} = {expr}")
+                self.defined.add(statement.name)
+        variables = ", ".join(f"{name!r}: {self.local(name)}" for name in sorted(self.defined))
+        lines.append(f"    return output, {{{variables}}}")
+        return "\n".join(lines) + "\n"
+
+    def local(self, name):
+        return f"v_{name}"  # Prefixed so identifiers never clash with Python names
+
+    def expression(self, expr):
+        op = expr.op
+        if op == NUMBER:
+            return f"({expr.value!r})" if _inlinable(expr.value) else self.pool(expr.value)
+        if op == ID:
+            if expr.name in self.constants and expr.name in self.defined:
+                return f"({self.constants[expr.name]!r})"
+            if expr.name not in self.defined:
+                return f"_undefined({expr.name!r})"
+            return self.local(expr.name)
+        if op in BINARY_OPS:
+            # A flat chain is left-associative like the VM (POW always has two operands); long
+            # operand lists are folded into a local a chunk at a time to stay within compiler limits
+            symbol = f" {PYTHON_OPERATORS[op]} "
+            operands = [self.expression(operand) for operand in expr.operands]
+            start = 0
+            while len(operands) - start > MAX_CHAIN:
+                self.lines.append(f"    _chain = ({symbol.join(operands[start:start + MAX_CHAIN])})")
+                start += MAX_CHAIN - 1
+                operands[start] = "_chain"
+            return f"({symbol.join(operands[start:])})"
+        operand = self.expression(expr.operands[0])
+        if op == LOG:
+            return f"_log({operand})"
+        if self.is_real(expr.operands[0]):
+            return f"{FUNCTIONS[op]}({operand} * {DEGREE!r})"
+        return f"{FUNCTIONS[op]}(_radians({operand}))"
+
+    def pool(self, value):
+        key = constant_key(value)
+        name = self.pool_names.get(key)
+        if name is None:
+            name = self.pool_names[key] = f"_k{len(self.pool_names)}"
+            self.pooled[name] = value
+        return name
+
+    def is_real(self, expr):
+        """True when ``expr`` is known to be an int or float, never a complex power."""
+        if expr.op == NUMBER:
+            return type(expr.value) is int or type(expr.value) is float
+        return expr.name in self.defined and expr.name in self.real
+
+
+def compile_function(ast, symbol_table=None):
+    """Translates an AST into a Python function returning (output lines, variables).
+
+    ``symbol_table`` is the annotated table from SemanticAnalyzer, used to inline constants.
+    """
+    translator = PythonTranslator(symbol_table)
+    source = translator.translate(ast)
+    namespace = _namespace()
+    namespace.update(translator.pooled)
+    exec(compile(source, "<program>", "exec"), namespace)
+    function = namespace["program"]
+    function.source = source
+    return function
+
+
+def program_hash(code):
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class FunctionCache:
+    """LRU cache of compiled functions keyed by the hash of the program source."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.functions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code):
+        key = program_hash(code)
+        function = self.functions.get(key)
+        if function is not None:
+            self.functions.move_to_end(key)
+            self.hits += 1
+            return function
+        self.misses += 1
+        ast = Parser(Lexer(code)).parse()
+        function = compile_function(ast, SemanticAnalyzer(ast).analyze())
+        self.functions[key] = function
+        if len(self.functions) > self.maxsize:
+            self.functions.popitem(last=False)
+        return function
+
+    def clear(self):
+        self.functions.clear()
+
+
+_cache = FunctionCache()
+
+
+def run_source(code, cache=None):
+    """Runs a program through the compiled-function cache and returns its output text."""
+    output, _ = (cache or _cache).get(code)()
+    return "\n".join(output)
+
+
+def random_program(rng, max_operands=5, statements=12):
+    """A random program over every operation, for differential checks of the JIT against the VM."""
+    operations = ["ADD", "SUB", "MUL", "DIV", "MOD", "POW", "LOG", "SIN", "COS", "TAN"]
+    overflowing = "1" + "0" * 400 + ".0"  # Lexes to inf, which has no Python literal
+
+    def random_term(names):
+        if names and rng.random() < 0.6:
+            return rng.choice(names + ["undefined_name"] if rng.random() < 0.02 else names)
+        if rng.random() < 0.01:
+            return rng.choice([overflowing, "-" + overflowing, "1" + "0" * 400])
+        return rng.choice([str(rng.randint(-5, 9)), f"{rng.uniform(-9, 9):.3f}", "0", "0.0", "-0.0"])
+
+    names, lines = [], []
+    for _ in range(rng.randint(1, statements)):
+        op = rng.choice(operations)
+        if op == "POW":
+            # Small literal exponents keep the integers from growing without bound
+            expr = f"POW {random_term(names)} {rng.randint(-3, 4)}"
+        else:
+            count = (2 if op == "LOG" else rng.randint(1, 4) if op in ("SIN", "COS", "TAN")
+                     else rng.randint(2, max_operands))
+            expr = f"{op} " + " ".join(random_term(names) for _ in range(count))
+        if rng.random() < 0.5 or not names:
+            name = f"v{len(names)}"
+            lines.append(f"VAR {name} = {expr}")
+            names.append(name)
+        else:
+            lines.append(f"PRINT {expr}")
+        lines.append(f"PRINT {rng.choice(names)}")
+    return "\n".join(lines)
+
+
+def differential_check(code):
+    """Runs ``code`` through the VM and the JIT; returns None if they agree, else a description.
+
+    The JIT runs both with and without the symbol table, which enables constant inlining.
+    """
+    from code_generator import CodeGenerator
+
+    def outcome(run):
+        try:
+            return ("ok", run())
+        except Exception as e:
+            return (type(e).__name__, str(e))
+
+    ast = Parser(Lexer(code)).parse()
+    expected = outcome(lambda: CodeGenerator().execute(ast))
+    try:
+        symbol_table = SemanticAnalyzer(ast).analyze()
+    except RuntimeError:
+        symbol_table = None
+    for table in (None, symbol_table):
+        actual = outcome(lambda: "\n".join(compile_function(ast, table)()[0]))
+        if expected != actual:
+            return f"VM {expected!r} != JIT {actual!r} for:\n{code}"
+    return None
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+
+    # Differential check of the JIT against the bytecode VM on random programs
+    rng = random.Random(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    failures = 0
+    for _ in range(5000):
+        problem = differential_check(random_program(rng, max_operands=rng.choice((5, 5, 5, 600))))
+        if problem:
+            failures += 1
+            print(problem)
+    print(f"{failures} mismatches in 5000 programs")
+    sys.exit(1 if failures else 0)
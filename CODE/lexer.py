@@ -1,38 +1,92 @@
 import re
+from collections import namedtuple
+
+# A token keeps its source position so later stages can report line:column
+Token = namedtuple("Token", ["kind", "value", "line", "column"])
+
+KEYWORDS = {
+    "ADD": "ADD",            # Addition keyword
+    "SUB": "SUB",            # Subtraction keyword
+    "MUL": "MUL",            # Multiplication keyword
+    "DIV": "DIV",            # Division keyword
+    "MOD": "MOD",            # Modulo keyword
+    "POW": "POW",            # Power keyword
+    "LOG": "LOG",            # Logarithm keyword
+    "SIN": "SIN",            # Sine function
+    "COS": "COS",            # Cosine function
+    "TAN": "TAN",            # Tangent function
+    "VAR": "VAR",            # Variable declaration
+    "PRINT": "PRINT",        # Print statement
+}
+
+TOKEN_SPECIFICATION = [
+    ("NUMBER", r"-?\d+(?:\.\d+)?"),  # Integer or decimal number
+    ("ID", r"[a-zA-Z_]\w*"),         # Identifiers, keywords are looked up afterwards
+    ("ASSIGN", r"="),                # Assignment operator
+    ("NEWLINE", r"\n"),              # Line breaks, only used for positions
+    ("MISMATCH", r"."),              # Any other character
+    ("END", r"\Z"),                  # Trailing spaces at the end of the input
+]
+
+# Compiled once per process and shared by every Lexer instance. Spaces and tabs
+# are consumed in front of every token instead of being matched on their own.
+TOKEN_REGEX = re.compile(r"[ \t\r]*(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPECIFICATION) + ")")
+_NUMBER, _ID, _ASSIGN, _NEWLINE, _MISMATCH, _END = (TOKEN_REGEX.groupindex[name] for name, _ in TOKEN_SPECIFICATION)
+
+# Minimum tokens/sec expected from iter_tokens() on multi-megabyte inputs
+# (the previous per-instance regex ran at roughly 400k tokens/sec)
+THROUGHPUT_TARGET = 700_000
+
+
 class Lexer:
-    def __init__(self, code):
+    def __init__(self, code, line=1, errors=None):
         self.code = code
+        self.line = line  # Line number of the first line of code
+        self.errors = errors  # When a list, bad characters are recorded in it as (line, column, message) and skipped
         self.tokens = []
-        self.token_specification = [
-            ("NUMBER", r"-?\d+(\.\d+)?"),   # Integer or decimal number
-            ("ADD", r"ADD"),             # Addition keyword
-            ("SUB", r"SUB"),             # Subtraction keyword
-            ("MUL", r"MUL"),             # Multiplication keyword
-            ("DIV", r"DIV"),             # Division keyword
-            ("MOD", r"MOD"),             # Modulo keyword
-            ("POW", r"POW"),             # Power keyword
-            ("LOG", r"LOG"),             # Logarithm keyword
-            ("SIN", r"SIN"),             # Sine function
-            ("COS", r"COS"),             # Cosine function
-            ("TAN", r"TAN"),             # Tangent function
-            ("VAR", r"VAR"),             # Variable declaration
-            ("PRINT", r"PRINT"),         # Print statement
-            ("ASSIGN", r"="),            # Assignment operator
-            ("ID", r"[a-zA-Z_]\w*"),     # Identifiers
-            ("SKIP", r"[ \t]+"),         # Skip spaces and tabs
-            ("MISMATCH", r"."),          # Any other character
-        ]
 
-    def tokenize(self):
-        token_regex = "|".join(f"(?P<{pair[0]}>{pair[1]})" for pair in self.token_specification)
-        for mo in re.finditer(token_regex, self.code):
-            kind = mo.lastgroup
-            value = mo.group()
-            if kind == "NUMBER":
+    def __iter__(self):
+        return self.iter_tokens()
+
+    def iter_tokens(self):
+        """Yields tokens one at a time so the parser can consume them lazily."""
+        keywords = KEYWORDS
+        new_token = tuple.__new__  # Skips namedtuple argument handling
+        line = self.line
+        line_start = 0
+        for mo in TOKEN_REGEX.finditer(self.code):
+            index = mo.lastindex
+            if index == _ID:
+                value = mo.group(_ID)
+                yield new_token(Token, (keywords.get(value, "ID"), value, line, mo.start(_ID) - line_start + 1))
+            elif index == _NUMBER:
+                value = mo.group(_NUMBER)
                 value = float(value) if '.' in value else int(value)
-            elif kind == "SKIP":
-                continue
-            elif kind == "MISMATCH":
-                raise SyntaxError(f"Unexpected character: {value}")
-            self.tokens.append((kind, value))
+                yield new_token(Token, ("NUMBER", value, line, mo.start(_NUMBER) - line_start + 1))
+            elif index == _NEWLINE:
+                line += 1
+                line_start = mo.end()
+            elif index == _ASSIGN:
+                yield new_token(Token, ("ASSIGN", "=", line, mo.start(_ASSIGN) - line_start + 1))
+            elif index == _MISMATCH:
+                column = mo.start(_MISMATCH) - line_start + 1
+                if self.errors is None:
+                    raise SyntaxError(f"Unexpected character: {mo.group(_MISMATCH)} at line {line}, column {column}")
+                self.errors.append((line, column, f"Unexpected character: {mo.group(_MISMATCH)}"))
+
+    def tokenize(self):
+        self.tokens = list(self.iter_tokens())
         return self.tokens
+
+
+if __name__ == "__main__":
+    import time
+
+    # Throughput check on a multi-megabyte generated input
+    line = "VAR value_{0} = ADD 12 3.5 value_{0} alpha beta\nPRINT SIN value_{0}\n"
+    source = "".join(line.format(i) for i in range(60000))
+    start = time.perf_counter()
+    count = sum(1 for _ in Lexer(source))
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed
+    print(f"{len(source) / 1e6:.1f} MB, {count} tokens in {elapsed:.3f}s: {rate:,.0f} tokens/sec (target {THROUGHPUT_TARGET:,})")
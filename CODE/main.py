@@ -1,23 +1,43 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-from lexer import Lexer
-from parser import Parser
-from semantic_analyzer import SemanticAnalyzer
-from code_generator import CodeGenerator
+from compile_cache import CompilationCache, CachedCompilation
+from incremental import IncrementalCompiler
+from tree_view import ParseTreeWindow, layout_for
+from text_view import VirtualTextView
+from history import HistoryStore, HistoryBrowser
+from profiler import profile_source
+from diagnostics import CompileError, SEMANTIC, collecting
 from tkinter import ttk
 from tkinter.filedialog import asksaveasfilename, askopenfilename
 import os
+import queue
+import threading
 import time
 
-# Global variable to keep track of saved code history
+# Code history database; runs from the old text history file are imported into it once
+CODE_HISTORY_DB = "code_history.db"
 CODE_HISTORY_FILE = "code_history.txt"
+COMPILE_CACHE_DIR = ".compile_cache"
+
+COMPILE_POLL_MS = 50
+
+compilation_cache = CompilationCache(COMPILE_CACHE_DIR)
+incremental_compiler = IncrementalCompiler()
+history_store = HistoryStore(CODE_HISTORY_DB)
+if os.path.exists(CODE_HISTORY_FILE):
+    history_store.import_text_history(CODE_HISTORY_FILE)
+compile_results = queue.Queue()  # Filled by the worker thread, drained by poll_compile_results
+compile_worker = None
+pending_code = None
 
 def run_code():
     """Handles the code execution and displays output or errors."""
-    code = code_editor.get("1.0", tk.END).strip()
+    global pending_code
+    # Only trailing whitespace is dropped, so diagnostic lines and columns match the editor
+    code = code_editor.get("1.0", tk.END).rstrip()
     
     # Enhanced input validation
-    if not code:
+    if not code.strip():
         messagebox.showwarning("No Code Entered", "Please enter some code to run.")
         return
     
@@ -26,92 +46,147 @@ def run_code():
         messagebox.showwarning("Invalid Code", "The code should contain some valid expressions or identifiers.")
         return
 
+    # Compile in the background; a run requested meanwhile starts once the current one finishes
+    if compile_worker is not None and compile_worker.is_alive():
+        pending_code = code
+        return
+    start_compile(code)
+
+def start_compile(code):
+    global compile_worker
+    run_button.config(text="Running...")
+    compile_worker = threading.Thread(target=compile_in_background, args=(code, profile_enabled.get()), daemon=True)
+    compile_worker.start()
+
+def compile_in_background(code, profile=False):
+    """Runs on the worker thread: compiles and renders, but never touches Tk widgets."""
+    start = time.perf_counter()
     try:
-        # Lexical Analysis
-        lexer = Lexer(code)
-        tokens = lexer.tokenize()
-        lexer_output.config(state=tk.NORMAL)
-        lexer_output.delete("1.0", tk.END)
-
-        for token in tokens:
-            # Apply blue color for keywords
-            if token[0] in ["ADD", "SUB", "MUL", "DIV", "MOD", "POW", "LOG", "SIN", "COS", "TAN", "VAR", "PRINT"]:
-                lexer_output.insert(tk.END, str(token) + "\n", "keyword")
+        compilation = CachedCompilation(code, compilation_cache)
+        stats = {}
+        # A failed compile is checked again with error recovery so every diagnostic is shown at once
+        with collecting(code):
+            if profile:
+                # Profiled runs always go through the full pipeline so every phase is measured
+                results, profiler = profile_source(code)
+                tokens = results["tokens"]
+                ast = results["ast"]
+                generated = {key: results[key] for key in ("output", "tac", "assembly", "assembly_stats",
+                                                          "optimization_report")}
+            elif compilation.cached():
+                # An unchanged program comes straight from the compilation cache
+                tokens = compilation.tokens()
+                ast = compilation.ast()
+                generated = compilation.generated
             else:
-                lexer_output.insert(tk.END, str(token) + "\n")
-        lexer_output.config(state=tk.DISABLED)
-
-        # Syntax Analysis
-        parser = Parser(tokens)
-        ast = parser.parse()
-        parser_output.config(state=tk.NORMAL)
-        parser_output.delete("1.0", tk.END)
-        parser_output.insert(tk.END, str(ast))
-        parser_output.config(state=tk.DISABLED)
-
-        # Generate Parse Tree
-        dot_tree = parser.generate_dot_tree(ast)
-        dot_tree.attr(bgcolor="lightblue", style="filled")
-        dot_tree.attr('node', style='filled', color='lightgoldenrodyellow')
-        dot_tree.render("parse_tree", format="png", cleanup=True)
-        display_parse_tree()
-
-        # Semantic Analysis
-        semantic_analyzer = SemanticAnalyzer(ast)
-        semantic_analyzer.analyze()
-        semantic_output.config(state=tk.NORMAL)
-        semantic_output.delete("1.0", tk.END)
-        semantic_output.insert(tk.END, "Semantic analysis passed successfully!")
-        semantic_output.config(state=tk.DISABLED)
-
-        # Code Generation
-        generator = CodeGenerator()
-        result = generator.execute(ast)
-        tac_output = generator.get_tac()
-        assembly_output = generator.get_assembly()
-
-        # Display TAC and Assembly Code
-        codegen_output.config(state=tk.NORMAL)
-        codegen_output.delete("1.0", tk.END)
-        codegen_output.insert(tk.END, f"Three-Address Code:\n{tac_output}\n\nAssembly Code:\n{assembly_output}")
-        codegen_output.config(state=tk.DISABLED)
-
-        # Display final output in the output section
-        output_section.config(state=tk.NORMAL)
-        output_section.delete("1.0", tk.END)
-        output_section.insert(tk.END, f"Output:\n{result}")
-        output_section.config(state=tk.DISABLED)
-
-        # Save the code to history after each run
-        save_code_to_history(code)
-
+                result = incremental_compiler.compile(code)
+                stats = result.stats
+                tokens = result.tokens
+                ast = result.ast
+                generator = result.generator()
+                assembly_output = generator.get_assembly()
+                generated = {
+                    "output": result.output,
+                    "tac": generator.get_tac(),
+                    "assembly": assembly_output,
+                    "assembly_stats": generator.assembly_stats,
+                    "optimization_report": generator.optimization_report,
+                }
+                compilation.store(tokens, ast, result.symbol_table, generated)
+
+        # Lay out the parse tree here so the main loop only has to draw it
+        layout = layout_for(ast, key=compilation.ast_key)
+
+        duration = time.perf_counter() - start
+        if profile:
+            metrics = profiler.format()
+        else:
+            metrics = "\n".join([f"compile time: {duration * 1000:.2f} ms", f"tokens: {len(tokens)}",
+                                 f"statements: {len(ast)}"] + [f"{name}: {value}" for name, value in stats.items()]
+                                + [f"{name}: {seconds * 1000:.2f} ms" for name, seconds in compilation.timings.items()])
+        compile_results.put(("ok", code, duration, tokens, ast, generated, (layout, compilation.ast_key), metrics))
     except Exception as e:
-        error_message = f"Error: {str(e)}"
-        
-        lexer_output.config(state=tk.NORMAL)
-        lexer_output.insert(tk.END, error_message, "error")
-        lexer_output.config(state=tk.DISABLED)
-
-def save_code_to_history(code):
-    """Saves the code to a history file."""
-    if not os.path.exists(CODE_HISTORY_FILE):
-        with open(CODE_HISTORY_FILE, "w") as history_file:
-            history_file.write("Code History\n")
-    with open(CODE_HISTORY_FILE, "a") as history_file:
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
-        history_file.write(f"--- {timestamp} ---\n")
-        history_file.write(code + "\n\n")
-
-def display_parse_tree():
-    """Displays the generated parse tree in the GUI."""
-    tree_window = tk.Toplevel(app)
-    tree_window.title("Parse Tree Visualization")
-    tree_canvas = tk.Canvas(tree_window, bg="white", width=800, height=600)
-    tree_canvas.pack(fill=tk.BOTH, expand=True)
-
-    tree_img = tk.PhotoImage(file="parse_tree.png")
-    tree_canvas.image = tree_img  # Keep a reference to avoid garbage collection
-    tree_canvas.create_image(10, 10, anchor=tk.NW, image=tree_img)
+        compile_results.put(("error", code, time.perf_counter() - start, e))
+
+def poll_compile_results():
+    """Delivers finished compilations to the widgets from the Tk main loop."""
+    global pending_code
+    try:
+        while True:
+            show_compile_result(compile_results.get_nowait())
+    except queue.Empty:
+        pass
+    if pending_code is not None and (compile_worker is None or not compile_worker.is_alive()):
+        code, pending_code = pending_code, None
+        start_compile(code)
+    app.after(COMPILE_POLL_MS, poll_compile_results)
+
+def show_compile_result(message):
+    run_button.config(text="Run Code")
+    code_editor.tag_remove("diagnostic", "1.0", tk.END)
+    if message[0] == "error":
+        _, code, duration, error = message
+        if isinstance(error, CompileError):
+            show_diagnostics(error.diagnostics)
+            error_message = f"Error: {error.diagnostics[0]} ({len(error.diagnostics)} errors)"
+        else:
+            error_message = f"Error: {str(error)}"
+            lexer_output.set_text(error_message, tag="error")
+        history_store.record(code, duration, error_message)
+        return
+
+    _, code, duration, tokens, ast, generated, (layout, ast_key), metrics = message
+
+    # Lexical Analysis, one token per line; keywords are highlighted as rows come into view
+    lexer_output.set_lines(tokens, str)
+
+    # Syntax Analysis, one statement per line
+    parser_output.set_lines(ast, repr)
+
+    display_parse_tree(ast, layout, ast_key)
+
+    # Semantic Analysis
+    semantic_output.config(state=tk.NORMAL)
+    semantic_output.delete("1.0", tk.END)
+    semantic_output.insert(tk.END, "Semantic analysis passed successfully!")
+    semantic_output.config(state=tk.DISABLED)
+
+    result = generated["output"]
+    tac_output = generated["tac"]
+    assembly_output = generated["assembly"]
+
+    # Display TAC and Assembly Code
+    codegen_output.set_text(f"Three-Address Code:\n{tac_output}\n\nAssembly Code:\n{assembly_output}")
+
+    # Display final output in the output section
+    output_section.set_text(f"Output:\n{result}")
+
+    # Timings and counts, or the full profile when profiling is switched on
+    metrics_output.set_text(metrics)
+
+    # Save the code to history after each run
+    history_store.record(code, duration)
+
+def show_diagnostics(diagnostics):
+    """Lists every diagnostic and underlines each reported position in the editor."""
+    lexer_output.set_lines(diagnostics, str, tag="error")
+    semantic_output.config(state=tk.NORMAL)
+    semantic_output.delete("1.0", tk.END)
+    semantic_output.insert(tk.END, "\n".join(str(diagnostic) for diagnostic in diagnostics
+                                              if diagnostic.stage == SEMANTIC) or "No semantic errors found")
+    semantic_output.config(state=tk.DISABLED)
+    for diagnostic in diagnostics:
+        position = f"{diagnostic.line}.{diagnostic.column - 1}"
+        code_editor.tag_add("diagnostic", position, f"{position} wordend")
+
+def load_from_history(code):
+    """Puts a program picked in the history browser back into the editor."""
+    code_editor.delete("1.0", tk.END)
+    code_editor.insert(tk.END, code)
+
+def display_parse_tree(ast, layout, ast_key):
+    """Displays the parse tree in the one tree window, reused across runs."""
+    parse_tree_window.show(ast, layout, key=ast_key)
 
 def save_code():
     """Saves the code from the editor to a file."""
@@ -139,21 +214,14 @@ def load_code():
 def reset_code():
     """Resets the editor and output sections."""
     code_editor.delete("1.0", tk.END)
-    lexer_output.config(state=tk.NORMAL)
-    lexer_output.delete("1.0", tk.END)
-    lexer_output.config(state=tk.DISABLED)
-    parser_output.config(state=tk.NORMAL)
-    parser_output.delete("1.0", tk.END)
-    parser_output.config(state=tk.DISABLED)
+    lexer_output.clear()
+    parser_output.clear()
     semantic_output.config(state=tk.NORMAL)
     semantic_output.delete("1.0", tk.END)
     semantic_output.config(state=tk.DISABLED)
-    codegen_output.config(state=tk.NORMAL)
-    codegen_output.delete("1.0", tk.END)
-    codegen_output.config(state=tk.DISABLED)
-    output_section.config(state=tk.NORMAL)
-    output_section.delete("1.0", tk.END)
-    output_section.config(state=tk.DISABLED)
+    codegen_output.clear()
+    output_section.clear()
+    metrics_output.clear()
 
 # GUI setup
 app = tk.Tk()
@@ -166,6 +234,8 @@ fg_color = "#d4d4d4"
 highlight_color = "#007acc"
 
 app.configure(bg=bg_color)
+parse_tree_window = ParseTreeWindow(app)
+history_browser = HistoryBrowser(app, history_store, load_from_history)
 
 # Add a canvas and scrollbar to enable scrolling
 canvas = tk.Canvas(app, bg=bg_color, highlightthickness=0)
@@ -188,6 +258,7 @@ code_editor_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
 
 code_editor = scrolledtext.ScrolledText(scrollable_frame, wrap=tk.WORD, font=("Consolas", 12), bg="#252526", fg=fg_color, insertbackground="white")
 code_editor.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+code_editor.tag_configure("diagnostic", underline=True, foreground="#f44747")
 
 # Controls Section
 controls_frame = tk.Frame(scrollable_frame, bg=bg_color)
@@ -235,16 +306,21 @@ def toggle_theme():
     codegen_label.configure(fg=fg_color, bg=bg_color)
 
     code_editor.configure(bg=bg_color, fg=fg_color, insertbackground=fg_color)
-    lexer_output.configure(bg=bg_color, fg=fg_color, insertbackground=fg_color)
-    parser_output.configure(bg=bg_color, fg=fg_color, insertbackground=fg_color)
+    lexer_output.set_colors(bg_color, fg_color)
+    parser_output.set_colors(bg_color, fg_color)
     semantic_output.configure(bg=bg_color, fg=fg_color, insertbackground=fg_color)
-    codegen_output.configure(bg=bg_color, fg=fg_color, insertbackground=fg_color)
+    codegen_output.set_colors(bg_color, fg_color)
+    output_section.set_colors(bg_color, fg_color)
+    metrics_label.configure(fg=fg_color, bg=bg_color)
+    metrics_output.set_colors(bg_color, fg_color)
+    profile_check.configure(fg=fg_color, bg=bg_color, selectcolor=bg_color)
 
     run_button.configure(bg="red", fg="white")
     save_button.configure(bg="green", fg="white")
     load_button.configure(bg="blue", fg="white")
     reset_button.configure(bg="orange", fg="white")
     theme_button.configure(bg=highlight_color, fg="white")
+    history_button.configure(bg="purple", fg="white")
 
     scrollbar.configure(background=bg_color, troughcolor=bg_color)
 
@@ -252,28 +328,40 @@ def toggle_theme():
 theme_button = tk.Button(controls_frame, text="Toggle Theme", command=toggle_theme, bg=highlight_color, fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
 theme_button.grid(row=0, column=4, padx=10)
 
+# History Button
+history_button = tk.Button(controls_frame, text="History", command=lambda: history_browser.show(), bg="purple", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
+history_button.grid(row=0, column=5, padx=10)
+
+# Profile Toggle: profiled runs record per-phase, memory and per-opcode metrics
+profile_enabled = tk.BooleanVar(value=False)
+profile_check = tk.Checkbutton(controls_frame, text="Profile", variable=profile_enabled, fg=fg_color, bg=bg_color, selectcolor=bg_color, font=("Arial", 12, "bold"))
+profile_check.grid(row=0, column=6, padx=10)
+
 codegen_label = tk.Label(scrollable_frame, text="Output:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
 codegen_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
 
-output_section = scrolledtext.ScrolledText(scrollable_frame, wrap=tk.WORD, font=("Consolas", 12), bg=bg_color, fg=fg_color, insertbackground="white")
+output_section = VirtualTextView(scrollable_frame, font=("Consolas", 12), bg=bg_color, fg=fg_color)
 output_section.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-output_section.config(state=tk.DISABLED)
+
+metrics_label = tk.Label(scrollable_frame, text="Metrics:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
+metrics_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
+
+metrics_output = VirtualTextView(scrollable_frame, height=10, font=("Consolas", 12), bg=bg_color, fg=fg_color)
+metrics_output.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
 
 # Output Sections
 lexer_label = tk.Label(scrollable_frame, text="Lexer Output:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
 lexer_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
 
-lexer_output = scrolledtext.ScrolledText(scrollable_frame, wrap=tk.WORD, font=("Consolas", 12), bg=bg_color, fg=fg_color, insertbackground="white")
+lexer_output = VirtualTextView(scrollable_frame, font=("Consolas", 12), bg=bg_color, fg=fg_color, highlight_keywords=True)
 lexer_output.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-lexer_output.config(state=tk.DISABLED)
 
 parser_label = tk.Label(scrollable_frame, text="Parser Output:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
 parser_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
 
-parser_output = scrolledtext.ScrolledText(scrollable_frame, wrap=tk.WORD, font=("Consolas", 12), bg=bg_color, fg=fg_color, insertbackground="white")
+parser_output = VirtualTextView(scrollable_frame, font=("Consolas", 12), bg=bg_color, fg=fg_color)
 parser_output.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-parser_output.config(state=tk.DISABLED)
 
 semantic_label = tk.Label(scrollable_frame, text="Semantic Analysis:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
 semantic_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
@@ -285,11 +373,11 @@ semantic_output.config(state=tk.DISABLED)
 codegen_label = tk.Label(scrollable_frame, text="Code Generation Output:", font=("Consolas", 12, "bold"), fg=fg_color, bg=bg_color)
 codegen_label.pack(anchor=tk.W, padx=10, pady=(10, 0))
 
-codegen_output = scrolledtext.ScrolledText(scrollable_frame, wrap=tk.WORD, font=("Consolas", 12), bg=bg_color, fg=fg_color, insertbackground="white")
+codegen_output = VirtualTextView(scrollable_frame, font=("Consolas", 12), bg=bg_color, fg=fg_color, highlight_keywords=True)
 codegen_output.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-codegen_output.config(state=tk.DISABLED)
 
 
 
 # Start the GUI event loop
+app.after(COMPILE_POLL_MS, poll_compile_results)
 app.mainloop()
@@ -1,107 +1,193 @@
-from graphviz import Digraph
+from ast_nodes import (OP_CODES, OP_NAMES, NUMBER, ID, DECLARE, ASSIGN, PRINT, Number, Name,
+                       Operation, Statement, constant_key)
+
+
+def describe(token):
+    return "end of input" if token is None else f"'{token[1]}'"
+
 
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, errors=None):
+        self.errors = errors  # When a list, syntax errors are recorded in it and parsing resumes
+        if errors is not None:
+            tokens = self.token_list = list(tokens)  # Recovery needs positions to report and resync from
+            self.statement_starts = []  # Index of the first token of every statement in the result
+        self.tokens = iter(tokens)  # Any token iterable, e.g. a Lexer read lazily
         self.current_token = None
         self.pos = -1
+        self.leaves = {}  # Shared Number/Name nodes, leaves are immutable
+        self.last_error = None  # (line, column, message) of the last syntax error
         self.advance()
 
     def advance(self):
         self.pos += 1
-        self.current_token = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        self.current_token = next(self.tokens, None)
+
+    def fail(self, message, token):
+        """Raises a SyntaxError at ``token``, which is None at the end of the input."""
+        if token is not None:
+            line, column = token[2], token[3]
+        elif self.errors is not None and self.token_list:
+            last = self.token_list[-1]
+            line, column = last[2], last[3] + len(str(last[1]))
+        else:
+            line = column = None
+        self.last_error = (line, column, message)
+        if line is None:
+            raise SyntaxError(message)
+        raise SyntaxError(f"{message} at line {line}, column {column}")
 
     def parse(self):
+        if self.errors is not None:
+            return self.parse_recovering()
         statements = []
         while self.current_token:
             statements.append(self.statement())
         return statements
 
+    def parse_recovering(self):
+        """Panic-mode parse: a bad statement is recorded and skipped up to the next statement start."""
+        statements = []
+        while self.current_token:
+            start = self.pos
+            try:
+                statements.append(self.statement())
+                self.statement_starts.append(start)
+            except SyntaxError:
+                self.errors.append(self.last_error)
+                first = self.token_list[start]
+                if first[0] == "VAR" and start + 1 < len(self.token_list) and self.token_list[start + 1][0] == "ID":
+                    # Keep the name declared, with a placeholder value, so its later uses are not errors too
+                    statements.append(Statement(DECLARE, self.token_list[start + 1][1], Number(0), first[2]))
+                    self.statement_starts.append(start)
+                if self.pos == start:
+                    self.advance()
+                self.synchronize()
+        return statements
+
+    def synchronize(self):
+        """Skips tokens up to the next VAR, PRINT or ``name =``."""
+        tokens = self.token_list
+        while self.current_token:
+            kind = self.current_token[0]
+            if kind == "VAR" or kind == "PRINT":
+                return
+            if kind == "ID" and self.pos + 1 < len(tokens) and tokens[self.pos + 1][0] == "ASSIGN":
+                return
+            self.advance()
+
     def statement(self):
-        if self.current_token[0] == "VAR":
+        kind = self.current_token[0]
+        if kind == "VAR":
             return self.declaration()
-        elif self.current_token[0] == "PRINT":
+        elif kind == "PRINT":
             return self.print_statement()
-        elif self.current_token[0] == "ID":
+        elif kind == "ID":
             return self.assignment()
         else:
-            raise SyntaxError(f"Unexpected token in statement: {self.current_token}")
+            self.fail(f"Unexpected token in statement: {describe(self.current_token)}", self.current_token)
 
     def declaration(self):
+        line = self.current_token[2]
         self.advance()  # Skip VAR
-        if self.current_token[0] != "ID":
-            raise SyntaxError(f"Expected identifier after VAR, found: {self.current_token}")
-        var_name = self.current_token[1]
+        token = self.current_token
+        if not token or token[0] != "ID":
+            self.fail(f"Expected identifier after VAR, found {describe(token)}", token)
+        var_name = token[1]
         self.advance()
-        if self.current_token[0] != "ASSIGN":
-            raise SyntaxError(f"Expected '=' after identifier '{var_name}', found: {self.current_token}")
+        token = self.current_token
+        if not token or token[0] != "ASSIGN":
+            self.fail(f"Expected '=' after identifier '{var_name}', found {describe(token)}", token)
         self.advance()
         expr = self.expression()
-        return ("DECLARE", var_name, expr)
+        return Statement(DECLARE, var_name, expr, line)
 
     def assignment(self):
+        line = self.current_token[2]
         var_name = self.current_token[1]
         self.advance()
-        if self.current_token[0] != "ASSIGN":
-            raise SyntaxError(f"Expected '=' after identifier '{var_name}', found: {self.current_token}")
+        token = self.current_token
+        if not token or token[0] != "ASSIGN":
+            self.fail(f"Expected '=' after identifier '{var_name}', found {describe(token)}", token)
         self.advance()
         expr = self.expression()
-        return ("ASSIGN", var_name, expr)
+        return Statement(ASSIGN, var_name, expr, line)
 
     def print_statement(self):
+        line = self.current_token[2]
         self.advance()  # Skip PRINT
         expr = self.expression()
-        return ("PRINT", expr)
+        return Statement(PRINT, None, expr, line)
 
     def expression(self):
-        if self.current_token[0] in {"ADD", "SUB", "MUL", "DIV", "MOD", "POW", "LOG", "COS", "SIN", "TAN"}:
+        token = self.current_token
+        if token is None:
+            self.fail("Expected a number, identifier or operation, found end of input", token)
+        if token[0] in {"ADD", "SUB", "MUL", "DIV", "MOD", "POW", "LOG", "COS", "SIN", "TAN"}:
             return self.operation()
         return self.term()
 
     def operation(self):
-        op = self.current_token[0]
+        op_token = self.current_token
+        op = op_token[0]
         self.advance()  # Skip operation
         operands = []
         while self.current_token and (self.current_token[0] == "ID" or self.current_token[0] == "NUMBER"):
             operands.append(self.term())
         if op in {"ADD", "SUB", "MUL", "DIV", "MOD"} and len(operands) < 2:
-            raise SyntaxError(f"Operation '{op}' requires at least two operands, found: {operands}")
+            self.fail(f"Operation '{op}' requires at least two operands, found {len(operands)}", op_token)
         if op in {"POW", "LOG"} and len(operands) != 2:
-            raise SyntaxError(f"Operation '{op}' requires exactly two operands, found: {operands}")
-        return (op, operands)
+            self.fail(f"Operation '{op}' requires exactly two operands, found {len(operands)}", op_token)
+        if not operands:
+            self.fail(f"Operation '{op}' requires an operand", op_token)
+        return Operation(OP_CODES[op], operands)
 
     def term(self):
         token = self.current_token
         if token[0] == "NUMBER":
             self.advance()
-            return ("NUMBER", token[1])
+            key = constant_key(token[1])
+            node = self.leaves.get(key)
+            if node is None:
+                node = self.leaves[key] = Number(token[1])
+            return node
         elif token[0] == "ID":
             self.advance()
-            return ("ID", token[1])
+            node = self.leaves.get(token[1])
+            if node is None:
+                node = self.leaves[token[1]] = Name(token[1])
+            return node
         else:
-            raise SyntaxError(f"Unexpected token in term: {token}")
+            self.fail(f"Expected a number, identifier or operation, found {describe(token)}", token)
 
     def generate_dot_tree(self, ast):
         """Generates a DOT representation of the AST for visualization."""
+        from graphviz import Digraph  # Loaded on demand so headless runs skip it
         graph = Digraph("ParseTree")
-        self._add_nodes(graph, ast, "root")
+        self.node_counter = 0
+        for statement in ast:
+            self._add_nodes(graph, statement, "root")
         return graph
 
     def _add_nodes(self, graph, node, parent_id):
-        """Recursively adds nodes and edges to the DOT graph."""
-        if isinstance(node, tuple):
-            node_id = f"{id(node)}"
-            label = node[0]
-            graph.node(node_id, label)
-            if parent_id:
-                graph.edge(parent_id, node_id)
-            for child in node[1:]:
-                self._add_nodes(graph, child, node_id)
-        elif isinstance(node, list):
-            for child in node:
-                self._add_nodes(graph, child, parent_id)
+        """Adds a node, its leaf value and its children to the DOT graph."""
+        # Ids come from a counter since Number/Name nodes are shared
+        self.node_counter += 1
+        node_id = f"n{self.node_counter}"
+        graph.node(node_id, OP_NAMES[node.op])
+        if parent_id:
+            graph.edge(parent_id, node_id)
+        if node.op == NUMBER or node.op == ID:
+            self._add_leaf(graph, node_id, node.value if node.op == NUMBER else node.name)
+        elif node.op == DECLARE or node.op == ASSIGN or node.op == PRINT:
+            if node.name is not None:
+                self._add_leaf(graph, node_id, node.name)
+            self._add_nodes(graph, node.expr, node_id)
         else:
-            node_id = f"{id(node)}"
-            graph.node(node_id, str(node))
-            if parent_id:
-                graph.edge(parent_id, node_id)
\ No newline at end of file
+            for child in node.operands:
+                self._add_nodes(graph, child, node_id)
+
+    def _add_leaf(self, graph, parent_id, value):
+        leaf_id = f"{parent_id}_leaf"
+        graph.node(leaf_id, str(value))
+        graph.edge(parent_id, leaf_id)
@@ -0,0 +1,337 @@
+"""Execution policies: resource limits and numeric backends for the VM.
+
+An ``ExecutionPolicy`` bounds a run by instructions executed, wall time and
+the bit size of integer (and Fraction) results, and picks how numbers are
+represented:
+
+* ``python``: the default VM semantics, ints grow without bound and DIV gives floats
+* ``float``: every value is a float64; overflow (an infinite result of ADD, SUB, MUL,
+  DIV or POW) and domain errors raise
+* ``exact``: ints and Fractions, so DIV and negative powers stay exact; LOG
+  and the trigonometric functions still give floats
+* ``decimal``: Decimals rounded to ``precision`` significant digits; MOD
+  follows Decimal rules, so the remainder takes the sign of the dividend
+
+``BoundedMachine`` runs the program in chunks of ``CHECK_INTERVAL``
+instructions and checks the step and time budget between chunks, so the
+hot loop itself only pays for size checks on MUL and POW, the only int
+operations that can grow a number by more than a bit (every operation on
+Fractions can). Those checks use a lower bound of the result size and run
+before the operation, so ``POW 10 10000000`` is refused instead of
+computed. Under a time limit, a big result is also refused when even a fast
+machine would need longer than the time left to compute it, so a single
+operation cannot run far past the deadline.
+
+With ``keep_going`` an arithmetic error (DIV by zero, LOG of a non-positive
+value, overflow, ...) skips the rest of its statement and is recorded
+instead of ending the run. Exceeding a limit always ends it.
+"""
+import decimal
+import math
+import time
+from contextlib import nullcontext
+from fractions import Fraction
+from bytecode import (VirtualMachine, LOAD_CONST, LOAD_VAR, STORE_VAR, PRINT_TOP, _UNSET)
+from ast_nodes import ADD, SUB, MUL, DIV, MOD, POW, LOG, SIN, COS, TAN
+from ir import is_temp
+
+CHECK_INTERVAL = 1024  # Instructions between step and time checks
+LARGE_INT_BITS = 1 << 12  # Results at least this big check their cost against the time left first
+# Lower bound on the seconds a big MUL or POW takes per (30-bit digit of the result) ** log2(3), the
+# Karatsuba exponent; about a fifth of what CPython needs on a typical machine, so it rarely refuses early
+BIG_INT_SECONDS = 5e-10
+DEFAULT_PRECISION = 28  # Significant digits of the decimal backend
+
+
+class ResourceLimitError(Exception):
+    """Raised when a run exceeds one of its policy's limits; ``kind`` is "steps", "time" or "int_bits"."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def int_bits(value):
+    """Bit size of an int or of a Fraction's larger term; 0 for floats and Decimals, which stay bounded."""
+    if type(value) is int:
+        return value.bit_length()
+    if type(value) is Fraction:
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return 0
+
+
+def estimated_seconds(bits):
+    """A lower bound on the time to compute a ``bits``-bit int product or power."""
+    return BIG_INT_SECONDS * (bits / 30) ** 1.585
+
+
+class PythonNumbers:
+    name = "python"
+
+    def convert(self, value):
+        return value
+
+    def context(self):
+        return nullcontext()
+
+    def divide(self, left, right):
+        return left / right
+
+    def power(self, left, right):
+        return left ** right
+
+    def log(self, value):
+        return math.log10(value)
+
+    def trig(self, function, value):
+        return function(math.radians(value))
+
+
+class FloatNumbers(PythonNumbers):
+    name = "float"
+    convert = staticmethod(float)
+    power = staticmethod(math.pow)  # Raises instead of returning a complex number or an int
+
+
+class ExactNumbers(PythonNumbers):
+    name = "exact"
+
+    def convert(self, value):
+        return Fraction(repr(value)) if type(value) is float else value  # 0.1 is 1/10, not its binary value
+
+    def divide(self, left, right):
+        if type(left) is int and type(right) is int:
+            if right == 0:
+                raise ZeroDivisionError("division by zero")
+            return Fraction(left, right)
+        return left / right
+
+    def power(self, left, right):
+        if type(right) is int and right < 0 and type(left) is int:
+            return Fraction(left) ** right
+        return left ** right
+
+
+class DecimalNumbers(PythonNumbers):
+    name = "decimal"
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+
+    def convert(self, value):
+        return decimal.Decimal(repr(value))
+
+    def context(self):
+        return decimal.localcontext(decimal.Context(prec=self.precision))
+
+    def divide(self, left, right):
+        if right == 0:
+            raise ZeroDivisionError("division by zero")
+        return left / right
+
+    def log(self, value):
+        return value.log10()
+
+    def trig(self, function, value):
+        return decimal.getcontext().create_decimal_from_float(function(math.radians(value)))
+
+
+NUMERIC_BACKENDS = {backend.name: backend for backend in (PythonNumbers, FloatNumbers, ExactNumbers, DecimalNumbers)}
+
+
+class ExecutionPolicy:
+    def __init__(self, max_steps=None, max_seconds=None, max_int_bits=None, numbers="python",
+                 precision=DEFAULT_PRECISION, keep_going=False):
+        if numbers not in NUMERIC_BACKENDS:
+            raise ValueError(f"Unknown numeric backend '{numbers}'")
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_int_bits = max_int_bits
+        self.numbers = DecimalNumbers(precision) if numbers == "decimal" else NUMERIC_BACKENDS[numbers]()
+        self.keep_going = keep_going
+
+    def output_key(self):
+        """The settings that can change a program's output; limits only decide whether it finishes."""
+        return (self.numbers.name, getattr(self.numbers, "precision", None), self.keep_going)
+
+    def machine(self, program, variables=None, budget=None):
+        return BoundedMachine(program, variables, self, budget)
+
+
+class Budget:
+    """Steps and time left to one run, shared by every machine that runs a part of it."""
+
+    def __init__(self, policy):
+        self.steps = policy.max_steps
+        self.deadline = None if policy.max_seconds is None else time.perf_counter() + policy.max_seconds
+
+
+class BoundedMachine(VirtualMachine):
+    def __init__(self, program, variables=None, policy=None, budget=None):
+        super().__init__(program, variables)
+        self.policy = policy or ExecutionPolicy()
+        self.budget = budget or Budget(self.policy)
+        self.constants = [self.policy.numbers.convert(value) for value in program.constants]
+        self.errors = []  # (statement number, message) of every statement skipped with keep_going
+        self.statement = 0  # Statements finished before instruction counted_pc
+        self.counted_pc = 0
+
+    def run(self):
+        """Executes the program under the policy and returns the PRINT outputs as strings."""
+        with self.policy.numbers.context():
+            return self._run()
+
+    def _run(self):
+        code = self.program.code
+        constants = self.constants
+        slots = self.slots
+        policy = self.policy
+        budget = self.budget
+        numbers = policy.numbers
+        divide, power, log, trig = numbers.divide, numbers.power, numbers.log, numbers.trig
+        # Size checks run when there is a bit limit or a deadline to keep big-integer work within.
+        # Fractions grow on every operation, ints only on MUL and POW.
+        guarded = policy.max_int_bits is not None or budget.deadline is not None
+        fractions = guarded and isinstance(numbers, ExactNumbers)
+        floats = isinstance(numbers, FloatNumbers)  # Float64 results are checked for overflow to inf
+        check_finite = self.check_finite
+        clock = time.perf_counter
+        output = []
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        end = len(code)
+        while pc < end:
+            stop = min(end, pc + 2 * CHECK_INTERVAL)
+            if budget.steps is not None:
+                if budget.steps <= 0:
+                    raise ResourceLimitError("steps", f"Step limit of {policy.max_steps} instructions exceeded")
+                stop = min(stop, pc + 2 * budget.steps)
+            if budget.deadline is not None and clock() > budget.deadline:
+                raise ResourceLimitError("time", f"Time limit of {policy.max_seconds}s exceeded")
+            start = pc
+            try:
+                while pc < stop:
+                    opcode = code[pc]
+                    arg = code[pc + 1]
+                    pc += 2
+                    if opcode == LOAD_VAR:
+                        value = slots[arg]
+                        if value is _UNSET:
+                            raise NameError(f"Variable '{self.program.names[arg]}' is not defined")
+                        push(value)
+                    elif opcode == LOAD_CONST:
+                        push(constants[arg])
+                    elif opcode == STORE_VAR:
+                        slots[arg] = pop()
+                    elif opcode == ADD:
+                        right = pop()
+                        if fractions:
+                            self.check_size(stack[-1], right)
+                        stack[-1] += right
+                        if floats:
+                            check_finite(stack[-1])
+                    elif opcode == SUB:
+                        right = pop()
+                        if fractions:
+                            self.check_size(stack[-1], right)
+                        stack[-1] -= right
+                        if floats:
+                            check_finite(stack[-1])
+                    elif opcode == MUL:
+                        right = pop()
+                        if guarded:
+                            self.check_size(stack[-1], right)
+                        stack[-1] *= right
+                        if floats:
+                            check_finite(stack[-1])
+                    elif opcode == DIV:
+                        right = pop()
+                        if fractions:
+                            self.check_size(stack[-1], right)
+                        stack[-1] = divide(stack[-1], right)
+                        if floats:
+                            check_finite(stack[-1])
+                    elif opcode == MOD:
+                        right = pop()
+                        if fractions:
+                            self.check_size(stack[-1], right)
+                        stack[-1] %= right
+                    elif opcode == POW:
+                        right = pop()
+                        if guarded:
+                            self.check_power(stack[-1], right)
+                        stack[-1] = power(stack[-1], right)
+                    elif opcode == PRINT_TOP:
+                        output.append(str(pop()))
+                    elif opcode == SIN:
+                        stack[-1] = trig(math.sin, stack[-1])
+                    elif opcode == COS:
+                        stack[-1] = trig(math.cos, stack[-1])
+                    elif opcode == TAN:
+                        stack[-1] = trig(math.tan, stack[-1])
+                    elif opcode == LOG:
+                        if stack[-1] <= 0:
+                            raise ValueError("Logarithm operand must be positive")
+                        stack[-1] = log(stack[-1])
+                    else:
+                        raise RuntimeError(f"Unknown opcode {opcode} at {pc - 2}")
+            except (ArithmeticError, ValueError, TypeError, NameError) as error:
+                if not policy.keep_going:
+                    raise
+                pc = self.skip_statement(pc - 2, error)
+                stack.clear()
+            if budget.steps is not None:
+                budget.steps -= (pc - start) // 2
+        return output
+
+    def check_size(self, left, right):
+        """Refuses a MUL (or Fraction operation) whose result would be over the bit or time limit."""
+        bits = int_bits(left) + int_bits(right) - 1  # The result has at least this many
+        self.check_bits(bits)
+
+    def check_power(self, left, right):
+        # A negative power of an int is a float, except with exact numbers
+        if type(right) is int and (right >= 0 or isinstance(self.policy.numbers, ExactNumbers)):
+            bits = int_bits(left)
+            if bits > 1:
+                self.check_bits((bits - 1) * abs(right) + 1)
+
+    def check_bits(self, bits):
+        limit = self.policy.max_int_bits
+        if limit is not None and bits > limit:
+            raise ResourceLimitError("int_bits", f"Integer result would exceed the limit of {limit} bits")
+        deadline = self.budget.deadline
+        if bits > LARGE_INT_BITS and deadline is not None:
+            left = deadline - time.perf_counter()
+            if left < 0:
+                raise ResourceLimitError("time", f"Time limit of {self.policy.max_seconds}s exceeded")
+            if estimated_seconds(bits) > left:
+                raise ResourceLimitError("time", f"A {bits}-bit integer result would exceed the time limit "
+                                                 f"of {self.policy.max_seconds}s")
+
+    @staticmethod
+    def check_finite(value):
+        if not math.isfinite(value):
+            raise OverflowError("Float result out of range")
+
+    def ends_statement(self, opcode, arg):
+        # Optimized programs also store temporaries, which are not statements of their own
+        return opcode == PRINT_TOP or (opcode == STORE_VAR and not is_temp(self.program.names[arg]))
+
+    def skip_statement(self, pc, error):
+        """Records ``error`` for the statement running at ``pc`` and returns the pc after that statement."""
+        code = self.program.code
+        for counted in range(self.counted_pc, pc, 2):
+            if self.ends_statement(code[counted], code[counted + 1]):
+                self.statement += 1
+        self.errors.append((self.statement, str(error)))
+        while pc < len(code):
+            opcode, arg = code[pc], code[pc + 1]
+            pc += 2
+            if self.ends_statement(opcode, arg):
+                break
+        self.statement += 1
+        self.counted_pc = pc
+        return pc
@@ -0,0 +1,159 @@
+"""Per-phase and per-opcode instrumentation of the compiler pipeline.
+
+``profile_source`` runs the same stages as ``compiler.compile_source`` but
+inside ``Profiler.phase`` blocks that record wall and CPU time and, when
+memory tracing is on, the ``tracemalloc`` peak of each phase. VM execution
+goes through ``VirtualMachine.run_profiled`` for per-opcode counts and time;
+the JIT and the parallel scheduler have no per-instruction hooks, so only
+their whole run is timed (with the scheduler's task and worker counts).
+Nothing here is imported or called on the normal compile paths, so
+profiling costs nothing unless it is asked for. Memory tracing slows every
+phase down, so timings taken with it are only comparable to each other.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator
+from bytecode import VirtualMachine
+from ast_nodes import walk
+from assembler import DEFAULT_REGISTERS
+import ir
+
+
+class Profiler:
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.phases = {}  # name -> {"wall": s, "cpu": s, "peak_bytes": n}
+        self.counters = {}
+        self.opcode_counts = {}
+        self.opcode_times = {}
+        self.peak_bytes = 0
+        self._started_tracing = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record = {"wall": time.perf_counter() - wall, "cpu": time.process_time() - cpu}
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                record["peak_bytes"] = peak - baseline  # Growth above what was allocated before the phase
+                self.peak_bytes = max(self.peak_bytes, peak)
+            self.phases[name] = record
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    def report(self):
+        opcodes = {name: {"count": self.opcode_counts[name], "seconds": self.opcode_times.get(name, 0.0)}
+                   for name in sorted(self.opcode_counts, key=lambda name: -self.opcode_times.get(name, 0.0))}
+        report = {"phases": self.phases, "counters": self.counters, "opcodes": opcodes}
+        if self.memory:
+            report["peak_bytes"] = self.peak_bytes
+        return report
+
+    def to_json(self, indent=2):
+        return json.dumps(self.report(), indent=indent)
+
+    def format(self):
+        """Plain-text tables for the IDE metrics panel."""
+        lines = [f"{'phase':<12}{'wall ms':>10}{'cpu ms':>10}{'peak KiB':>10}"]
+        for name, record in self.phases.items():
+            peak = f"{record['peak_bytes'] / 1024:.1f}" if "peak_bytes" in record else "-"
+            lines.append(f"{name:<12}{record['wall'] * 1000:>10.2f}{record['cpu'] * 1000:>10.2f}{peak:>10}")
+        if self.memory:
+            lines.append(f"peak traced memory: {self.peak_bytes / 1024:.1f} KiB")
+        lines.extend(f"{name}: {value}" for name, value in self.counters.items())
+        if self.opcode_counts:
+            lines.append("")
+            lines.append(f"{'opcode':<12}{'count':>10}{'total ms':>10}{'ns/op':>10}")
+            for name, record in self.report()["opcodes"].items():
+                lines.append(f"{name:<12}{record['count']:>10}{record['seconds'] * 1000:>10.2f}"
+                             f"{record['seconds'] / record['count'] * 1e9:>10.0f}")
+        return "\n".join(lines)
+
+
+def profile_source(code, optimize=False, registers=DEFAULT_REGISTERS, backend="vm", memory=True, layout=True):
+    """Compiles and runs ``code`` under a Profiler; returns (results, profiler).
+
+    The results hold what compile_source returns plus the ``tokens`` and ``ast``.
+    The ``layout`` phase times the IDE's parse tree layout.
+    """
+    profiler = Profiler(memory)
+    profiler.start()
+    try:
+        with profiler.phase("lex"):
+            tokens = Lexer(code).tokenize()
+        profiler.count("tokens", len(tokens))
+
+        with profiler.phase("parse"):
+            ast = Parser(tokens).parse()
+        profiler.count("statements", len(ast))
+        profiler.count("nodes", sum(1 for statement in ast for _ in walk(statement)))
+
+        if layout:
+            from tree_view import layout_for
+            with profiler.phase("layout"):
+                layout_for(ast)
+
+        with profiler.phase("semantic"):
+            symbol_table = SemanticAnalyzer(ast).analyze()
+        profiler.count("variables", len(symbol_table))
+
+        generator = CodeGenerator(optimize=optimize, registers=registers, backend=backend)
+        if backend != "vm":
+            with profiler.phase("execute"):
+                output = generator.execute(ast, symbol_table)
+            if generator.schedule_report is not None:
+                profiler.count("tasks", generator.schedule_report.tasks)
+                profiler.count("workers", generator.schedule_report.workers)
+        else:
+            with profiler.phase("codegen"):
+                program = generator.compile(ast)
+            profiler.count("instructions", len(program.code) // 2)
+            vm = VirtualMachine(program)
+            try:
+                with profiler.phase("execute"):
+                    output = "\n".join(vm.run(profile=profiler))
+            finally:
+                generator.variables = {name: value for name, value in vm.variables().items()
+                                       if not ir.is_temp(name)}
+
+        with profiler.phase("views"):
+            tac = generator.get_tac()
+            assembly = generator.get_assembly()
+    finally:
+        profiler.stop()
+
+    results = {
+        "output": output,
+        "tac": tac,
+        "assembly": assembly,
+        "assembly_stats": generator.assembly_stats,
+        "optimization_report": generator.optimization_report,
+        "timings": {name: record["wall"] for name, record in profiler.phases.items()},
+        "tokens": tokens,
+        "ast": ast,
+    }
+    return results, profiler
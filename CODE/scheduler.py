@@ -0,0 +1,404 @@
+"""Runs independent parts of a program in parallel on a process pool.
+
+Statements form a dependency DAG through their variables: a use depends on
+the definition it reads (read after write), and a redefinition depends on
+the previous definition and on every read of it (write after write, write
+after read). Statements are grouped into tasks:
+
+* statements touching a variable that is assigned more than once share a
+  task, so a mutable variable lives in exactly one task;
+* a variable defined once is passed by value to the tasks reading it, which
+  then depend on the task defining it;
+* tasks whose dependencies form a cycle are merged.
+
+Ready tasks are packed into bundles and run on worker processes by the
+bytecode VM. PRINT output is put back in program order, so the output is
+byte-identical to sequential execution. When statements fail, the error
+raised is that of the earliest failing statement, as it would be
+sequentially.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from ast_nodes import NUMBER, ID, PRINT, POW, LOG, TRIG_OPS
+from bytecode import BytecodeCompiler, Program, VirtualMachine, compile_program
+
+# Rough relative costs used for the critical path and to size bundles
+OPERATION_COSTS = {POW: 4, LOG: 3}
+TRIG_COST = 3
+MIN_PARALLEL_COST = 20_000  # Below this, process start-up costs more than it saves
+BUNDLES_PER_WORKER = 4
+
+
+def statement_profile(statement):
+    """Returns (variables read, estimated cost) of one statement."""
+    uses = set()
+    cost = 1
+    stack = [statement.expr]
+    while stack:
+        node = stack.pop()
+        op = node.op
+        if op == ID:
+            uses.add(node.name)
+            cost += 1
+        elif op == NUMBER:
+            cost += 1
+        else:
+            cost += TRIG_COST if op in TRIG_OPS else OPERATION_COSTS.get(op, 1) * max(len(node.operands) - 1, 1)
+            stack.extend(node.operands)
+    return uses, cost
+
+
+class DependencyGraph:
+    """Def-use dependencies of a program, with the critical path through them.
+
+    Edges are not stored: the critical path only needs, per variable, when its
+    last definition and the reads of that definition finish.
+    """
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.uses = []
+        self.costs = []
+        self.definitions = {}  # variable -> indices of statements defining it
+        def_finish = {}  # variable -> (finish, length) of its last definition
+        read_finish = {}  # variable -> latest (finish, length) among reads of that definition
+        critical = (0, 0)
+        for index, statement in enumerate(ast):
+            uses, cost = statement_profile(statement)
+            self.uses.append(uses)
+            self.costs.append(cost)
+            start = (0, 0)
+            for name in uses:
+                start = max(start, def_finish.get(name, start))
+            if statement.op != PRINT:
+                name = statement.name
+                start = max(start, def_finish.get(name, start), read_finish.get(name, start))
+                self.definitions.setdefault(name, []).append(index)
+            finish = (start[0] + cost, start[1] + 1)
+            for name in uses:
+                if finish > read_finish.get(name, (0, 0)):
+                    read_finish[name] = finish
+            if statement.op != PRINT:
+                def_finish[statement.name] = finish
+                read_finish[statement.name] = (0, 0)
+            critical = max(critical, finish)
+        self.critical = critical
+
+    def critical_path(self):
+        """Returns (cost, statement count) of the most expensive dependency chain."""
+        return self.critical
+
+
+class Task:
+    __slots__ = ("indices", "imports", "depends_on", "cost")
+
+    def __init__(self, indices):
+        self.indices = indices
+        self.imports = set()  # Single-definition variables read from other tasks
+        self.depends_on = set()
+        self.cost = 0
+
+
+def _find(parents, index):
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def build_tasks(graph):
+    """Groups statements into tasks and links tasks through the variables passed between them."""
+    count = len(graph.ast)
+    parents = list(range(count))
+
+    def union(left, right):
+        left, right = _find(parents, left), _find(parents, right)
+        if left != right:
+            parents[max(left, right)] = min(left, right)
+
+    mutable = {name for name, definitions in graph.definitions.items() if len(definitions) > 1}
+    for name in mutable:
+        definitions = graph.definitions[name]
+        for index in definitions[1:]:
+            union(definitions[0], index)
+    for index, uses in enumerate(graph.uses):
+        for name in uses & mutable:
+            union(graph.definitions[name][0], index)
+
+    while True:
+        groups = {}
+        for index in range(count):
+            groups.setdefault(_find(parents, index), []).append(index)
+        owner = {index: root for root, indices in groups.items() for index in indices}
+        imports = {root: set() for root in groups}
+        early_uses = {root: set() for root in groups}  # Read before their only definition, so never imported
+        for index, uses in enumerate(graph.uses):
+            for name in uses:
+                definitions = graph.definitions.get(name)
+                if definitions and owner[definitions[0]] != owner[index]:
+                    (imports if definitions[0] < index else early_uses)[owner[index]].add(name)
+        edges = {root: set() for root in groups}
+        for root in groups:
+            imports[root] -= early_uses[root]
+            edges[root] = {owner[graph.definitions[name][0]] for name in imports[root]}
+        cycles = _cycles(edges)
+        if not cycles:
+            break
+        for component in cycles:
+            first = min(component)
+            for root in component:
+                union(first, root)
+
+    tasks = {root: Task(indices) for root, indices in groups.items()}
+    for root, task in tasks.items():
+        task.cost = sum(graph.costs[index] for index in task.indices)
+        task.depends_on = edges[root]
+        task.imports = imports[root]
+    return tasks
+
+
+def _cycles(edges):
+    """Strongly connected components with more than one node (iterative Tarjan)."""
+    index_of, low, on_stack, stack, result = {}, {}, set(), [], []
+    counter = 0
+    for start in edges:
+        if start in index_of:
+            continue
+        work = [(start, iter(edges[start]))]
+        index_of[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index_of:
+                    index_of[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges[child])))
+                elif child in on_stack:
+                    low[node] = min(low[node], index_of[child])
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index_of[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1:
+                    result.append(component)
+    return result
+
+
+def compile_task(ast, indices):
+    """Compiles a task's statements; returns (program, end offset of each statement, PRINT indices)."""
+    compiler = BytecodeCompiler()
+    boundaries = []
+    for index in indices:
+        compiler.compile((ast[index],))
+        boundaries.append(len(compiler.code))
+    return compiler.program(), boundaries, [index for index in indices if ast[index].op == PRINT]
+
+
+def run_task(program, boundaries, indices, print_indices, inputs):
+    """Runs one compiled task; returns (outputs as (index, text), variables, failure as (index, error) or None)."""
+    vm = VirtualMachine(program, inputs)
+    try:
+        return list(zip(print_indices, vm.run())), vm.variables(), None
+    except Exception:
+        pass
+    # Rerun statement by statement on fresh slots to find the failing statement; slicing the
+    # instruction stream keeps constant and slot indices valid
+    vm = VirtualMachine(program, inputs)
+    outputs = []
+    start = 0
+    for index, end in zip(indices, boundaries):
+        vm.program = Program(program.code[start:end], program.constants, program.names)
+        try:
+            lines = vm.run()
+        except Exception as e:
+            return outputs, vm.variables(), (index, e)
+        outputs.extend((index, line) for line in lines)
+        start = end
+    return outputs, vm.variables(), None  # Only reached if the failure was not deterministic
+
+
+def run_bundle(bundle):
+    return [run_task(*task) for task in bundle]
+
+
+class ScheduleReport:
+    def __init__(self, statements, tasks, total_cost, critical_path_cost, critical_path_length, elapsed, workers):
+        self.statements = statements
+        self.tasks = tasks
+        self.total_cost = total_cost
+        self.critical_path_cost = critical_path_cost
+        self.critical_path_length = critical_path_length
+        self.elapsed = elapsed
+        self.workers = workers
+        self.sequential_elapsed = None
+
+    @property
+    def parallelism(self):
+        """Upper bound on the speedup: total work over the critical path."""
+        return self.total_cost / self.critical_path_cost if self.critical_path_cost else 1.0
+
+    @property
+    def speedup(self):
+        if self.sequential_elapsed is None or not self.elapsed:
+            return None
+        return self.sequential_elapsed / self.elapsed
+
+    def format(self):
+        lines = [f"statements: {self.statements}, tasks: {self.tasks}, workers: {self.workers}",
+                 f"critical path: {self.critical_path_length} statements, cost {self.critical_path_cost} "
+                 f"of {self.total_cost} (parallelism {self.parallelism:.1f}x)",
+                 f"parallel time: {self.elapsed * 1000:.1f} ms"]
+        if self.speedup is not None:
+            lines.append(f"sequential time: {self.sequential_elapsed * 1000:.1f} ms, speedup {self.speedup:.2f}x")
+        return "\n".join(lines)
+
+
+class ParallelScheduler:
+    def __init__(self, workers=None, min_parallel_cost=MIN_PARALLEL_COST):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_cost = min_parallel_cost
+        self.variables = {}
+        self.report = None
+
+    def execute(self, ast, measure_sequential=False):
+        """Runs ``ast`` and returns its output text, like CodeGenerator.execute."""
+        start = time.perf_counter()
+        graph = DependencyGraph(ast)
+        total_cost = sum(graph.costs)
+        critical_cost, critical_length = graph.critical_path()
+        tasks = build_tasks(graph) if self.workers > 1 and total_cost >= self.min_parallel_cost else {}
+        if len(tasks) <= 1:
+            # Nothing to overlap, or too little work to pay for the processes: run in order here
+            self.report = ScheduleReport(len(ast), 1, total_cost, critical_cost, critical_length, 0.0, 1)
+            vm = VirtualMachine(compile_program(ast))
+            try:
+                output = vm.run()
+            finally:
+                self.variables = vm.variables()
+                self.report.elapsed = time.perf_counter() - start
+                if measure_sequential:
+                    self.report.sequential_elapsed = self.report.elapsed
+            return "\n".join(output)
+
+        results = self.run_parallel(ast, tasks, total_cost)
+        outputs = []
+        failures = []
+        self.variables = {}
+        for task_outputs, variables, failure in results.values():
+            outputs.extend(task_outputs)
+            self.variables.update(variables)
+            if failure is not None:
+                failures.append(failure)
+        outputs.sort(key=lambda output: output[0])  # Stable, so one PRINT's lines keep their order
+        self.report = ScheduleReport(len(ast), len(tasks), total_cost, critical_cost, critical_length,
+                                     time.perf_counter() - start, self.workers)
+        if measure_sequential:
+            sequential_start = time.perf_counter()
+            try:
+                VirtualMachine(compile_program(ast)).run()
+            except Exception:
+                pass
+            self.report.sequential_elapsed = time.perf_counter() - sequential_start
+        if failures:
+            raise min(failures, key=lambda failure: failure[0])[1]
+        return "\n".join(text for _, text in outputs)
+
+    def run_parallel(self, ast, tasks, total_cost):
+        target = max(total_cost // (self.workers * BUNDLES_PER_WORKER), 1)
+        remaining = {root: set(task.depends_on) for root, task in tasks.items()}
+        dependents = {root: [] for root in tasks}
+        for root, task in tasks.items():
+            for dependency in task.depends_on:
+                dependents[dependency].append(root)
+        values = {}
+        results = {}
+        ready = sorted(root for root, waiting in remaining.items() if not waiting)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            while ready or running:
+                for bundle in self.bundles(ready, tasks, target):
+                    payload = []
+                    for root in bundle:
+                        task = tasks[root]
+                        program, boundaries, print_indices = compile_task(ast, task.indices)
+                        inputs = {name: values[name] for name in task.imports if name in values}
+                        payload.append((program, boundaries, task.indices, print_indices, inputs))
+                    running[pool.submit(run_bundle, payload)] = bundle
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    bundle = running.pop(future)
+                    for root, result in zip(bundle, future.result()):
+                        results[root] = result
+                        values.update(result[1])
+                        for dependent in dependents[root]:
+                            remaining[dependent].discard(root)
+                            if not remaining[dependent]:
+                                ready.append(dependent)
+                ready.sort()
+        return results
+
+    def bundles(self, ready, tasks, target):
+        """Packs ready tasks into bundles of roughly ``target`` cost to amortize inter-process overhead."""
+        bundle, cost = [], 0
+        for root in ready:
+            bundle.append(root)
+            cost += tasks[root].cost
+            if cost >= target:
+                yield bundle
+                bundle, cost = [], 0
+        if bundle:
+            yield bundle
+
+
+def independent_chains(chains, length, seed=0):
+    """Source of ``chains`` independent chains of trig/LOG/POW/MUL work, each ``length`` steps long."""
+    import random
+    rng = random.Random(seed)
+    lines = [f"VAR c{chain} = {rng.uniform(1, 2):.3f}" for chain in range(chains)]
+    for step in range(length):
+        for chain in range(chains):
+            op = rng.choice(["SIN", "COS", "TAN", "POW", "LOG", "MUL"])
+            if op == "POW":
+                expr = f"POW c{chain} 2"
+            elif op == "LOG":
+                expr = f"LOG 7.5 c{chain}"  # LOG only uses its first operand
+            elif op == "MUL":
+                expr = f"MUL c{chain} " + " ".join(f"{rng.uniform(0.5, 1.5):.3f}" for _ in range(8))
+            else:
+                expr = f"{op} c{chain}"
+            # A PRINT between assignments keeps the operand list from running into the next line
+            lines.append(f"PRINT c{chain}")
+            lines.append(f"c{chain} = {expr}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+    from lexer import Lexer
+    from parser import Parser
+
+    # Timing of independent chains against sequential execution; tests/test_scheduler.py checks the output
+    chains = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    ast = Parser(Lexer(independent_chains(chains, length))).parse()
+
+    scheduler = ParallelScheduler(workers)
+    scheduler.execute(ast, measure_sequential=True)
+    print(scheduler.report.format())
@@ -1,19 +1,117 @@
+"""Declaration checks plus def-use, type and constant inference.
+
+The symbol table maps each variable to a ``Symbol``: the join of the types
+of every value assigned to it so far (int, float or unknown), whether it is
+still a constant (declared with a compile-time value and never reassigned),
+that value, and the statements that declared and last defined it. Symbols
+are immutable, so copies of the table made between analyses stay valid.
+
+Given an ``errors`` list the analyzer records each error in it as
+(statement index, variable name, whether the name is the assigned one,
+message) and carries on; an undeclared variable then reads as unknown.
+"""
+from collections import namedtuple
+from ast_nodes import NUMBER, ID, DECLARE, ASSIGN, DIV, POW, BINARY_OPS
+from ir import ConstantFolding
+
+INT = "int"
+FLOAT = "float"
+UNKNOWN = "unknown"
+
+Symbol = namedtuple("Symbol", ["type", "constant", "value", "declared", "last_def"])
+
+
+def join(left, right):
+    """Least upper bound in the int / float / unknown lattice."""
+    return left if left == right else UNKNOWN
+
+
+def type_of_value(value):
+    if type(value) is int:
+        return INT
+    if type(value) is float:
+        return FLOAT
+    return UNKNOWN  # e.g. the complex result of a fractional power of a negative number
+
+
+def binary_type(op, left, right, exponent=None):
+    if left == UNKNOWN or right == UNKNOWN:
+        return UNKNOWN
+    if op == DIV:
+        return FLOAT
+    if op == POW:
+        if left == INT and right == INT:
+            # Negative integer exponents produce floats
+            return UNKNOWN if exponent is None else INT if exponent >= 0 else FLOAT
+        return FLOAT if right == INT else UNKNOWN  # Fractional powers can be complex
+    return INT if left == INT and right == INT else FLOAT
+
 
 class SemanticAnalyzer:
-    def __init__(self, ast):
+    def __init__(self, ast, symbol_table=None, offset=0, errors=None):
         self.ast = ast
-        self.symbol_table = {}
+        self.errors = errors
+        self.symbol_table = {} if symbol_table is None else symbol_table
+        self.offset = offset  # Index of ast[0] in the whole program, for resumed analyses
+        self.def_use = {}  # Defining statement index -> indices of statements that read that definition
+        self.expression_types = []  # Type of each statement's expression, in order
+        self.folder = ConstantFolding()
 
     def analyze(self):
-        for statement in self.ast:
-            if statement[0] == "DECLARE":
-                var_name = statement[1]
-                if var_name in self.symbol_table:
-                    raise RuntimeError(f"Variable '{var_name}' already declared")
-                self.symbol_table[var_name] = None
-            elif statement[0] == "ASSIGN":
-                var_name = statement[1]
-                if var_name not in self.symbol_table:
-                    raise RuntimeError(f"Variable '{var_name}' not declared")
-            # Other semantic checks can be added here
-    
\ No newline at end of file
+        symbol_table = self.symbol_table
+        for index, statement in enumerate(self.ast, self.offset):
+            expr_type, value = self.expression(statement.expr, index)
+            self.expression_types.append(expr_type)
+            if statement.op == DECLARE:
+                var_name = statement.name
+                if var_name in symbol_table:
+                    self.error(index, var_name, f"Variable '{var_name}' already declared", target=True)
+                    continue
+                symbol_table[var_name] = Symbol(expr_type, value is not None, value, index, index)
+                self.def_use[index] = []
+            elif statement.op == ASSIGN:
+                var_name = statement.name
+                symbol = symbol_table.get(var_name)
+                if symbol is None:
+                    self.error(index, var_name, f"Variable '{var_name}' not declared", target=True)
+                    continue
+                symbol_table[var_name] = Symbol(join(symbol.type, expr_type), False, None, symbol.declared, index)
+                self.def_use[index] = []
+        return symbol_table
+
+    def expression(self, expr, index):
+        """Returns (type, constant value or None) of ``expr``, recording its variable uses."""
+        op = expr.op
+        if op == NUMBER:
+            return type_of_value(expr.value), expr.value
+        if op == ID:
+            symbol = self.symbol_table.get(expr.name)
+            if symbol is None:
+                self.error(index, expr.name, f"Variable '{expr.name}' not declared")
+                return UNKNOWN, None
+            uses = self.def_use.get(symbol.last_def)
+            if uses is not None and (not uses or uses[-1] != index):
+                uses.append(index)
+            return symbol.type, symbol.value if symbol.constant else None
+        if op in BINARY_OPS:
+            left_type, left = self.expression(expr.operands[0], index)
+            for operand in expr.operands[1:]:
+                right_type, right = self.expression(operand, index)
+                left_type = binary_type(op, left_type, right_type, right if op == POW else None)
+                left = self.fold(op, [left, right])
+                if left is not None:
+                    left_type = type_of_value(left)
+            return left_type, left
+        # LOG and the trigonometric functions only use their first operand and always give floats
+        _, operand = self.expression(expr.operands[0], index)
+        return FLOAT, self.fold(op, [operand])
+
+    def error(self, index, name, message, target=False):
+        if self.errors is None:
+            raise RuntimeError(message)
+        self.errors.append((index, name, target, message))
+
+    def fold(self, op, values):
+        if any(value is None for value in values):
+            return None
+        return self.folder.fold(op, values)
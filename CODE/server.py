@@ -0,0 +1,400 @@
+"""Long-running compile server speaking JSON lines over a Unix socket or stdin/stdout.
+
+Each request is one JSON object per line and gets one JSON line back, with
+the same ``id``. Responses on a connection can come back out of order.
+
+    {"id": 1, "code": "VAR x = 2\\nPRINT POW x 10", "optimize": false, "limits": {"max_seconds": 2}}
+    {"id": 1, "ok": true, "output": "1024", "tac": "...", "assembly": "...", "diagnostics": [], ...}
+    {"id": 2, "command": "stats"}
+
+Compiles run in a process pool whose workers import the compiler once and
+keep a warm in-memory CompilationCache, so a request only pays for its own
+work. At most ``max_pending`` requests are in flight across all
+connections; past that the server stops reading, which pushes back on
+clients through the socket or pipe buffers. Every run is bounded by
+``DEFAULT_LIMITS``; a request's ``limits`` takes any ExecutionPolicy
+keyword argument, including the numeric backend, and can tighten them but
+not loosen or remove them. Only
+the bytecode VM enforces limits, so requests for another ``backend`` are
+refused. Shutting down stops the workers without waiting for running
+compiles.
+
+With ``--stdio``, stdin and stdout can also be regular files
+(``serve --stdio < requests.jsonl > log``); those are read and written on
+threads, since asyncio pipes only take pipes, sockets and terminals.
+
+    python server.py serve --socket /tmp/compiler.sock
+    python server.py serve --stdio
+    python server.py load --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import stat
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from assembler import DEFAULT_REGISTERS
+from compile_cache import CompilationCache
+from compiler import compile_source
+from diagnostics import CompileError
+from policy import ExecutionPolicy, ResourceLimitError
+
+DEFAULT_MAX_PENDING = 64
+MAX_LINE_BYTES = 64 * 1024 * 1024  # Longest request or response line
+DEFAULT_LIMITS = {"max_seconds": 10.0, "max_int_bits": 1 << 22}  # Keeps one request from stalling a worker
+
+_cache = None  # The worker process's CompilationCache
+
+
+def _start_worker(cache_dir, started):
+    global _cache
+    started.put(os.getpid())  # So that close() can stop this worker while it is busy
+    # Forked after the event loop took over SIGTERM; the default action lets close() stop a busy worker
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _cache = CompilationCache(cache_dir)
+    compile_source("VAR x = 1\nPRINT x")  # Warms up imports and lazily built tables
+
+
+def limits_error(limits):
+    """Why a request's ``limits`` are refused, or None when they are no looser than DEFAULT_LIMITS."""
+    if not isinstance(limits, dict):
+        return "'limits' must be a JSON object"
+    for name, default in DEFAULT_LIMITS.items():
+        value = limits.get(name, default)
+        if type(value) not in (int, float) or not 0 < value <= default:
+            return f"Limit '{name}' must be a positive number no larger than {default}"
+    return None
+
+
+def handle(request):
+    """Runs one compile request in a worker process and returns its JSON-ready response."""
+    start = time.perf_counter()
+    response = {"id": request.get("id")}
+    try:
+        policy = ExecutionPolicy(**dict(DEFAULT_LIMITS, **request.get("limits", {})))
+        result = compile_source(request["code"], request.get("optimize", False),
+                                request.get("registers", DEFAULT_REGISTERS), "vm", _cache, policy)
+        response.update(ok=True, output=result["output"], tac=result["tac"], assembly=result["assembly"],
+                        diagnostics=[],
+                        runtime_errors=[{"line": line, "message": message}
+                                        for line, message in result.get("runtime_errors", ())],
+                        timings=result["timings"])
+    except CompileError as e:
+        response.update(ok=False, error=str(e.diagnostics[0]),
+                        diagnostics=[diagnostic.to_dict() for diagnostic in e.diagnostics])
+    except ResourceLimitError as e:
+        response.update(ok=False, error=str(e), limit=e.kind, diagnostics=[])
+    except Exception as e:
+        response.update(ok=False, error=f"{type(e).__name__}: {e}", diagnostics=[])
+    response["seconds"] = time.perf_counter() - start
+    return response
+
+
+class CompileServer:
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.started = multiprocessing.SimpleQueue()  # PIDs of the workers, put by each as it starts
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_start_worker, initargs=(cache_dir, self.started))
+        self.slots = asyncio.Semaphore(max_pending)
+        self.stats = {"requests": 0, "failed": 0, "in_flight": 0, "connections": 0}
+
+    async def serve_connection(self, reader, writer):
+        """Reads requests from one stream until it closes, answering each as soon as it is done."""
+        self.stats["connections"] += 1
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                await self.slots.acquire()  # Backpressure: nothing more is read while every slot is taken
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Line longer than MAX_LINE_BYTES; the stream cannot be resynced
+                    self.slots.release()
+                    await self.write(writer, lock, {"id": None, "ok": False, "error": "Request line too long"})
+                    break
+                if not line:
+                    self.slots.release()
+                    break
+                task = asyncio.create_task(self.respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            self.stats["connections"] -= 1
+            writer.close()
+
+    async def respond(self, line, writer, lock):
+        self.stats["in_flight"] += 1
+        try:
+            response = await self.process(line)
+        finally:
+            self.stats["in_flight"] -= 1
+            self.slots.release()
+        self.stats["requests"] += 1
+        if not response.get("ok"):
+            self.stats["failed"] += 1
+        await self.write(writer, lock, response)
+
+    async def write(self, writer, lock, response):
+        async with lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def process(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"id": None, "ok": False, "error": f"Invalid JSON: {e}"}
+        if not isinstance(request, dict):
+            return {"id": None, "ok": False, "error": "A request must be a JSON object"}
+        command = request.get("command", "compile")
+        if command == "ping":
+            return {"id": request.get("id"), "ok": True}
+        if command == "stats":
+            return {"id": request.get("id"), "ok": True,
+                    "stats": dict(self.stats, workers=self.workers, max_pending=self.max_pending)}
+        if command != "compile" or not isinstance(request.get("code"), str):
+            return {"id": request.get("id"), "ok": False, "error": "Expected a compile request with a 'code' string"}
+        if request.get("backend", "vm") != "vm":
+            # The JIT and the parallel scheduler cannot be bounded, so one request could hold a worker forever
+            return {"id": request.get("id"), "ok": False,
+                    "error": "Only the vm backend can run under the server's limits"}
+        error = limits_error(request.get("limits", {}))
+        if error is not None:
+            return {"id": request.get("id"), "ok": False, "error": error}
+        return await asyncio.get_running_loop().run_in_executor(self.pool, handle, request)
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.unlink(path)  # Left over from a server that did not shut down cleanly
+        server = await asyncio.start_unix_server(self.serve_connection, path, limit=MAX_LINE_BYTES)
+        print(f"compile server listening on {path} with {self.workers} workers", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    async def serve_stdio(self):
+        """Serves the requests read from stdin until it closes; responses go to stdout."""
+        reader, writer = await stdio_streams()
+        await self.serve_connection(reader, writer)
+
+    def close(self):
+        """Stops the workers; compiles still running are killed rather than waited for."""
+        while not self.started.empty():
+            try:
+                os.kill(self.started.get(), signal.SIGTERM)
+            except ProcessLookupError:  # Already gone
+                pass
+        self.pool.shutdown(cancel_futures=True)  # Returns once the pool has noticed its workers died
+        self.started.close()
+
+
+class _FileReader:
+    """The readline() of a StreamReader for a regular file, read on a thread."""
+
+    def __init__(self, file):
+        self.file = file
+
+    async def readline(self):
+        line = await asyncio.get_running_loop().run_in_executor(None, self.file.readline, MAX_LINE_BYTES + 1)
+        if len(line) > MAX_LINE_BYTES:
+            raise ValueError("Line is longer than the stream limit")
+        return line
+
+
+class _FileWriter:
+    """The write()/drain()/close() of a StreamWriter for a regular file, written on a thread."""
+
+    def __init__(self, file):
+        self.file = file
+        self.pending = []
+
+    def write(self, data):
+        self.pending.append(data)
+
+    async def drain(self):
+        data = b"".join(self.pending)
+        self.pending = []
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    def _write(self, data):
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self):
+        self._write(b"".join(self.pending))
+        self.pending = []
+
+
+def _is_file(stream):
+    return stat.S_ISREG(os.fstat(stream.fileno()).st_mode)
+
+
+async def stdio_streams():
+    """A reader for stdin and a writer for stdout; regular files are read and written on threads."""
+    loop = asyncio.get_running_loop()
+    pipe_reader = None
+    if _is_file(sys.stdin):
+        reader = _FileReader(sys.stdin.buffer)
+    else:
+        reader = pipe_reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    if _is_file(sys.stdout):
+        return reader, _FileWriter(sys.stdout.buffer)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    return reader, asyncio.StreamWriter(transport, protocol, pipe_reader, loop)
+
+
+class Client:
+    """Pipelines requests over one server stream, matching responses to requests by id."""
+
+    def __init__(self, reader, writer, process=None):
+        self.reader = reader
+        self.writer = writer
+        self.process = process
+        self.ids = itertools.count(1)
+        self.waiting = {}
+        self.receiver = asyncio.create_task(self.receive())
+
+    @classmethod
+    async def connect(cls, path):
+        reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE_BYTES)
+        return cls(reader, writer)
+
+    @classmethod
+    async def spawn(cls, *arguments):
+        """Starts ``server.py serve --stdio`` as a child process and talks to it over its pipes."""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "serve", "--stdio", *arguments,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=MAX_LINE_BYTES)
+        return cls(process.stdout, process.stdin, process)
+
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def request(self, **request):
+        request["id"] = next(self.ids)
+        future = self.waiting[request["id"]] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.receiver
+        if self.process is not None:
+            await self.process.wait()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def load_test(client, requests=1000, concurrency=16, statements=20, distinct=100):
+    """Sends ``requests`` compiles with ``concurrency`` in flight; returns latency and throughput figures.
+
+    Programs cycle through ``distinct`` generated sources, so repeats show the warm cache.
+    """
+    from benchmark import generate_program
+    programs = [generate_program(statements, variables=4, seed=seed) for seed in range(distinct)]
+    counter = itertools.count()
+    latencies = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for index in counter:
+            if index >= requests:
+                return
+            start = time.perf_counter()
+            response = await client.request(code=programs[index % distinct])
+            latencies.append(time.perf_counter() - start)
+            failures += not response["ok"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"requests": requests, "failed": failures, "seconds": elapsed, "throughput": requests / elapsed,
+            "p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99), "max": latencies[-1]}
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Persistent JSON-lines compile server.")
+    commands = arguments.add_subparsers(dest="command", required=True)
+
+    serve_command = commands.add_parser("serve", help="run the server")
+    where = serve_command.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="listen on this Unix socket path")
+    where.add_argument("--stdio", action="store_true", help="read requests from stdin, answer on stdout")
+    serve_command.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    serve_command.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                               help="requests in flight before the server stops reading")
+    serve_command.add_argument("--cache-dir", help="also keep the compilation cache in this directory")
+
+    load_command = commands.add_parser("load", help="load-test a server and report latency percentiles")
+    load_command.add_argument("--socket", help="server socket; without it a stdio server is started")
+    load_command.add_argument("--workers", type=int, help="workers of the started server")
+    load_command.add_argument("--requests", type=int, default=1000)
+    load_command.add_argument("--concurrency", type=int, default=16)
+    load_command.add_argument("--statements", type=int, default=20, help="statements per generated program")
+    load_command.add_argument("--distinct", type=int, default=100, help="number of different programs")
+
+    args = arguments.parse_args(argv)
+    if args.command == "serve":
+        async def serve():
+            # SIGTERM unwinds like Ctrl-C, so the socket file is removed and the workers are stopped
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            server = CompileServer(args.workers, args.max_pending, args.cache_dir)
+            try:
+                if args.stdio:
+                    await server.serve_stdio()
+                else:
+                    await server.serve_unix(args.socket)
+            finally:
+                server.close()
+        try:
+            asyncio.run(serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        return 0
+
+    async def run_load_test():
+        if args.socket:
+            client = await Client.connect(args.socket)
+        else:
+            client = await Client.spawn(*(["--workers", str(args.workers)] if args.workers else []))
+        try:
+            await client.request(command="ping")
+            return await load_test(client, args.requests, args.concurrency, args.statements, args.distinct)
+        finally:
+            await client.close()
+
+    report = asyncio.run(run_load_test())
+    print(f"{report['requests']} requests ({report['failed']} failed) in {report['seconds']:.2f}s: "
+          f"{report['throughput']:.0f} req/s, p50 {report['p50'] * 1000:.2f}ms, "
+          f"p99 {report['p99'] * 1000:.2f}ms, max {report['max'] * 1000:.2f}ms")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Streaming compilation with bounded memory for very large scripts.
+
+The source file is read in chunks cut at line ends and lexed lazily, and
+statements are parsed, checked, executed and turned into TAC and assembly a
+batch of ``batch_size`` at a time. Output, TAC and assembly go straight to
+their file sinks, so memory holds one batch plus the variables and the
+symbol table, however long the input is.
+
+Errors stop the compile at the statement that has them, after the output of
+the earlier batches has been written; unlike the whole-program pipeline,
+later statements are never looked at. Assembly is allocated per batch, so
+register choices and spill slots can differ from a whole-program build, and
+there is no IR optimization.
+"""
+import time
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from bytecode import compile_program, VirtualMachine
+from assembler import DEFAULT_REGISTERS, generate_assembly, format_stats
+from policy import Budget
+import ir
+
+DEFAULT_BATCH_SIZE = 1024  # Statements per batch
+DEFAULT_CHUNK_SIZE = 1 << 20  # Characters read from the source at a time
+
+# Statistics that add up over batches; registers_used takes the maximum instead
+_SUMMED_STATS = ("instructions_before", "instructions_after", "spilled", "forwarded_movs", "sunk_stores",
+                 "self_movs", "merged_adds", "strength_reduced")
+
+
+def stream_tokens(source_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the tokens of an open text file, lexing it a chunk of whole lines at a time."""
+    line = 1
+    rest = ""
+    while True:
+        chunk = source_file.read(chunk_size)
+        if not chunk:
+            break
+        chunk = rest + chunk
+        end = chunk.rfind("\n") + 1  # Tokens never span a line, so every piece ends at one
+        if end == 0:
+            rest = chunk
+            continue
+        piece, rest = chunk[:end], chunk[end:]
+        yield from Lexer(piece, line).iter_tokens()
+        line += piece.count("\n")
+    if rest:
+        yield from Lexer(rest, line).iter_tokens()
+
+
+class _Sink:
+    """A text file written a line at a time; gets a single newline if nothing was written, like a built file."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.empty = True
+
+    def write_lines(self, lines):
+        if lines:
+            self.file.write("\n".join(lines) + "\n")
+            self.empty = False
+
+    def close(self):
+        if self.empty:
+            self.file.write("\n")
+        self.file.close()
+
+
+class StreamingCompiler:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, registers=DEFAULT_REGISTERS, policy=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if batch_size < 1:
+            raise ValueError("Batches need at least one statement")
+        self.batch_size = batch_size
+        self.registers = registers
+        self.policy = policy  # An ExecutionPolicy bounding the whole run, or None for the plain VM
+        self.chunk_size = chunk_size
+        self.symbol_table = {}
+        self.variables = {}
+        self.statements = 0
+        self.temp_counter = 0  # TAC temps used so far, so T-names continue across batches
+        self.assembly_stats = {}
+        self.runtime_errors = []  # (line, message) of statements skipped under a keep_going policy
+        self.timings = {"parse": 0.0, "semantic": 0.0, "codegen": 0.0, "views": 0.0}  # parse includes lexing
+        self.budget = None if policy is None else Budget(policy)
+
+    def compile_file(self, source_path, out_base):
+        """Compiles ``source_path`` into out_base + .out, .tac and .asm; returns the phase timings."""
+        sinks = [_Sink(out_base + extension) for extension in (".out", ".tac", ".asm")]
+        try:
+            with open(source_path, "r") as source_file:
+                self.run(stream_tokens(source_file, self.chunk_size), *sinks)
+        finally:
+            for sink in sinks:
+                sink.close()
+        return self.timings
+
+    def run(self, tokens, output_sink, tac_sink, asm_sink):
+        clock = time.perf_counter
+        parser = Parser(tokens)
+        while parser.current_token:
+            start = clock()
+            parser.leaves = {}  # Only shared within a batch, so it stays bounded
+            batch = []
+            while parser.current_token and len(batch) < self.batch_size:
+                batch.append(parser.statement())
+            self.timings["parse"] += clock() - start
+            self.compile_batch(batch, output_sink, tac_sink, asm_sink)
+        if asm_sink.empty:
+            asm_sink.write_lines([""])  # An empty program still gets its statistics line after a blank one
+        asm_sink.write_lines([format_stats(self.assembly_stats or generate_assembly([], self.registers)[1])])
+
+    def compile_batch(self, batch, output_sink, tac_sink, asm_sink):
+        clock = time.perf_counter
+        start = clock()
+        SemanticAnalyzer(batch, self.symbol_table, self.statements).analyze()
+        self.timings["semantic"] += clock() - start
+
+        start = clock()
+        program = compile_program(batch)
+        if self.policy is None:
+            vm = VirtualMachine(program, self.variables)
+        else:
+            vm = self.policy.machine(program, self.variables, self.budget)
+        try:
+            output_sink.write_lines(vm.run())
+        finally:
+            self.variables.update(vm.variables())
+            if self.policy is not None:
+                self.runtime_errors.extend((batch[statement].line, message) for statement, message in vm.errors)
+        self.timings["codegen"] += clock() - start
+
+        start = clock()
+        tac_sink.write_lines(program.tac_lines(self.temp_counter))
+        self.temp_counter += program.temp_count()
+        assembly, stats = generate_assembly(ir.build_ir(batch), self.registers)
+        asm_sink.write_lines([assembly] if assembly else [])
+        self.add_stats(stats)
+        self.timings["views"] += clock() - start
+        self.statements += len(batch)
+
+    def add_stats(self, stats):
+        if not self.assembly_stats:
+            self.assembly_stats = dict(stats)
+            return
+        totals = self.assembly_stats
+        for name in _SUMMED_STATS:
+            totals[name] += stats[name]
+        totals["registers_used"] = max(totals["registers_used"], stats["registers_used"])
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import tracemalloc
+
+    # Peak memory stays flat as the program grows (over a fixed set of variables)
+    names = 64
+    line = "v{0} = ADD v{1} 3.5\nPRINT v{0}\n"
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(arg) for arg in sys.argv[1:] or ("10000", "40000", "160000")):
+            path = os.path.join(directory, f"stream_{count}.txt")
+            with open(path, "w") as source_file:
+                for i in range(names):
+                    source_file.write(f"VAR v{i} = {i}\n")
+                for i in range(count):
+                    source_file.write(line.format(i % names, (i + 1) % names))
+            tracemalloc.start()
+            start = time.perf_counter()
+            compiler = StreamingCompiler()
+            compiler.compile_file(path, os.path.join(directory, "stream"))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{compiler.statements:>8} statements, {os.path.getsize(path) / 1e6:6.1f} MB: "
+                  f"{elapsed:6.2f}s, peak {peak / 1e6:6.1f} MB")
@@ -0,0 +1,32 @@
+import pytest
+from artifact import ArtifactError, load_artifact, write_artifact
+from bytecode import VirtualMachine, compile_program
+from lexer import Lexer
+from parser import Parser
+
+HEADER_FLAGS = 6  # Offsets of header fields
+HEADER_COUNT = 24
+
+
+def write(path, optimized=False):
+    program = compile_program(Parser(Lexer("VAR x = 2\nPRINT POW x 10")).parse())
+    write_artifact(str(path), program, program.tac(), program.assembly(), optimized)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "program.cco"
+    write(path, optimized=True)
+    with load_artifact(str(path)) as artifact:
+        assert artifact.optimized
+        assert VirtualMachine(artifact.program).run() == ["1024"]
+
+
+@pytest.mark.parametrize("offset", [HEADER_FLAGS, HEADER_COUNT, 40, -1])
+def test_changed_bytes_are_refused(tmp_path, offset):
+    path = tmp_path / "program.cco"
+    write(path)
+    data = bytearray(path.read_bytes())
+    data[offset] ^= 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ArtifactError, match="checksum"):
+        load_artifact(str(path))
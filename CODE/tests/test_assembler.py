@@ -0,0 +1,80 @@
+import random
+import pytest
+import ir
+from assembler import AsmInstr, LinearScanAllocator, Peephole, generate_assembly
+from jit import random_program
+from lexer import Lexer
+from parser import Parser
+
+Const = ir.Const
+
+
+def peephole(*instructions):
+    optimizer = Peephole()
+    asm = optimizer.run([AsmInstr(opcode, dest, list(srcs)) for opcode, dest, srcs in instructions])
+    return [(instr.opcode, instr.dest, instr.srcs) for instr in asm], optimizer.stats
+
+
+def test_strength_reduction():
+    asm, stats = peephole(("MUL", "a", ["x", Const(2)]), ("POW", "b", ["x", Const(2)]),
+                          ("MUL", "c", ["x", Const(1)]), ("ADD", "d", ["x", Const(0)]),
+                          ("MUL", "e", ["x", Const(2.0)]))
+    assert asm == [("ADD", "a", ["x", "x"]), ("MUL", "b", ["x", "x"]), ("MOV", "c", ["x"]), ("MOV", "d", ["x"]),
+                   ("MUL", "e", ["x", Const(2.0)])]  # Only int immediates, so float results keep their type
+    assert stats["strength_reduced"] == 4
+
+
+def test_forwarding_sinking_and_merging():
+    asm, stats = peephole(("MOV", "%t1", ["x"]), ("SUB", "%t2", ["%t1", "y"]), ("MOV", "a", ["%t2"]),
+                          ("ADD", "%t3", ["a", Const(1)]), ("ADD", "%t4", ["%t3", Const(2)]), ("OUT", None, ["%t4"]),
+                          ("MOV", "b", ["b"]))
+    assert asm == [("SUB", "a", ["x", "y"]), ("ADD", "%t4", ["a", Const(3)]), ("OUT", None, ["%t4"])]
+    assert stats["forwarded_movs"] == 1 and stats["sunk_stores"] == 1
+    assert stats["merged_adds"] == 1 and stats["self_movs"] == 1
+
+
+def test_temps_read_twice_are_not_forwarded():
+    instructions = [("MOV", "%t1", ["x"]), ("ADD", "a", ["%t1", "y"]), ("OUT", None, ["%t1"])]
+    asm, _ = peephole(*instructions)
+    assert asm == [(opcode, dest, list(srcs)) for opcode, dest, srcs in instructions]
+
+
+def intervals(asm):
+    spans = {}
+    for index, instr in enumerate(asm):
+        for operand in instr.operands():
+            if ir.is_temp(operand):
+                spans[operand] = (spans.get(operand, (index,))[0], index)
+    return spans
+
+
+@pytest.mark.parametrize("registers", [1, 2, 3, 8])
+def test_allocation_stays_within_the_registers(registers):
+    rng = random.Random(registers)
+    for _ in range(50):
+        asm = [AsmInstr("ADD", f"%t{n}", [f"%t{rng.randrange(n)}" if n else "x", Const(1)]) for n in range(40)]
+        asm += [AsmInstr("OUT", None, [f"%t{rng.randrange(40)}"]) for _ in range(10)]
+        allocator = LinearScanAllocator(registers)
+        locations = allocator.allocate(asm)
+        assert set(locations) == set(intervals(asm))
+        in_registers = {temp: location for temp, location in locations.items() if location.startswith("R")}
+        assert {int(location[1:]) for location in in_registers.values()} <= set(range(registers))
+        assert allocator.registers_used <= registers
+        assert allocator.spilled == len(locations) - len(in_registers)
+        spans = intervals(asm)
+        for temp, location in in_registers.items():
+            for other, other_location in in_registers.items():
+                if temp < other and location == other_location:
+                    (start, end), (other_start, other_end) = spans[temp], spans[other]
+                    assert end <= other_start or other_end <= start, (temp, other, location)
+
+
+def test_generated_assembly_respects_the_register_count():
+    rng = random.Random(0)
+    for _ in range(100):
+        instructions = ir.build_ir(Parser(Lexer(random_program(rng))).parse())
+        for registers in (1, 3):
+            assembly, stats = generate_assembly(instructions, registers)
+            used = {word.strip(",") for word in assembly.split() if word.strip(",").startswith("R")}
+            assert {int(register[1:]) for register in used} <= set(range(registers))
+            assert stats["registers_used"] <= registers
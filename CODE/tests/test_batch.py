@@ -0,0 +1,70 @@
+import pytest
+from batch import BatchExecutor, run_batch
+from compiler import compile_source
+from lexer import Lexer
+from parser import Parser
+
+np = pytest.importorskip("numpy")
+
+PROGRAM = """VAR x = {x}
+VAR y = {y}
+VAR a = DIV x y
+PRINT a
+VAR b = POW x 0.5
+PRINT b
+VAR c = LOG y 10
+PRINT SIN c
+PRINT MUL x y 3
+"""
+XS = [4, -8, 0, 2.5, -0.5, 9, 1]
+YS = [2, 3, 5, 0, 1.5, -1, 100]
+
+
+def vm_row(x, y):
+    """The VM's output lines for one row, or the message of its first error."""
+    try:
+        lines = compile_source(PROGRAM.format(x=x, y=y))["output"].split("\n")
+    except Exception as e:
+        return str(e)
+    for line in lines:
+        if "j" in line:
+            return "complex"
+    return [float(line) for line in lines]
+
+
+def test_rows_match_the_vm():
+    ast = Parser(Lexer(PROGRAM.format(x=0, y=0))).parse()
+    for optimize in (False, True):
+        result = BatchExecutor(ast, ["x", "y"], optimize).run({"x": np.array(XS), "y": np.array(YS)})
+        errors = dict(result.errors)
+        for row, (x, y) in enumerate(zip(XS, YS)):
+            expected = vm_row(x, y)
+            if expected == "complex":
+                assert errors[row] == "A negative number raised to a fractional power is complex"
+            elif isinstance(expected, str):
+                assert not result.valid[row] and errors[row] in expected  # Python adds "float " for floats
+            else:
+                assert result.valid[row] and row not in errors
+                assert [output[row] for output in result.outputs] == pytest.approx(expected)
+
+
+def test_trig_of_an_infinity_fails_the_row():
+    result = run_batch(Parser(Lexer("VAR x = 0\nPRINT COS x")).parse(), {"x": np.array([0.0, np.inf, -np.inf])})
+    assert list(result.valid) == [True, False, False]
+    assert result.errors == [(1, "math domain error"), (2, "math domain error")]
+
+
+def test_columns_must_have_the_same_length():
+    ast = Parser(Lexer("VAR x = 0\nVAR y = 0\nPRINT ADD x y")).parse()
+    with pytest.raises(ValueError, match="x has 3, y has 2"):
+        run_batch(ast, {"x": np.arange(3), "y": np.arange(2)})
+    with pytest.raises(ValueError, match="one-dimensional"):
+        run_batch(ast, {"x": np.zeros((2, 2)), "y": np.zeros(2)})
+
+
+def test_chunks_give_the_same_result():
+    ast = Parser(Lexer("VAR x = 0\nVAR y = DIV 10 x\nPRINT y")).parse()
+    column = np.arange(-50, 50)
+    whole, chunked = run_batch(ast, {"x": column}), run_batch(ast, {"x": column}, chunk_size=7)
+    assert np.array_equal(whole.outputs[0], chunked.outputs[0], equal_nan=True)
+    assert whole.errors == chunked.errors == [(50, "division by zero")]
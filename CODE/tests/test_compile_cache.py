@@ -0,0 +1,25 @@
+import os
+from compile_cache import CompilationCache
+
+
+def disk_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(directory) for name in files)
+
+
+def test_directory_is_created_on_first_write(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = CompilationCache(directory)
+    assert not os.path.exists(directory)
+    cache.put("lex", cache.key("source", "PRINT 1"), ["tokens"])
+    assert os.path.isdir(directory)
+
+
+def test_overwriting_a_key_does_not_double_count(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = CompilationCache(directory)
+    key = cache.key("source", "PRINT 1")
+    cache.put("lex", key, ["short"])
+    cache.put("lex", key, ["a longer value"] * 10)
+    cache.put("lex", key, ["short"])
+    assert cache.disk_bytes == disk_size(directory)
+    assert CompilationCache(directory).disk_bytes == cache.disk_bytes
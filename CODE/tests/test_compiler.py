@@ -0,0 +1,39 @@
+import os
+import pytest
+from compiler import build, collect_sources, main
+
+
+def write(path, code):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as source_file:
+        source_file.write(code)
+
+
+def read(path):
+    with open(path) as output_file:
+        return output_file.read()
+
+
+def test_build_mirrors_directory_layout(tmp_path):
+    write(str(tmp_path / "src" / "x.src"), "PRINT 1")
+    write(str(tmp_path / "src" / "sub" / "x.src"), "PRINT 2")
+    out_dir = str(tmp_path / "out")
+    results = build([str(tmp_path / "src")], out_dir, jobs=1)
+    assert all(result["ok"] for result in results)
+    assert read(os.path.join(out_dir, "x.out")) == "1\n"
+    assert read(os.path.join(out_dir, "sub", "x.out")) == "2\n"
+
+
+def test_sources_sharing_an_output_name_are_rejected(tmp_path):
+    write(str(tmp_path / "a" / "x.src"), "PRINT 1")
+    write(str(tmp_path / "b" / "x.src"), "PRINT 2")
+    with pytest.raises(ValueError, match="x.out"):
+        collect_sources([str(tmp_path / "a" / "x.src"), str(tmp_path / "b" / "x.src")])
+
+
+def test_profile_with_limits_is_rejected(tmp_path, capsys):
+    write(str(tmp_path / "x.src"), "PRINT 1")
+    with pytest.raises(SystemExit):
+        main(["build", str(tmp_path / "x.src"), "-o", str(tmp_path / "out"), "--profile",
+              str(tmp_path / "profile.json"), "--max-int-bits", "1000"])
+    assert "--profile" in capsys.readouterr().err
@@ -0,0 +1,8 @@
+from compiler import compile_source
+
+
+def test_negative_zero_is_not_shared_with_zero():
+    code = "PRINT 0.0\nPRINT -0.0\nVAR a = 0.0\nVAR b = -0.0\nPRINT MUL b 1\nPRINT MUL a 1"
+    for optimize in (False, True):
+        assert compile_source(code, optimize)["output"].split("\n") == ["0.0", "-0.0", "-0.0", "0.0"]
+    assert compile_source(code, backend="jit")["output"].split("\n") == ["0.0", "-0.0", "-0.0", "0.0"]
@@ -0,0 +1,56 @@
+import pytest
+from compiler import compile_source
+from diagnostics import CompileError, Diagnostic, LEXICAL, SEMANTIC, SYNTAX, check, collecting
+
+PROGRAM = """VAR a = 1
+VAR = 2
+PRINT b
+x = ADD a @ 3
+VAR a = 5
+PRINT ADD
+VAR c = 4
+PRINT c
+y = 3
+"""
+
+
+def test_every_error_is_reported_at_its_position():
+    assert check(PROGRAM) == [
+        Diagnostic(SYNTAX, 2, 5, "Expected identifier after VAR, found '='"),
+        Diagnostic(SEMANTIC, 3, 7, "Variable 'b' not declared"),
+        Diagnostic(SEMANTIC, 4, 1, "Variable 'x' not declared"),
+        Diagnostic(LEXICAL, 4, 11, "Unexpected character: @"),
+        Diagnostic(SEMANTIC, 5, 5, "Variable 'a' already declared"),
+        Diagnostic(SYNTAX, 6, 7, "Operation 'ADD' requires at least two operands, found 0"),
+        Diagnostic(SEMANTIC, 9, 1, "Variable 'y' not declared"),
+    ]
+
+
+def test_positions_count_leading_blank_lines_and_indentation():
+    assert [(d.line, d.column) for d in check("\n\n   VAR a = 1\n  PRINT b\n  VAR 3")] == [(4, 9), (5, 7)]
+
+
+def test_a_bad_declaration_still_declares_its_name():
+    assert check("VAR a = ADD 1\nPRINT a\na = 2") == [
+        Diagnostic(SYNTAX, 1, 9, "Operation 'ADD' requires at least two operands, found 1")]
+
+
+def test_valid_programs_have_no_diagnostics():
+    assert check("VAR a = 1\nPRINT ADD a 2") == []
+
+
+def test_collecting_raises_compile_error_with_every_diagnostic():
+    with pytest.raises(CompileError) as error:
+        compile_source(PROGRAM)
+    assert error.value.diagnostics == check(PROGRAM)
+    assert str(error.value).splitlines()[0] == "2:5: syntax error: Expected identifier after VAR, found '='"
+    assert isinstance(error.value.__cause__, (SyntaxError, RuntimeError))
+
+
+def test_collecting_passes_other_errors_through():
+    with pytest.raises(ZeroDivisionError):
+        with collecting("VAR a = 1"):
+            raise ZeroDivisionError("division by zero")
+    with pytest.raises(RuntimeError, match="boom"):
+        with collecting("VAR a = 1"):  # Recovery finds nothing, so the original error stands
+            raise RuntimeError("boom")
@@ -0,0 +1,64 @@
+import os
+import pytest
+from history import HistoryStore, source_hash
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def codes(entries):
+    return [entry.code for entry in entries]
+
+
+def test_programs_are_stored_once(store):
+    store.record("PRINT 1", 0.1, timestamp=1)
+    store.record("PRINT 1", 0.2, "RuntimeError: boom", timestamp=2)
+    store.record("PRINT 2", timestamp=3)
+    assert store.stats()["runs"] == 3 and store.stats()["sources"] == 2
+    newest = store.query()
+    assert codes(newest) == ["PRINT 2", "PRINT 1", "PRINT 1"]
+    assert newest[1].error == "RuntimeError: boom" and newest[1].hash == source_hash("PRINT 1")
+
+
+def test_pruning_keeps_the_newest_runs_and_drops_orphaned_programs(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), max_runs=3)
+    for timestamp, code in enumerate(["VAR old = 1", "PRINT kept", "VAR mid = 2", "PRINT kept", "VAR new = 3"]):
+        store.record(code, timestamp=timestamp)
+    assert codes(store.query()) == ["VAR new = 3", "PRINT kept", "VAR mid = 2"]
+    assert store.stats()["sources"] == 3
+    assert store.query(text="old") == []  # Gone from the text index too
+    store.close()
+
+
+@pytest.mark.parametrize("full_text", [True, False])
+def test_text_search(store, full_text):
+    if full_text and not store.full_text:
+        pytest.skip("SQLite has no FTS5 trigram tokenizer")
+    store.full_text = full_text  # False searches with instr, like a build without FTS5
+    store.record("VAR total = 1\nPRINT total", timestamp=10)
+    store.record('PRINT "quoted"', timestamp=20)
+    store.record("VAR other = 2", timestamp=30)
+    assert codes(store.query(text="TOTAL")) == ["VAR total = 1\nPRINT total"]
+    assert codes(store.query(text='"quoted"')) == ['PRINT "quoted"']
+    assert codes(store.query(text="th")) == ["VAR other = 2"]  # Too short for trigrams, so instr
+    assert codes(store.query(text="VAR", start=15)) == ["VAR other = 2"]
+    assert codes(store.query(start=10, end=30)) == ['PRINT "quoted"', "VAR total = 1\nPRINT total"]
+
+
+def test_text_history_is_imported_once(store, tmp_path):
+    path = tmp_path / "code_history.txt"
+    path.write_text("--- 2024-01-02 03:04:05 ---\nVAR a = 1\nPRINT a\n\n--- 2024-01-03 00:00:00 ---\nPRINT 2\n")
+    assert store.import_text_history(str(path)) == 2
+    assert store.import_text_history(str(path)) == 0  # Stamped in meta, so the file is not read again
+    entries = store.query()
+    assert codes(entries) == ["PRINT 2", "VAR a = 1\nPRINT a"]
+    assert entries[1].timestamp == 1704164645  # The old file's timestamps are UTC
+    with open(path, "a") as history_file:
+        history_file.write("--- 2024-01-04 00:00:00 ---\nPRINT 3\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert store.import_text_history(str(path)) == 1  # Runs already imported are not added twice
+    assert store.stats()["runs"] == 3
@@ -0,0 +1,60 @@
+import random
+from compiler import compile_source
+from incremental import IncrementalCompiler
+from lexer import Lexer
+from parser import Parser
+
+VARIABLES = 8
+
+
+def pair(rng):
+    """An assignment and a PRINT; the PRINT ends the assignment's operand list."""
+    a, b, c = rng.randrange(VARIABLES), rng.randrange(VARIABLES), rng.randrange(VARIABLES)
+    expr = rng.choice([f"ADD v{b} {rng.randint(1, 9)}", f"MUL v{b} 0.5", f"SUB v{a} v{b} 1.5", f"SIN v{b}"])
+    return [f"v{a} = {expr}", f"PRINT v{c}"]
+
+
+def edit(rng, lines):
+    """Replaces, inserts or deletes one assignment/PRINT pair after the declarations."""
+    pairs = (len(lines) - VARIABLES) // 2
+    index = VARIABLES + 2 * rng.randrange(pairs)
+    kind = rng.choice(["replace", "insert", "delete"] if pairs > 1 else ["replace", "insert"])
+    if kind == "replace":
+        lines[index:index + 2] = pair(rng)
+    elif kind == "insert":
+        lines[index:index] = pair(rng) + pair(rng)
+    else:
+        del lines[index:index + 2]
+
+
+def test_edits_match_a_fresh_compile():
+    rng = random.Random(0)
+    lines = [f"VAR v{i} = {i + 1}" for i in range(VARIABLES)]
+    for _ in range(150):
+        lines += pair(rng)
+    compiler = IncrementalCompiler(checkpoint_interval=16)
+    compiler.compile("\n".join(lines))
+    for _ in range(40):
+        edit(rng, lines)
+        code = "\n".join(lines)
+        result = compiler.compile(code)
+        expected = compile_source(code)
+        assert result.output == expected["output"]
+        assert result.get_tac() == expected["tac"]
+        assert result.get_assembly() == expected["assembly"]
+        assert result.ast == Parser(Lexer(code)).parse()  # Including the shifted line numbers
+        stats = result.stats
+        assert stats["reused_prefix"] + stats["reparsed"] + stats["reused_suffix"] == len(result.ast)
+        assert stats["reparsed"] <= 8  # The edited pairs and the statement before them, not the whole file
+
+
+def test_an_edit_in_the_middle_reuses_both_ends():
+    lines = [f"VAR v{i} = {i + 1}" for i in range(VARIABLES)] + ["v1 = ADD v2 3", "PRINT v1"] * 100
+    compiler = IncrementalCompiler(checkpoint_interval=16)
+    compiler.compile("\n".join(lines))
+    lines[108] = "v1 = MUL v2 4"
+    result = compiler.compile("\n".join(lines))
+    assert result.stats["reparsed"] <= 3
+    assert result.stats["reused_prefix"] >= 100 and result.stats["reused_suffix"] >= 95
+    assert result.stats["resumed_from"] == result.stats["reused_prefix"]
+    assert result.output == compile_source("\n".join(lines))["output"]
@@ -0,0 +1,79 @@
+import pytest
+import ir
+from ast_nodes import ADD, MUL, SIN, ASSIGN
+from compiler import compile_source
+from lexer import Lexer
+from parser import Parser
+
+HUGE = "1" + "0" * 400  # An int past the float range; with ".0" it lexes to inf
+
+
+def output(code, optimize):
+    try:
+        return compile_source(code, optimize)["output"]
+    except Exception as e:
+        return type(e).__name__
+
+
+@pytest.mark.parametrize("code", [
+    f"VAR a = SIN {HUGE}\nPRINT 1",
+    f"VAR a = ADD {HUGE} 1.5\nPRINT 1",
+    f"VAR a = MUL {HUGE}.0 2\nVAR b = SIN a\nPRINT 1",
+    "VAR a = POW -8 0.5\nVAR b = LOG a\nPRINT 1",
+])
+def test_optimization_keeps_faulting_dead_code(code):
+    assert output(code, True) == output(code, False) != "1"
+
+
+def test_only_provably_safe_instructions_may_be_dropped():
+    const = ir.Const
+    assert not ir.may_fault(ir.Instr(ASSIGN, "a", ("b",)))
+    assert not ir.may_fault(ir.Instr(ADD, "a", (const(2 ** 2000), const(3))))
+    assert not ir.may_fault(ir.Instr(MUL, "a", (const(1.5), const(3))))
+    assert ir.may_fault(ir.Instr(ADD, "a", (const(2 ** 2000), const(1.5))))
+    assert ir.may_fault(ir.Instr(ADD, "a", ("b", const(1))))
+    assert ir.may_fault(ir.Instr(SIN, "a", (const(1.0),)))
+
+
+def build(code):
+    return ir.build_ir(Parser(Lexer(code)).parse())
+
+
+def run_pass(optimization, code):
+    instructions, stats = optimization.run(build(code))
+    return ir.format_tac(instructions).split("\n"), stats
+
+
+def test_constant_folding_propagates_and_folds():
+    tac, stats = run_pass(ir.ConstantFolding(), "VAR a = 2\nVAR b = MUL a 3 0.5\nPRINT b\nPRINT ADD b x")
+    assert tac == ["a = 2", "%t1 = 6", "%t2 = 3.0", "b = 3.0", "PRINT 3.0", "%t3 = 3.0 + x", "PRINT %t3"]
+    assert stats == {"propagated": 5, "folded": 2}
+
+
+@pytest.mark.parametrize("code, kept", [
+    ("PRINT DIV 1 0", "%t1 = 1 / 0"),
+    ("PRINT LOG -1 2", "%t1 = LOG(-1)"),
+    (f"PRINT POW 2 {ir.MAX_FOLDED_EXPONENT + 1}", f"%t1 = 2 ^ {ir.MAX_FOLDED_EXPONENT + 1}"),
+])
+def test_constant_folding_leaves_errors_and_huge_results_to_run_time(code, kept):
+    tac, stats = run_pass(ir.ConstantFolding(), code)
+    assert tac[0] == kept and stats["folded"] == 0
+
+
+def test_constant_folding_keeps_the_sign_of_zero():
+    tac, _ = run_pass(ir.ConstantFolding(), "VAR a = MUL -1 0.0\nVAR b = ADD 0.0 0\nPRINT a\nPRINT b")
+    assert tac[-2:] == ["PRINT -0.0", "PRINT 0.0"]
+
+
+def test_cse_reuses_results_until_an_input_changes():
+    tac, stats = run_pass(ir.CommonSubexpressionElimination(),
+                          "VAR a = ADD x 1\nVAR b = ADD x 1\nPRINT b\nx = 5\nPRINT ADD x 1")
+    assert tac == ["%t1 = x + 1", "a = %t1", "%t2 = %t1", "b = %t1", "PRINT b", "x = 5", "%t3 = x + 1", "PRINT %t3"]
+    assert stats == {"eliminated": 1}
+
+
+def test_dead_store_elimination_keeps_what_is_printed_or_may_raise():
+    tac, stats = run_pass(ir.DeadStoreElimination(),
+                          "VAR a = ADD 1 2\nVAR b = ADD x 1.5\nVAR c = DIV x 2\nVAR d = 7\nPRINT d")
+    assert tac == ["%t2 = x + 1.5", "%t3 = x / 2", "d = 7", "PRINT d"]  # x may be an int too big for a float
+    assert stats == {"removed": 4}
@@ -0,0 +1,66 @@
+import random
+import pytest
+from code_generator import CodeGenerator
+from jit import PythonTranslator, differential_check, random_program, compile_function, run_source, MAX_CHAIN
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+
+
+def output(code):
+    return compile_function(Parser(Lexer(code)).parse())()[0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_programs_match_the_vm(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        assert differential_check(random_program(rng)) is None
+
+
+@pytest.mark.parametrize("count", [3, MAX_CHAIN, MAX_CHAIN + 1, 300, 5000])
+def test_long_operand_lists(count):
+    assert output("PRINT ADD " + " ".join(["1"] * count)) == [str(count)]
+    operands = " ".join(["a", "3", "2.5"] * (count // 3 + 1))
+    for op in ("SUB", "MUL", "DIV", "MOD"):
+        assert differential_check(f"VAR a = 7\nPRINT {op} 1000 {operands}") is None
+
+
+def test_long_operand_lists_in_random_programs():
+    rng = random.Random(1)
+    for _ in range(20):
+        assert differential_check(random_program(rng, max_operands=700)) is None
+
+
+def test_negative_zero():
+    code = "VAR z = -0.0\nPRINT z\nPRINT 0.0\nPRINT MUL z 1\nPRINT SUB 0.0 0.0\nPRINT ADD -0.0 -0.0"
+    assert output(code) == ["-0.0", "0.0", "-0.0", "0.0", "-0.0"]
+    assert differential_check(code) is None
+
+
+def test_errors_match_the_vm():
+    assert differential_check("VAR a = 1\nPRINT DIV a 0") is None
+    assert differential_check("PRINT LOG 0 1") is None
+    assert differential_check("VAR a = ADD 1 b") is None
+
+
+def test_typed_operands_skip_the_radians_call():
+    ast = Parser(Lexer("VAR a = 3\nVAR b = DIV a 7\nPRINT SIN b\nVAR c = POW -8 0.5\nPRINT COS c").tokenize()).parse()
+    source = PythonTranslator(SemanticAnalyzer(ast).analyze()).translate(ast)
+    assert "_sin(_radians(" not in source
+    assert "_cos(_radians(v_c))" in source
+
+
+def test_code_generator_passes_the_symbol_table():
+    code = "VAR x = 30\nx = ADD x 0.5\nPRINT SIN x\nVAR y = POW -8 0.5\nPRINT y"
+    ast = Parser(Lexer(code).tokenize()).parse()
+    symbol_table = SemanticAnalyzer(ast).analyze()
+    assert CodeGenerator(backend="jit").execute(ast, symbol_table) == CodeGenerator().execute(ast)
+
+
+@pytest.mark.parametrize("literal", ["1" + "0" * 400 + ".0", "-1" + "0" * 400 + ".0", "1" + "0" * 2000])
+def test_literals_without_a_python_literal(literal):
+    assert differential_check(f"PRINT {literal}") is None
+    assert differential_check(f"VAR a = {literal}\nPRINT ADD a {literal} 1\nPRINT MUL a 0") is None
+    assert run_source(f"PRINT ADD {literal} {literal}") == CodeGenerator().execute(
+        Parser(Lexer(f"PRINT ADD {literal} {literal}")).parse())
@@ -0,0 +1,38 @@
+import time
+import pytest
+from bytecode import compile_program
+from lexer import Lexer
+from parser import Parser
+from policy import ExecutionPolicy, ResourceLimitError
+
+
+def machine(code, **limits):
+    return ExecutionPolicy(**limits).machine(compile_program(Parser(Lexer(code)).parse()))
+
+
+@pytest.mark.parametrize("exponent", [3000000, 30000000])
+def test_time_limit_refuses_big_results_up_front(exponent):
+    start = time.perf_counter()
+    with pytest.raises(ResourceLimitError) as error:
+        machine(f"VAR a = POW 7 {exponent}", max_seconds=0.001).run()
+    assert error.value.kind == "time"
+    assert time.perf_counter() - start < 0.1
+
+
+def test_time_limit_allows_results_that_fit():
+    assert machine("VAR a = POW 7 30000\nVAR b = MUL a a\nPRINT 1", max_seconds=10).run() == ["1"]
+    assert machine("VAR a = POW 7 -300000\nPRINT a", max_seconds=10).run() == ["0.0"]
+
+
+@pytest.mark.parametrize("code", [
+    "VAR a = POW 10 300\nVAR b = MUL a a",
+    "VAR a = POW 10 308\nVAR b = ADD a a a a a a a a a a",
+    "VAR a = POW 10 308\nVAR b = SUB 0 a a a a a a a a a a",
+    "VAR a = POW 10 300\nVAR b = POW 10 -300\nVAR c = DIV a b",
+])
+def test_float_overflow_raises(code):
+    vm = machine(code + "\nPRINT 2", numbers="float", keep_going=True)
+    assert vm.run() == ["2.0"]
+    assert vm.errors == [(code.count("\n"), "Float result out of range")]
+    with pytest.raises(OverflowError):
+        machine(code, numbers="float").run()
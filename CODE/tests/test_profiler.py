@@ -0,0 +1,30 @@
+import pytest
+from compiler import compile_source
+from profiler import profile_source
+
+CODE = "VAR a = 2\nVAR b = MUL a 3 4\nPRINT ADD a b\nPRINT SIN b"
+FRONT_END = {"tokens": 18, "statements": 4, "nodes": 14, "variables": 2}
+
+
+def test_vm_phases_counters_and_opcodes():
+    results, profiler = profile_source(CODE, layout=False)
+    report = profiler.report()
+    assert list(report["phases"]) == ["lex", "parse", "semantic", "codegen", "execute", "views"]
+    assert all(record["wall"] >= 0 and "peak_bytes" in record for record in report["phases"].values())
+    assert report["counters"] == dict(FRONT_END, instructions=15)
+    assert {name: record["count"] for name, record in report["opcodes"].items()} == {
+        "LOAD_CONST": 3, "LOAD_VAR": 4, "STORE_VAR": 2, "MUL": 2, "ADD": 1, "SIN": 1, "PRINT": 2}
+    expected = compile_source(CODE)
+    assert all(results[key] == expected[key] for key in ("output", "tac", "assembly"))
+    assert set(results["timings"]) == set(report["phases"])
+
+
+@pytest.mark.parametrize("backend", ["jit", "parallel"])
+def test_other_backends_time_the_whole_run(backend):
+    results, profiler = profile_source(CODE, backend=backend, memory=False, layout=False)
+    report = profiler.report()
+    assert list(report["phases"]) == ["lex", "parse", "semantic", "execute", "views"]
+    assert report["opcodes"] == {} and "peak_bytes" not in report
+    extra = {"tasks": 1, "workers": 1} if backend == "parallel" else {}  # Too little work to start processes
+    assert report["counters"] == dict(FRONT_END, **extra)
+    assert results["output"] == compile_source(CODE)["output"]
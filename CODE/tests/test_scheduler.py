@@ -0,0 +1,32 @@
+import pytest
+from code_generator import CodeGenerator
+from lexer import Lexer
+from parser import Parser
+from scheduler import ParallelScheduler, independent_chains
+
+
+def parse(code):
+    return Parser(Lexer(code)).parse()
+
+
+def test_independent_chains_match_sequential_execution():
+    ast = parse(independent_chains(8, 50))
+    scheduler = ParallelScheduler(workers=2, min_parallel_cost=0)
+    assert scheduler.execute(ast) == CodeGenerator().execute(parse(independent_chains(8, 50)))
+    assert scheduler.report.tasks > 1
+
+
+def test_earliest_failure_is_raised():
+    code = "VAR a = 1\nVAR b = 2\nPRINT a\nc = DIV a 0\nPRINT b\nd = LOG 0 b\nPRINT b"
+    with pytest.raises(Exception) as expected:
+        CodeGenerator().execute(parse(code))
+    with pytest.raises(type(expected.value)) as actual:
+        ParallelScheduler(workers=2, min_parallel_cost=0).execute(parse(code))
+    assert str(actual.value) == str(expected.value)
+
+
+def test_parallel_backend_matches_the_vm():
+    code = independent_chains(4, 20)
+    parallel, vm = CodeGenerator(backend="parallel"), CodeGenerator()
+    assert parallel.execute(parse(code)) == vm.execute(parse(code))
+    assert parallel.variables == vm.variables
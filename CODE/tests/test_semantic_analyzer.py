@@ -0,0 +1,30 @@
+import time
+import ir
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer, INT
+
+TOWER = "VAR a = POW 10 64\nVAR b = POW a 64\nVAR c = POW b 64\nVAR d = POW c 64\nPRINT d"
+
+
+def parse(code):
+    return Parser(Lexer(code).tokenize()).parse()
+
+
+def test_huge_constants_are_not_folded():
+    ast = parse(TOWER)
+    start = time.perf_counter()
+    symbol_table = SemanticAnalyzer(ast).analyze()
+    ir.optimize(ir.build_ir(ast))
+    assert time.perf_counter() - start < 1.0
+    assert symbol_table["a"].constant and symbol_table["a"].value == 10 ** 64
+    assert not symbol_table["c"].constant and symbol_table["c"].value is None
+    assert symbol_table["d"].type == INT
+
+
+def test_big_products_are_not_folded():
+    factor = 2 ** (ir.MAX_FOLDED_BITS // 2 + 1)
+    symbol_table = SemanticAnalyzer(parse(f"VAR a = {factor}\nVAR b = MUL a a")).analyze()
+    assert not symbol_table["b"].constant
+    symbol_table = SemanticAnalyzer(parse("VAR a = 12\nVAR b = MUL a a 3")).analyze()
+    assert symbol_table["b"].value == 432
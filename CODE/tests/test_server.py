@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from server import CompileServer, DEFAULT_LIMITS
+
+
+def process(*requests):
+    async def run():
+        server = CompileServer(workers=1)
+        try:
+            return [await server.process(json.dumps(request)) for request in requests]
+        finally:
+            server.close()
+
+    return asyncio.run(run())
+
+
+def test_backends_other_than_the_vm_are_refused():
+    for response in process(*({"id": 1, "code": "PRINT POW 10 1000000000", "backend": backend}
+                              for backend in ("jit", "parallel"))):
+        assert response["id"] == 1 and not response["ok"]
+        assert "vm backend" in response["error"]
+
+
+def test_limits_cannot_be_loosened():
+    code = "VAR a = POW 7 300000000"
+    loose = [{"max_seconds": None}, {"max_int_bits": None}, {"max_seconds": DEFAULT_LIMITS["max_seconds"] * 2},
+             {"max_int_bits": "1e9"}, {"max_seconds": 0}, ["max_seconds"]]
+    for response in process(*({"id": 1, "code": code, "limits": limits} for limits in loose)):
+        assert not response["ok"] and "limit" in response["error"].lower()
+    tight, = process({"id": 2, "code": code, "limits": {"max_seconds": 1, "max_int_bits": 1000, "keep_going": True}})
+    assert not tight["ok"] and tight["limit"] == "int_bits"
+
+
+def test_close_stops_a_busy_worker():
+    async def run():
+        server = CompileServer(workers=1)
+        pending = asyncio.get_running_loop().run_in_executor(server.pool, time.sleep, 60)
+        await asyncio.sleep(1)
+        start = time.perf_counter()
+        server.close()
+        pending.cancel()
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 5
+
+
+def test_stdio_serves_regular_files(tmp_path):
+    requests = tmp_path / "requests.jsonl"
+    requests.write_text(json.dumps({"id": 1, "code": "VAR x = 2\nPRINT POW x 10"}) + "\n"
+                        + json.dumps({"id": 2, "command": "ping"}) + "\n")
+    log = tmp_path / "log"
+    server = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+    with open(requests) as stdin, open(log, "w") as stdout:
+        subprocess.run([sys.executable, server, "serve", "--stdio", "--workers", "1"], stdin=stdin, stdout=stdout,
+                       timeout=60, check=True)
+    responses = {response["id"]: response for response in map(json.loads, log.read_text().splitlines())}
+    assert responses[1]["output"] == "1024"
+    assert responses[2]["ok"]
@@ -0,0 +1,27 @@
+import random
+import pytest
+from compiler import compile_file
+from streaming import DEFAULT_BATCH_SIZE
+
+
+def program(assignments, seed=0):
+    """Statements over eight variables; each assignment is followed by a PRINT, so operand lists end there."""
+    rng = random.Random(seed)
+    lines = [f"VAR v{i} = {i}\nPRINT v{i}" for i in range(8)]
+    for _ in range(assignments):
+        a, b, c = rng.randrange(8), rng.randrange(8), rng.randrange(8)
+        expr = rng.choice([f"ADD v{b} 3.5", f"MUL v{b} v{a} 0.5", f"SUB v{b} 1", f"DIV v{a} 2", f"SIN v{b}"])
+        lines.append(f"v{a} = {expr}\nPRINT v{c}")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize("code", ["", program(50), program(DEFAULT_BATCH_SIZE)],
+                         ids=["empty", "one-batch", "several-batches"])
+def test_streaming_matches_the_normal_build(tmp_path, code):
+    source = tmp_path / "program.txt"
+    source.write_text(code)
+    assert compile_file(str(source), str(tmp_path / "normal"))["ok"]
+    assert compile_file(str(source), str(tmp_path / "stream"), stream=True)["ok"]
+    for extension in (".out", ".tac", ".asm"):
+        expected = (tmp_path / "normal" / f"program{extension}").read_bytes()
+        assert (tmp_path / "stream" / f"program{extension}").read_bytes() == expected, extension
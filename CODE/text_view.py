@@ -0,0 +1,199 @@
+"""Virtualized, read-only text panes for large compiler dumps.
+
+A pane keeps its lines in Python, either as a list of items with a formatter
+(tokens, statements) or as split text, and only the rows that fit on screen
+are ever inserted into the Tk widget, in a single call per redraw. Keyword
+highlighting is applied to those rows only. Searching builds a lowercase
+copy of the text with line offsets on first use, so finds are a ``str.find``
+plus a bisect rather than a scan of Tk text.
+"""
+import re
+import tkinter as tk
+from bisect import bisect_right
+from itertools import accumulate
+from tkinter import font as tkfont
+
+KEYWORD_PATTERN = re.compile(r"\b(?:ADD|SUB|MUL|DIV|MOD|POW|LOG|SIN|COS|TAN|VAR|PRINT)\b")
+
+
+class LineSource:
+    """Lines of a pane, formatted on demand, with a lazily built search index."""
+
+    def __init__(self, items=(), formatter=None):
+        self.items = items
+        self.formatter = formatter
+        self._search_text = None
+        self._offsets = None
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.split("\n") if text else [])
+
+    def __len__(self):
+        return len(self.items)
+
+    def lines(self, start, stop):
+        items = self.items[start:stop]
+        return [self.formatter(item) for item in items] if self.formatter else list(items)
+
+    def _index(self):
+        if self._search_text is None:
+            lines = self.lines(0, len(self.items))
+            self._search_text = "\n".join(lines).lower()
+            self._offsets = [0]
+            self._offsets.extend(accumulate(len(line) + 1 for line in lines))
+        return self._search_text, self._offsets
+
+    def find(self, query, start=0):
+        """Returns (line, column) of the first case-insensitive match at or after line ``start``."""
+        if not query or not self.items:
+            return None
+        text, offsets = self._index()
+        position = text.find(query.lower(), offsets[min(start, len(self.items))])
+        if position < 0:
+            position = text.find(query.lower())  # Wrap around
+            if position < 0:
+                return None
+        line = bisect_right(offsets, position) - 1
+        return line, position - offsets[line]
+
+
+class VirtualTextView(tk.Frame):
+    """A pane drawing only the visible window of a LineSource, with search and jump-to-line."""
+
+    def __init__(self, master, height=15, font=("Consolas", 12), bg="#1e1e1e", fg="#d4d4d4",
+                 highlight_keywords=False):
+        super().__init__(master, bg=bg)
+        self.source = LineSource()
+        self.top = 0
+        self.line_tag = None
+        self.highlight_keywords = highlight_keywords
+        self.match = None
+
+        toolbar = tk.Frame(self, bg=bg)
+        toolbar.pack(fill=tk.X)
+        self.search_entry = tk.Entry(toolbar, width=24)
+        self.search_entry.pack(side=tk.LEFT)
+        self.search_entry.bind("<Return>", lambda event: self.find_next())
+        tk.Button(toolbar, text="Find", command=self.find_next, relief=tk.FLAT).pack(side=tk.LEFT, padx=(2, 10))
+        self.line_entry = tk.Entry(toolbar, width=8)
+        self.line_entry.pack(side=tk.LEFT)
+        self.line_entry.bind("<Return>", lambda event: self.goto_entry())
+        tk.Button(toolbar, text="Go to line", command=self.goto_entry, relief=tk.FLAT).pack(side=tk.LEFT, padx=2)
+        self.status = tk.Label(toolbar, bg=bg, fg=fg)
+        self.status.pack(side=tk.RIGHT)
+        self.toolbar = toolbar
+
+        body = tk.Frame(self, bg=bg)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.y_scroll = tk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text = tk.Text(body, height=height, wrap=tk.NONE, font=font, bg=bg, fg=fg,
+                            insertbackground="white", state=tk.DISABLED)
+        x_scroll = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        x_scroll.pack(fill=tk.X)
+        self.text.configure(xscrollcommand=x_scroll.set)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.tag_configure("keyword", foreground="#569cd6")
+        self.text.tag_configure("error", foreground="#f44747")
+        self.text.tag_configure("match", background="#515c6a")
+        self.text.bind("<Configure>", lambda event: self.render())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(sequence, self._on_wheel)
+        self.line_height = tkfont.Font(font=self.text["font"]).metrics("linespace")
+
+    def set_lines(self, items, formatter=None, tag=None):
+        """Shows one line per item; ``formatter`` turns an item into its line text."""
+        self.source = LineSource(items, formatter)
+        self._reset(tag)
+
+    def set_text(self, text, tag=None):
+        self.source = LineSource.from_text(text)
+        self._reset(tag)
+
+    def clear(self):
+        self.set_lines([])
+
+    def _reset(self, tag):
+        self.top = 0
+        self.match = None
+        self.line_tag = tag
+        self.render()
+
+    def set_colors(self, bg, fg):
+        for widget in (self, self.toolbar, self.status):
+            widget.configure(bg=bg)
+        self.status.configure(fg=fg)
+        self.text.configure(bg=bg, fg=fg, insertbackground=fg)
+
+    def visible_rows(self):
+        return max(self.text.winfo_height() // self.line_height, 1)
+
+    def render(self):
+        total = len(self.source)
+        rows = self.visible_rows()
+        self.top = max(min(self.top, total - rows), 0)
+        lines = self.source.lines(self.top, self.top + rows)
+        text = self.text
+        text.configure(state=tk.NORMAL)
+        text.delete("1.0", tk.END)
+        text.insert("1.0", "\n".join(lines), self.line_tag or ())
+        if self.highlight_keywords and self.line_tag is None:
+            for row, line in enumerate(lines, 1):
+                for keyword in KEYWORD_PATTERN.finditer(line):
+                    text.tag_add("keyword", f"{row}.{keyword.start()}", f"{row}.{keyword.end()}")
+        if self.match is not None:
+            line, column, length = self.match
+            if self.top <= line < self.top + rows:
+                row = line - self.top + 1
+                text.tag_add("match", f"{row}.{column}", f"{row}.{column + length}")
+        text.configure(state=tk.DISABLED)
+        if total:
+            self.y_scroll.set(self.top / total, min(self.top + rows, total) / total)
+            self.status.configure(text=f"lines {self.top + 1}-{min(self.top + rows, total)} of {total}")
+        else:
+            self.y_scroll.set(0, 1)
+            self.status.configure(text="")
+
+    def goto(self, line):
+        """Scrolls so that 0-based ``line`` is the first visible row."""
+        self.top = line
+        self.render()
+
+    def goto_entry(self):
+        try:
+            line = int(self.line_entry.get())
+        except ValueError:
+            return
+        self.goto(max(line - 1, 0))
+
+    def find_next(self):
+        query = self.search_entry.get()
+        start = self.match[0] + 1 if self.match else self.top
+        found = self.source.find(query, start)
+        if found is None:
+            self.match = None
+            self.render()
+            self.status.configure(text=f"'{query}' not found")
+            return
+        line, column = found
+        self.match = (line, column, len(query))
+        self.top = max(line - self.visible_rows() // 3, 0)
+        self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.source))
+        elif unit == "pages":
+            self.top += int(amount) * self.visible_rows()
+        else:
+            self.top += int(amount)
+        self.render()
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.top -= 3
+        else:
+            self.top += 3
+        self.render()
+        return "break"
@@ -0,0 +1,385 @@
+"""In-process parse tree layout and a viewport-culled Tk canvas renderer.
+
+The layout is the Reingold-Tilford tidy tree in Buchheim, Juenger and
+Leipert's linear-time form. Large programs are shown through collapsed
+groups of statements that are only laid out once expanded, and the canvas
+only draws the nodes inside the visible viewport. Layouts are cached by AST
+hash and expansion state.
+"""
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from ast_nodes import NUMBER, ID, DECLARE, ASSIGN, PRINT, OP_NAMES, Node
+
+GROUP_SIZE = 256  # Statements per collapsible group
+X_SPACING = 80
+Y_SPACING = 70
+MARGIN = 40
+MAX_LABEL = 12
+LAYOUT_CACHE_SIZE = 8
+
+
+# Tree sources: the program, a range of statements, an AST node or a leaf value
+
+class _Program:
+    __slots__ = ("ast",)
+
+    def __init__(self, ast):
+        self.ast = ast
+
+
+class _Group:
+    __slots__ = ("ast", "low", "high")
+
+    def __init__(self, ast, low, high):
+        self.ast = ast
+        self.low = low
+        self.high = high
+
+
+def _grouped(ast, low, high):
+    """Splits statements low..high into groups of at most GROUP_SIZE items."""
+    count = high - low
+    if count <= GROUP_SIZE:
+        return list(ast[low:high])
+    step = GROUP_SIZE
+    while count > step * GROUP_SIZE:
+        step *= GROUP_SIZE
+    return [_Group(ast, start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def children_of(source):
+    if isinstance(source, _Program):
+        return _grouped(source.ast, 0, len(source.ast))
+    if isinstance(source, _Group):
+        return _grouped(source.ast, source.low, source.high)
+    if isinstance(source, Node):
+        op = source.op
+        if op == DECLARE or op == ASSIGN:
+            return [source.name, source.expr]
+        if op == PRINT:
+            return [source.expr]
+        if op == NUMBER or op == ID:
+            return []
+        return list(source.operands)
+    return []
+
+
+def label_of(source):
+    if isinstance(source, _Program):
+        return "PROGRAM"
+    if isinstance(source, _Group):
+        return f"{source.low + 1}-{source.high}"
+    if isinstance(source, Node):
+        if source.op == NUMBER:
+            label = str(source.value)
+        elif source.op == ID:
+            label = source.name
+        else:
+            label = OP_NAMES[source.op]
+    else:
+        label = str(source)
+    return label if len(label) <= MAX_LABEL else label[:MAX_LABEL - 1] + "…"
+
+
+class _DrawTree:
+    __slots__ = ("key", "source", "children", "parent", "number", "x", "y", "mod", "thread", "ancestor",
+                 "change", "shift", "collapsed")
+
+    def __init__(self, key, source, parent, number, depth):
+        self.key = key
+        self.source = source
+        self.children = []
+        self.parent = parent
+        self.number = number  # 1-based position among siblings
+        self.x = -1.0
+        self.y = depth
+        self.mod = 0.0
+        self.thread = None
+        self.ancestor = self
+        self.change = 0.0
+        self.shift = 0.0
+        self.collapsed = False
+
+    def left(self):
+        return self.thread or (self.children[0] if self.children else None)
+
+    def right(self):
+        return self.thread or (self.children[-1] if self.children else None)
+
+    def left_brother(self):
+        return self.parent.children[self.number - 2] if self.parent and self.number > 1 else None
+
+    def leftmost_sibling(self):
+        return self.parent.children[0] if self.parent and self.number > 1 else None
+
+
+def _expanded_by_default(source):
+    return not isinstance(source, _Group)
+
+
+def _build(source, toggled):
+    root = _DrawTree((), source, None, 1, 0)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        expanded = _expanded_by_default(node.source) != (node.key in toggled)
+        children = children_of(node.source)
+        if children and not expanded:
+            node.collapsed = True
+            continue
+        for index, child in enumerate(children):
+            draw = _DrawTree(node.key + (index,), child, node, index + 1, node.y + 1)
+            node.children.append(draw)
+            stack.append(draw)
+    return root
+
+
+def _first_walk(root):
+    # Post-order without recursion so very wide or deep trees are safe
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+            continue
+        if not node.children:
+            brother = node.left_brother()
+            node.x = brother.x + 1.0 if brother else 0.0
+            continue
+        default_ancestor = node.children[0]
+        for child in node.children:
+            default_ancestor = _apportion(child, default_ancestor)
+        _execute_shifts(node)
+        midpoint = (node.children[0].x + node.children[-1].x) / 2
+        brother = node.left_brother()
+        if brother:
+            node.x = brother.x + 1.0
+            node.mod = node.x - midpoint
+        else:
+            node.x = midpoint
+
+
+def _apportion(node, default_ancestor):
+    brother = node.left_brother()
+    if brother is None:
+        return default_ancestor
+    inner_right = outer_right = node
+    inner_left = brother
+    outer_left = node.leftmost_sibling()
+    shift_inner_right = shift_outer_right = node.mod
+    shift_inner_left = inner_left.mod
+    shift_outer_left = outer_left.mod
+    while inner_left.right() and inner_right.left():
+        inner_left = inner_left.right()
+        inner_right = inner_right.left()
+        outer_left = outer_left.left()
+        outer_right = outer_right.right()
+        outer_right.ancestor = node
+        shift = (inner_left.x + shift_inner_left) - (inner_right.x + shift_inner_right) + 1.0
+        if shift > 0:
+            ancestor = inner_left.ancestor if inner_left.ancestor.parent is node.parent else default_ancestor
+            _move_subtree(ancestor, node, shift)
+            shift_inner_right += shift
+            shift_outer_right += shift
+        shift_inner_left += inner_left.mod
+        shift_inner_right += inner_right.mod
+        shift_outer_left += outer_left.mod
+        shift_outer_right += outer_right.mod
+    if inner_left.right() and not outer_right.right():
+        outer_right.thread = inner_left.right()
+        outer_right.mod += shift_inner_left - shift_outer_right
+    else:
+        if inner_right.left() and not outer_left.left():
+            outer_left.thread = inner_right.left()
+            outer_left.mod += shift_inner_right - shift_outer_left
+        default_ancestor = node
+    return default_ancestor
+
+
+def _move_subtree(left, right, shift):
+    subtrees = right.number - left.number
+    right.change -= shift / subtrees
+    right.shift += shift
+    left.change += shift / subtrees
+    right.x += shift
+    right.mod += shift
+
+
+def _execute_shifts(node):
+    shift = change = 0.0
+    for child in reversed(node.children):
+        child.x += shift
+        child.mod += shift
+        change += child.change
+        shift += child.shift + change
+
+
+class TreeLayout:
+    """Flat, depth-indexed node positions ready for viewport queries."""
+
+    def __init__(self, root):
+        self.keys = []
+        self.labels = []
+        self.xs = []
+        self.depths = []
+        self.parents = []
+        self.collapsed = []
+        self.rows = []  # rows[depth] = node indices ordered by x
+        self.row_xs = []
+        stack = [(root, 0.0, -1)]
+        minimum = 0.0
+        while stack:
+            node, offset, parent = stack.pop()
+            index = len(self.keys)
+            x = node.x + offset
+            minimum = min(minimum, x)
+            self.keys.append(node.key)
+            self.labels.append(label_of(node.source) + (" [+]" if node.collapsed else ""))
+            self.xs.append(x)
+            self.depths.append(node.y)
+            self.parents.append(parent)
+            self.collapsed.append(node.collapsed)
+            stack.extend((child, offset + node.mod, index) for child in reversed(node.children))
+        for index, depth in enumerate(self.depths):
+            self.xs[index] = MARGIN + (self.xs[index] - minimum) * X_SPACING
+            while len(self.rows) <= depth:
+                self.rows.append([])
+            self.rows[depth].append(index)
+        for row in self.rows:
+            row.sort(key=self.xs.__getitem__)
+            self.row_xs.append([self.xs[index] for index in row])
+        self.width = (max(self.xs) if self.xs else 0) + MARGIN
+        self.height = MARGIN * 2 + max(len(self.rows) - 1, 0) * Y_SPACING
+
+    def y(self, index):
+        return MARGIN + self.depths[index] * Y_SPACING
+
+    def visible(self, x0, y0, x1, y1):
+        """Indices of the nodes inside the viewport rectangle."""
+        first_row = max(int((y0 - MARGIN) // Y_SPACING), 0)
+        last_row = min(int((y1 - MARGIN) // Y_SPACING) + 1, len(self.rows) - 1)
+        for depth in range(first_row, last_row + 1):
+            row, xs = self.rows[depth], self.row_xs[depth]
+            yield from row[bisect_left(xs, x0 - X_SPACING):bisect_right(xs, x1 + X_SPACING)]
+
+
+def ast_hash(ast):
+    return hashlib.sha256(repr(ast).encode("utf-8")).hexdigest()
+
+
+_layout_cache = OrderedDict()
+
+
+def layout_for(ast, toggled=frozenset(), key=None):
+    """Lays out the tree for ``ast`` with the given toggled nodes, reusing cached layouts."""
+    cache_key = (key or ast_hash(ast), toggled)
+    layout = _layout_cache.get(cache_key)
+    if layout is None:
+        root = _build(_Program(ast), toggled)
+        _first_walk(root)
+        layout = TreeLayout(root)
+        _layout_cache[cache_key] = layout
+        if len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    else:
+        _layout_cache.move_to_end(cache_key)
+    return layout
+
+
+class ParseTreeWindow:
+    """A single reusable Toplevel that draws the visible part of a TreeLayout."""
+
+    def __init__(self, master):
+        self.master = master
+        self.window = None
+        self.canvas = None
+        self.ast = None
+        self.ast_key = None
+        self.toggled = frozenset()
+        self.layout = None
+
+    def show(self, ast, layout=None, key=None):
+        self.ast = ast
+        self.ast_key = key or ast_hash(ast)
+        self.toggled = frozenset()
+        self.layout = layout or layout_for(ast, self.toggled, self.ast_key)
+        self._ensure_window()
+        self.window.deiconify()
+        self.window.lift()
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def _ensure_window(self):
+        import tkinter as tk
+        if self.window is not None and self.window.winfo_exists():
+            return
+        self.window = tk.Toplevel(self.master)
+        self.window.title("Parse Tree Visualization")
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)  # Hidden, then reused
+        x_scroll = tk.Scrollbar(self.window, orient=tk.HORIZONTAL)
+        y_scroll = tk.Scrollbar(self.window, orient=tk.VERTICAL)
+        self.canvas = tk.Canvas(self.window, bg="lightblue", width=800, height=600,
+                                xscrollcommand=x_scroll.set, yscrollcommand=y_scroll.set)
+        x_scroll.config(command=self._scroll(self.canvas.xview))
+        y_scroll.config(command=self._scroll(self.canvas.yview))
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Shift-MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", self._on_wheel)
+        self.canvas.bind("<Button-5>", self._on_wheel)
+        self.canvas.tag_bind("node", "<Button-1>", self._on_click)
+
+    def _scroll(self, view):
+        def command(*args):
+            view(*args)
+            self.redraw()
+        return command
+
+    def _on_wheel(self, event):
+        step = -1 if getattr(event, "delta", 0) > 0 or getattr(event, "num", None) == 4 else 1
+        if event.state & 0x1:  # Shift scrolls sideways
+            self.canvas.xview_scroll(step, "units")
+        else:
+            self.canvas.yview_scroll(step, "units")
+        self.redraw()
+
+    def _on_click(self, event):
+        tags = self.canvas.gettags("current")
+        index = next((int(tag[1:]) for tag in tags if tag.startswith("n") and tag[1:].isdigit()), None)
+        if index is None:
+            return
+        key = self.layout.keys[index]
+        self.toggled = self.toggled ^ {key}
+        self.layout = layout_for(self.ast, self.toggled, self.ast_key)
+        self.redraw()
+
+    def redraw(self):
+        canvas = self.canvas
+        layout = self.layout
+        if canvas is None or layout is None:
+            return
+        canvas.configure(scrollregion=(0, 0, layout.width, layout.height))
+        canvas.delete("tree")
+        x0 = canvas.canvasx(0)
+        y0 = canvas.canvasy(0)
+        x1 = canvas.canvasx(canvas.winfo_width())
+        y1 = canvas.canvasy(canvas.winfo_height())
+        visible = list(layout.visible(x0, y0, x1, y1))
+        for index in visible:
+            parent = layout.parents[index]
+            if parent >= 0:
+                canvas.create_line(layout.xs[parent], layout.y(parent) + 12, layout.xs[index], layout.y(index) - 12,
+                                   tags="tree")
+        for index in visible:
+            x, y = layout.xs[index], layout.y(index)
+            tags = ("tree", "node", f"n{index}")
+            color = "khaki" if layout.collapsed[index] else "lightgoldenrodyellow"
+            canvas.create_rectangle(x - X_SPACING / 2 + 4, y - 12, x + X_SPACING / 2 - 4, y + 12,
+                                    fill=color, outline="gray40", tags=tags)
+            canvas.create_text(x, y, text=layout.labels[index], font=("Consolas", 9), tags=tags)
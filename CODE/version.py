@@ -0,0 +1,2 @@
+# Bumped whenever cached or serialized compiler output changes shape
+COMPILER_VERSION = "1.1.0"